@@ -0,0 +1,122 @@
+import argparse
+from os import cpu_count
+from time import perf_counter
+
+from numpy import abs, maximum, median
+from numpy.random import default_rng
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
+from transscale.utils.Logger import Logger
+from transscale.utils.prediction.FitCache import fit_cache
+from transscale.utils.prediction.PredictionMatrix import PredictionMatrix
+
+
+# A monitoring sample of a configuration, as the measurements manager reads it from the runtime context
+class SyntheticSample:
+
+    def __init__(self, par: int, transp: int, mst: float, time: int):
+        self.__par = par
+        self.__transp = transp
+        self.__mst = mst
+        self.__time = time
+
+    def get_current_par(self) -> int:
+        return self.__par
+
+    def get_current_transp(self) -> int:
+        return self.__transp
+
+    def get_source_input_rate(self) -> float:
+        return self.__mst
+
+    def get_sample_time(self) -> float:
+        return self.__time
+
+
+# Returns measurements of a random fraction of the grid, following the models of the engine with some noise
+def generate_measurements(conf: Config, log: Logger, seed: int, density: float, samples: int) -> MeasurementsManager:
+    rng = default_rng(seed)
+    max_par, max_transp = conf.get_int(Key.MAX_PAR), conf.get_int(Key.MAX_TRANSP)
+    measurements = MeasurementsManager(conf, log)
+
+    time = 0
+    cells = rng.random([max_par, max_transp]) < density
+    for par, transp in zip(*cells.nonzero()):
+        par, transp = int(par) + 1, int(transp) + 1
+        for _ in range(samples):
+            mst = 10000 * par ** 0.8 * transp ** 0.6 - 20 * par * (1 + transp / max_transp)
+            sample = SyntheticSample(par, transp, max(mst * (1 + rng.normal(0, 0.05)), 1.0), time)
+            measurements.update_mst(sample)
+            measurements.update_nd(sample, int(par * 0.5))
+            time += 1
+    return measurements
+
+
+def run(conf: Config, log: Logger, args: argparse.Namespace) -> list:
+    # the first update starts the workers, the next ones fit new measurements of the same grid
+    engine = PredictionMatrix(conf, log)
+    engine.update_matrix(generate_measurements(conf, log, args.seed, args.density, args.samples))
+
+    durations = []
+    matrices = []
+    for repeat in range(args.repeat):
+        measurements = generate_measurements(conf, log, args.seed + repeat + 1, args.density, args.samples)
+        start = perf_counter()
+        engine.update_matrix(measurements)
+        durations.append(perf_counter() - start)
+        matrices.append(engine.get_state()["matrix"])
+    engine.close()
+    return [durations, matrices]
+
+
+if __name__ == "__main__":
+    script_name = "BENCHMARK"
+
+    parser = argparse.ArgumentParser(description='Time the sequential and the wave fills of the prediction matrix')
+    parser.add_argument('-c', '--conf', dest='conf_file', action='store', default="conf/transscale.conf",
+                        help='configuration of the auto-scaler')
+    parser.add_argument('-p', '--par', dest='par', type=int, default=500, help='maximum parallelism of the grid')
+    parser.add_argument('-t', '--transp', dest='transp', type=int, default=64,
+                        help='maximum transprecision of the grid')
+    parser.add_argument('-d', '--density', dest='density', type=float, default=0.1,
+                        help='fraction of the configurations measured')
+    parser.add_argument('-s', '--samples', dest='samples', type=int, default=3,
+                        help='samples per measured configuration')
+    parser.add_argument('-w', '--workers', dest='workers', action='store', default="1,2,4,8,16",
+                        help='comma-separated worker counts of the wave fills')
+    parser.add_argument('-r', '--repeat', dest='repeat', type=int, default=3, help='timed updates per fill')
+    parser.add_argument('--seed', dest='seed', type=int, default=0, help='seed of the synthetic measurements')
+
+    args = parser.parse_args()
+
+    log = Logger()
+    config = Config(log, args.conf_file)
+    log.set_debug_level(0)
+    config.set(Key.MAX_PAR, args.par)
+    config.set(Key.MAX_TRANSP, args.transp)
+    # every update must fit its lines, not read them from the cache
+    config.set(Key.PREDICTION_FIT_CACHE_SIZE, 0)
+    fit_cache.configure(config, log)
+
+    log.info(f"{script_name}:: Grid of {args.par} x {args.transp} configurations, {args.density:.0%} measured, "
+             f"{cpu_count()} cpus")
+
+    config.set(Key.PREDICTION_MATRIX_FILL, DefaultValues.Prediction.FILL_SEQUENTIAL)
+    sequential, reference = run(config, log, args)
+    baseline = median(sequential)
+    log.info(f"\t{'sequential':>10} {1:>3} workers: {baseline * 1000:9.1f} ms")
+
+    config.set(Key.PREDICTION_MATRIX_FILL, DefaultValues.Prediction.FILL_WAVES)
+    for pool in [DefaultValues.Prediction.POOL_THREAD, DefaultValues.Prediction.POOL_PROCESS]:
+        config.set(Key.PREDICTION_MATRIX_POOL, pool)
+        for workers in [int(w) for w in args.workers.split(",")]:
+            config.set(Key.PREDICTION_MATRIX_WORKERS, workers)
+            durations, matrices = run(config, log, args)
+            # the waves fill the grid in another order than the sequential cascade: the predictions differ slightly
+            difference = median([median(abs(m[1:, 1:] - r[1:, 1:]) / maximum(r[1:, 1:], 1))
+                                 for m, r in zip(matrices, reference)])
+            log.info(f"\t{pool:>10} {workers:>3} workers: {median(durations) * 1000:9.1f} ms, "
+                     f"speedup {baseline / median(durations):5.2f}, median difference {difference:.2%}")
@@ -0,0 +1,52 @@
+import argparse
+
+from transscale.components.TraceReplay import TraceReplay
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.FitCache import fit_cache
+
+
+if __name__ == "__main__":
+    script_name = "REPLAY"
+
+    parser = argparse.ArgumentParser(description='Replay a recorded monitoring trace through the Transscale policy')
+    parser.add_argument('-c', '--conf', dest='conf_file', action='store', default="conf/transscale.conf",
+                        help='configuration of the auto-scaler to evaluate')
+    parser.add_argument('-t', '--trace', dest='trace_file', action='store', required=True,
+                        help='trace recorded with trace.record.path')
+    parser.add_argument('-s', '--strategy', dest='strategy', action='store', default=None,
+                        help='strategy module replacing the configured one')
+
+    args = parser.parse_args()
+
+    log = Logger()
+    config = Config(log, args.conf_file)
+    log.set_debug_level(int(config.get(Key.DEBUG_LEVEL)))
+    profiler.configure(config, log)
+    fit_cache.configure(config, log)
+    if args.strategy:
+        config.set(Key.SCALING_STRATEGY, args.strategy)
+
+    replay = TraceReplay(config, log, args.trace_file)
+    decisions = replay.run()
+    profiler.dump()
+
+    log.info(f"\n{script_name}:: Strategy {config.get(Key.SCALING_STRATEGY)}")
+    log.info(f"\t Decisions of the replay: {len(decisions)}")
+    log.info(f"\t Failed decisions: {replay.get_failures()}")
+    for decision in decisions:
+        log.info(f"\t\t{decision.time:8.1f}s -- {decision.kind} -- "
+                 f"(par, transp) {decision.current} -> {decision.target}")
+
+    recorded = replay.get_recorded_reconfigurations()
+    log.info(f"\t Reconfigurations in the trace: {len(recorded)}")
+    for time, res in recorded:
+        log.info(f"\t\t{time:8.1f}s -- {res['kind']} {res['current']} -> {res['target']} -- success {res['success']}")
+        for step, duration in res.get("timings", {}).items():
+            log.debug(f"\t\t\t{step}: {duration:.1f} s")
+        if res.get("savepoint"):
+            log.debug(f"\t\t\tsavepoint: {res['savepoint']['size']} bytes -- {res['savepoint']['location']}")
+        if res.get("pods"):
+            log.debug(f"\t\t\ttask managers: {res['pods']['started']} started -- {res['pods']['stopped']} stopped")
@@ -0,0 +1,133 @@
+import asyncio
+import argparse
+import re
+
+from transscale.components.ControlLoop import ControlLoop
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.ResourceManager import ResourceManager
+from transscale.components.StateStore import StateStore
+from transscale.controllers.CombinedController import CombinedController
+from transscale.simulator.FlinkSimulator import FlinkSimulator, MstSurface
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import DefaultValues, ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.FitCache import fit_cache
+from transscale.utils.metrics.TraceRecorder import TraceRecorder
+
+
+def parse_profile(profile: str) -> list[tuple[float, float]]:
+    # "0:5000,600:20000" -> [(0, 5000), (600, 20000)]
+    return [(float(t), float(r)) for t, r in [point.split(":") for point in profile.split(",")]]
+
+
+def use_simulator_port(config: Config, port: int) -> None:
+    # every endpoint of the auto-scaler is served by the simulator: the urls of the configuration follow its port
+    url = f"http://{config.get_str(Key.FLINK_HOST)}:{port}"
+    config.set(Key.FLINK_PORT, port)
+    for key in [Key.FLINK_CMD, Key.KUBE_CMD, Key.REDIS_CLI]:
+        if "SimulatorCli" in config.get_str(key):
+            config.set(key, re.sub(r"-u \S+", f"-u {url}", config.get_str(key)))
+    if config.get_str(Key.KUBE_API_URL):
+        config.set(Key.KUBE_API_URL, url)
+    if config.get_str(Key.METRICS_BACKEND) == DefaultValues.Metrics.BACKEND_PROMETHEUS:
+        config.set(Key.PROMETHEUS_PORT, port)
+
+
+def run_controller(config: Config, log: Logger, speedup: float, duration: float) -> None:
+    # every interval of the controller is shrunk by the speedup of the simulated clock
+    for key in [Key.MONITORING_INTERVAL, Key.MONITORING_WARMUP, Key.MONITORING_HOUSEKEEPING, Key.MONITORING_SAMPLING,
+                Key.RECONF_POLL_INTERVAL, Key.RECONF_CANCEL_TIMEOUT, Key.RECONF_TASKMANAGERS_TIMEOUT,
+                Key.RECONF_JOB_TIMEOUT, Key.RECONF_TRANSP_TIMEOUT, Key.RECONF_SAVEPOINT_TIMEOUT,
+                Key.RECONF_RESCALE_TIMEOUT]:
+        config.set(key, config.get_float(key) / speedup)
+
+    trace_path = config.get_str(Key.TRACE_RECORD_PATH)
+    recorder = TraceRecorder(trace_path, log) if trace_path else None
+
+    context = RuntimeContext(config, log, recorder)
+    control_loop = ControlLoop(config, log, context, MeasurementsManager(config, log),
+                               ResourceManager(config, log), CombinedController(config, log), recorder,
+                               StateStore(config, log))
+
+    try:
+        asyncio.run(asyncio.wait_for(control_loop.run(), duration / speedup))
+    except asyncio.TimeoutError:
+        pass
+
+    if recorder is not None:
+        recorder.close()
+
+
+if __name__ == "__main__":
+    script_name = "SIMULATOR"
+
+    parser = argparse.ArgumentParser(description='Local Flink REST, kubectl and Redis stand-in for Transscale')
+    parser.add_argument('-c', '--conf', dest='conf_file', action='store', default="conf/simulator.conf",
+                        help='configuration of the auto-scaler run against the simulator')
+    parser.add_argument('--port', type=int, default=None,
+                        help='port of the simulated Flink REST API, flink.port of the configuration by default')
+    parser.add_argument('--speedup', type=float, default=1.0, help='simulated seconds per real second')
+    parser.add_argument('--alpha', type=float, default=10000, help='MST of one replica at transprecision 1')
+    parser.add_argument('--beta', type=float, default=0.9, help='exponent of the parallelism in the MST')
+    parser.add_argument('--gamma', type=float, default=0.8, help='exponent of the transprecision in the MST')
+    parser.add_argument('--noise', type=float, default=0.02, help='relative noise on the MST')
+    parser.add_argument('--profile', default="0:5000,600:20000,1800:40000,3000:8000",
+                        help='source rate as simulated_seconds:records_per_second points')
+    parser.add_argument('--cancel-delay', dest='cancel_delay', type=float, default=2.0,
+                        help='simulated seconds for a cancelled job to stop')
+    parser.add_argument('--taskmanager-delay', dest='taskmanager_delay', type=float, default=10.0,
+                        help='simulated seconds for the task managers to follow a scaling of their deployment')
+    parser.add_argument('--startup-delay', dest='startup_delay', type=float, default=5.0,
+                        help='simulated seconds for a submitted job to deploy its tasks')
+    parser.add_argument('--savepoint-delay', dest='savepoint_delay', type=float, default=5.0,
+                        help='simulated seconds to take the savepoint of a stopped job')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='simulate the adaptive scheduler, rescaling the job in place')
+    parser.add_argument('--rescale-delay', dest='rescale_delay', type=float, default=3.0,
+                        help='simulated seconds for the adaptive scheduler to rescale the job')
+    parser.add_argument('--controller', type=float, default=0,
+                        help='run the auto-scaler against the simulator for the given simulated seconds')
+
+    args = parser.parse_args()
+
+    log = Logger()
+    config = Config(log, args.conf_file)
+    log.set_debug_level(int(config.get(Key.DEBUG_LEVEL)))
+    profiler.configure(config, log)
+    fit_cache.configure(config, log)
+    port = args.port if args.port is not None else config.get_int(Key.FLINK_PORT)
+    use_simulator_port(config, port)
+
+    simulator = FlinkSimulator(log, MstSurface(args.alpha, args.beta, args.gamma, args.noise),
+                               parse_profile(args.profile), speedup=args.speedup, cancel_delay=args.cancel_delay,
+                               taskmanager_delay=args.taskmanager_delay, startup_delay=args.startup_delay,
+                               savepoint_delay=args.savepoint_delay, adaptive=args.adaptive,
+                               rescale_delay=args.rescale_delay)
+    simulator.start(port=port)
+
+    if args.controller > 0:
+        run_controller(config, log, args.speedup, args.controller)
+        stats = simulator.get_stats()
+        reactions = stats["reaction_times"]
+
+        log.info(f"\n{script_name}:: {stats['sim_time']:.0f} simulated seconds")
+        log.info(f"\t Parallelism reconfigurations: {stats['par_reconfigurations']}")
+        log.info(f"\t Transprecision reconfigurations: {stats['transp_reconfigurations']}")
+        log.info(f"\t Downtime: {stats['downtime']:.1f} s")
+        log.info(f"\t Savepoints: {stats['savepoints']} -- restores: {stats['restores']}")
+        log.info(f"\t In-place rescales: {stats['in_place_rescales']} -- job restarts: {stats['job_restarts']}")
+        log.info(f"\t Task managers started: {stats['taskmanagers_started']} -- "
+                 f"stopped: {stats['taskmanagers_stopped']}")
+        if len(reactions) > 0:
+            log.info(f"\t Reaction time: mean {sum(reactions) / len(reactions):.1f} s -- max {max(reactions):.1f} s")
+        log.info(f"\t Final state: par {stats['parallelism']} -- transp {stats['transprecision']}")
+        simulator.stop()
+
+    else:
+        try:
+            while True:
+                asyncio.run(asyncio.sleep(3600))
+        except KeyboardInterrupt:
+            simulator.stop()
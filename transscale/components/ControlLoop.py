@@ -0,0 +1,277 @@
+import asyncio
+import signal
+import traceback
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.ResourceManager import ResourceManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.components.ScalingPolicy import ScalingPolicy, BP_HIGH
+from transscale.components.StateStore import StateStore
+from transscale.controllers.CombinedController import CombinedController
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.metrics.TraceRecorder import TraceRecorder
+
+
+class ControlLoop:
+
+    def __init__(self, conf: Config, log: Logger, context: RuntimeContext, measurements: MeasurementsManager,
+                 resource_manager: ResourceManager, controller: CombinedController, recorder: TraceRecorder = None,
+                 state_store: StateStore = None):
+        self.__log = log
+        self.__recorder = recorder
+        self.__state_store = state_store
+        self.__debug = int(conf.get(Key.DEBUG_LEVEL))
+
+        self.__context = context
+        self.__measurements = measurements
+        self.__controller = controller
+        self.__resource_manager = resource_manager
+        self.__policy = ScalingPolicy(conf, log, context, measurements, resource_manager, controller)
+
+        self.__interval = conf.get_float(Key.MONITORING_INTERVAL)
+        self.__sampling = conf.get_float(Key.MONITORING_SAMPLING)
+        self.__warmup = conf.get_float(Key.MONITORING_WARMUP)
+        self.__housekeeping = conf.get_float(Key.MONITORING_HOUSEKEEPING)
+
+        self.__stopped = None
+        self.__deciding = None
+        # the samples update the metrics the decisions read, and that a reconfiguration clears
+        self.__context_access = None
+        self.__decisions_from = 0.0
+        self.__reconf_task = None
+
+    def __hold_decisions(self) -> None:
+        # the warm-up only delays the decisions, the monitoring keeps running meanwhile
+        loop = asyncio.get_running_loop()
+        if self.__debug < 2:
+            self.__log.info(f"Warming up for {self.__warmup} seconds")
+            self.__decisions_from = loop.time() + self.__warmup
+        else:
+            self.__decisions_from = loop.time()
+
+    def __is_busy(self) -> bool:
+        return self.__reconf_task is not None and not self.__reconf_task.done()
+
+    def __is_warming_up(self) -> bool:
+        return asyncio.get_running_loop().time() < self.__decisions_from
+
+    def __can_decide(self) -> bool:
+        return not self.__is_busy() and not self.__deciding.locked() and not self.__is_warming_up()
+
+    def __stop(self) -> None:
+        self.__stopped.set()
+
+    # Blocking steps, run in worker threads so that the event loop keeps its deadlines
+
+    def __discover(self) -> None:
+        self.__context.update_job_details()
+        self.__context.update_state()
+        self.__context.print_details()
+
+    def __sample_metrics(self, reconfiguring: bool) -> None:
+        with profiler.span("loop.sample"):
+            self.__context.update_job_runtime_metrics()
+            self.__context.print_job_runtime_metrics()
+            # the configuration is read again by the reconfiguration once it is over
+            if not reconfiguring:
+                self.__context.update_state()
+
+    def __restore(self) -> bool:
+        if self.__state_store is None:
+            return False
+        return self.__state_store.load(self.__context, self.__measurements, self.__controller)
+
+    def __persist(self) -> None:
+        if self.__state_store is None:
+            return
+        try:
+            self.__state_store.save(self.__context, self.__measurements, self.__controller)
+        except (OSError, LookupError) as err:
+            self.__log.warning(f"[LOOP] Cannot save the state: {err}")
+
+    def __record_reconfiguration(self, kind: str, current: int, target: int, success: bool) -> bool:
+        if self.__recorder is not None:
+            self.__recorder.record_reconfiguration(kind, current, target, success,
+                                                   self.__resource_manager.get_last_timings(),
+                                                   self.__resource_manager.get_last_savepoint(),
+                                                   self.__resource_manager.get_last_pods())
+        return success
+
+    def __apply_reconfiguration(self) -> bool:
+        ctx = self.__context
+        if ctx.is_reconf_par():
+            current = ctx.get_current_par()
+            reconfigured = self.__resource_manager.rescale_parallelism(ctx)
+            if not self.__record_reconfiguration("par", current, ctx.get_target_par(), reconfigured):
+                return False
+            # after a parallelism reconfiguration the job is restarted with a new id, or its vertices rescaled in place
+            self.__context.invalidate_topology("job rescaled by a parallelism reconfiguration")
+            self.__discover()
+
+        if ctx.is_reconf_transp():
+            current = ctx.get_current_transp()
+            reconfigured = self.__resource_manager.rescale_transprecision(ctx)
+            if not self.__record_reconfiguration("transp", current, ctx.get_target_transp(), reconfigured):
+                return False
+
+        return True
+
+    # Tasks of the event loop
+
+    async def __periodic(self, interval: float, job) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+
+        while not self.__stopped.is_set():
+            # deadlines are absolute, so the time spent in the job does not make the ticks drift
+            deadline += interval
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+            running = asyncio.ensure_future(job())
+            try:
+                await asyncio.shield(running)
+            except asyncio.CancelledError:
+                # the blocking step of the job goes on in its thread anyway: it ends before the auto-scaler is closed
+                await asyncio.gather(running, return_exceptions=True)
+                raise
+            except Exception as err:
+                self.__log.error(f"[LOOP] Task {job.__name__} failed: {err}")
+                self.__log.debug(str(traceback.format_exception(err)))
+
+            # skip the deadlines already missed instead of firing them in a burst
+            late = loop.time() - deadline
+            if late > interval:
+                deadline += (late // interval) * interval
+
+    async def __sample(self) -> None:
+        # the job keeps being monitored during a reconfiguration, only the decisions wait for its end
+        reconfiguring = self.__is_busy()
+        async with self.__context_access:
+            try:
+                await asyncio.to_thread(self.__sample_metrics, reconfiguring)
+            except (OSError, LookupError) as err:
+                if not reconfiguring:
+                    raise
+                # e.g. the job is restarting
+                self.__log.debug(f"[LOOP] No sample during the re-configuration: {err}")
+                return
+
+        # the samples of the warm-up and of a reconfiguration do not measure the current configuration
+        if self.__can_decide():
+            async with self.__deciding, self.__context_access:
+                await asyncio.to_thread(self.__policy.observe)
+
+        # scale-ups are checked at every sample, so a confirmed high backpressure is handled right away
+        if self.__can_decide() and self.__policy.get_backpressure_level() == BP_HIGH and self.__policy.can_scaleup():
+            async with self.__deciding, self.__context_access:
+                self.__log.warning("Back Pressure Level of Source is HIGH on the whole window!!")
+                await asyncio.to_thread(self.__policy.scaleup)
+                await asyncio.to_thread(self.__persist)
+                self.__schedule_reconfiguration()
+
+    async def __monitor(self) -> None:
+        self.__log.info(f"\n[LOOP]:: Periodic Monitoring...")
+
+        if self.__is_busy():
+            self.__log.info("[LOOP] Re-configuration in progress: monitoring only")
+            return
+
+        if self.__deciding.locked():
+            self.__log.info("[LOOP] Previous decision still running: no new decision")
+            return
+
+        if self.__is_warming_up():
+            self.__log.info("[LOOP] Warming up: monitoring only")
+            return
+
+        # the decision reads the metrics of a complete sample
+        async with self.__deciding, self.__context_access:
+            if await asyncio.to_thread(self.__policy.evaluate):
+                await asyncio.to_thread(self.__policy.scaleup)
+                await asyncio.to_thread(self.__persist)
+            self.__schedule_reconfiguration()
+
+    def __schedule_reconfiguration(self) -> None:
+        self.__policy.print_status()
+        if self.__context.is_reconf_required() and not self.__stopped.is_set():
+            self.__log.new_line()
+            self.__reconf_task = asyncio.create_task(self.__reconfigure())
+
+    async def __reconfigure(self) -> None:
+        try:
+            # the samples go on meanwhile: the context serializes their refreshes of the job with the reconfiguration
+            with profiler.span("loop.reconfiguration"):
+                reconfigured = await asyncio.to_thread(self.__apply_reconfiguration)
+        except Exception as err:
+            self.__log.error(str(traceback.format_exception(err)))
+            reconfigured = False
+
+        if not reconfigured:
+            self.__log.new_line()
+            self.__log.info(f"[LOOP]:: Error reconfiguring: closing auto-scaler")
+            self.__stop()
+            return
+
+        # samples taken in the previous configuration, or during the reconfiguration, do not describe the new one
+        async with self.__context_access:
+            self.__context.clear_series()
+
+        self.__log.info("\n*******************************************************")
+        self.__hold_decisions()
+
+    async def __housekeep(self) -> None:
+        if self.__is_busy():
+            return
+        self.__log.debug(f"[LOOP] Housekeeping: last tick fetched in {self.__context.get_fetch_time() * 1000:.1f} ms")
+        async with self.__context_access:
+            await asyncio.to_thread(self.__context.check_topology)
+        # the samples recorded since the last decision
+        async with self.__deciding:
+            await asyncio.to_thread(self.__persist)
+
+    async def run(self) -> None:
+        self.__stopped = asyncio.Event()
+        self.__deciding = asyncio.Lock()
+        self.__context_access = asyncio.Lock()
+
+        await asyncio.to_thread(self.__discover)
+        # no reconfiguration until a decision is taken: the target starts from the running configuration
+        self.__context.set_target_state(*self.__context.get_current_state())
+
+        # kill -USR1 dumps the time spent per phase without stopping the auto-scaler
+        if profiler.is_enabled() and hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.dump)
+
+        self.__log.info("\n*******************************************************")
+        if await asyncio.to_thread(self.__restore):
+            # the job kept running while the auto-scaler was down: what was learned on it still holds
+            self.__log.info("[LOOP] State restored: no warm-up")
+            self.__decisions_from = asyncio.get_running_loop().time()
+        else:
+            self.__hold_decisions()
+        self.__log.info(f"[LOOP]:: Monitoring the throughput and back pressure every {self.__interval} seconds...")
+
+        tasks = [asyncio.create_task(self.__periodic(self.__sampling, self.__sample)),
+                 asyncio.create_task(self.__periodic(self.__interval, self.__monitor)),
+                 asyncio.create_task(self.__periodic(self.__housekeeping, self.__housekeep))]
+
+        try:
+            await self.__stopped.wait()
+        finally:
+            # no reconfiguration is started anymore, the one in progress and the running tasks end before the close
+            self.__stopped.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.__reconf_task is not None:
+                if not self.__reconf_task.done():
+                    self.__log.info("[LOOP] Waiting for the re-configuration in progress")
+                await asyncio.gather(self.__reconf_task, return_exceptions=True)
+            self.__persist()
+            self.__controller.close()
+            self.__resource_manager.close()
+
+            profiler.dump()
@@ -0,0 +1,86 @@
+from numpy import absolute, arange, median, ndarray, pi, zeros
+from scipy.stats import trim_mean
+
+from transscale.utils.DefaultValues import DefaultValues
+
+# scale of the median absolute deviation to the standard deviation of normal samples
+MAD_SCALE = 1.4826
+
+
+# Bounded buffer of the timestamped mst samples of a configuration, aggregated robustly
+class MeasurementSamples:
+
+    def __init__(self, size: int, max_age: float, aggregation: str, trim: float, outlier_threshold: float):
+        self.__size = size
+        self.__max_age = max_age
+        self.__aggregation = aggregation
+        self.__trim = trim
+        self.__outlier_threshold = outlier_threshold
+
+        self.__times = zeros(size)
+        self.__values = zeros(size)
+        self.__head = 0
+        self.__count = 0
+        # (aggregate, variance) of the samples, until the next one
+        self.__aggregate = None
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def add(self, time: float, value: float) -> None:
+        # a sample is recorded once, however many times it is reported
+        if self.__count > 0 and self.__times[self.__head - 1] == time:
+            return
+
+        self.__times[self.__head] = time
+        self.__values[self.__head] = value
+        self.__head = (self.__head + 1) % self.__size
+        self.__count = min(self.__count + 1, self.__size)
+        self.__aggregate = None
+
+    # Replaces the samples with saved ones, oldest first, and their aggregate if it is known
+    def restore(self, times: ndarray, values: ndarray, aggregate: tuple[float, float] = None) -> None:
+        n = min(len(values), self.__size)
+        self.__times[:n] = times[len(times) - n:]
+        self.__values[:n] = values[len(values) - n:]
+        self.__head = n % self.__size
+        self.__count = n
+        self.__aggregate = aggregate if n == len(values) else None
+
+    # Returns the times and the values of all the samples, oldest first
+    def get_samples(self) -> tuple[ndarray, ndarray]:
+        index = (self.__head - self.__count + arange(self.__count)) % self.__size
+        return self.__times[index], self.__values[index]
+
+    def get_window(self) -> ndarray:
+        # the samples no older than max_age before the last one, oldest first
+        times, values = self.get_samples()
+        if self.__max_age > 0:
+            values = values[times >= times[-1] - self.__max_age]
+        return values
+
+    # Returns the aggregate of the samples and its variance, 0 when a single sample is kept
+    def get_aggregate(self) -> tuple[float, float]:
+        if self.__aggregate is None:
+            self.__aggregate = self.__get_aggregate(self.get_window())
+        return self.__aggregate
+
+    def __get_aggregate(self, values: ndarray) -> tuple[float, float]:
+        # samples too far from the median, in median absolute deviations, are outliers
+        center = median(values)
+        deviation = absolute(values - center)
+        mad = MAD_SCALE * median(deviation)
+        if mad > 0:
+            values = values[deviation <= self.__outlier_threshold * mad]
+
+        n = len(values)
+        if self.__aggregation == DefaultValues.Measurements.AGGREGATION_TRIMMED:
+            value = float(trim_mean(values, self.__trim))
+            efficiency = 1.0
+        else:
+            value = float(median(values))
+            # the median of normal samples is pi / 2 times less efficient than the mean
+            efficiency = pi / 2
+
+        variance = efficiency * float(values.var(ddof=1)) / n if n > 1 else 0.0
+        return value, variance
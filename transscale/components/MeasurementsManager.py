@@ -1,54 +1,148 @@
-from numpy import zeros, ndarray
+from numpy import array, full, isnan, nan, zeros, ndarray
+from transscale.components.MeasurementSamples import MeasurementSamples
 from transscale.components.RuntimeContext import RuntimeContext
 from transscale.utils.Config import Config
 from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
 import traceback
 
 from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
 
 
 class MeasurementsManager:
 
     def __init__(self, conf: Config, log: Logger):
-        self.__mst_by_par = zeros([conf.get_int(Key.MAX_PAR) + 1, conf.get_int(Key.MAX_TRANSP) + 1])
-        self.__mst_by_transp = self.__mst_by_par.transpose()
-        self.__ndmax = zeros([conf.get_int(Key.MAX_PAR) + 1])
+        self.__max_par = conf.get_int(Key.MAX_PAR)
+        self.__max_transp = conf.get_int(Key.MAX_TRANSP)
+
+        self.__samples_size = conf.get_int(Key.MEASUREMENTS_SAMPLES)
+        self.__max_age = conf.get_float(Key.MEASUREMENTS_MAX_AGE)
+        self.__aggregation = conf.get_str(Key.MEASUREMENTS_AGGREGATION)
+        self.__trim = conf.get_float(Key.MEASUREMENTS_TRIM)
+        self.__outlier_threshold = conf.get_float(Key.MEASUREMENTS_OUTLIER_THRESHOLD)
+        if self.__aggregation not in [DefaultValues.Measurements.AGGREGATION_MEDIAN,
+                                      DefaultValues.Measurements.AGGREGATION_TRIMMED]:
+            raise ValueError(f"Unknown measurements aggregation {self.__aggregation}")
+
+        # the samples of each observed configuration, and their aggregate and its variance
+        self.__samples = {}
+        self.__variances = {}
+        # only the observed cells are stored, by coordinates and by line: the grid is never allocated
+        self.__cells = {}
+        self.__by_par = {}
+        self.__by_transp = {}
+        self.__ndmax = {}
+        # cells and network delays changed since the prediction matrix last read them
+        self.__changed_cells = set()
+        self.__changed_nd = False
         self.__debug = conf.get(Key.DEBUG_LEVEL)
         self.__log = log
 
+    @staticmethod
+    def __to_dense(line: dict[int, float], size: int) -> ndarray:
+        dense = zeros([size + 1])
+        for i, mst in line.items():
+            dense[i] = mst
+        return dense
+
     def get_measurements(self, par: int = None, transp: int = None) -> int | list[int] | ndarray:
         if par and transp:
-            return self.__mst_by_par[par, transp]
+            return self.__cells.get((par, transp), 0)
+        elif par and not transp:
+            return self.__to_dense(self.__by_par.get(par, {}), self.__max_transp)
+        elif not par and transp:
+            return self.__to_dense(self.__by_transp.get(transp, {}), self.__max_par)
+        else:
+            measurements = zeros([self.__max_par + 1, self.__max_transp + 1])
+            for cell, mst in self.__cells.items():
+                measurements[cell] = mst
+            return measurements
+
+    # Returns the variances of the measurements, laid out as get_measurements: 0 where unknown
+    def get_variances(self, par: int = None, transp: int = None) -> float | ndarray:
+        if par and transp:
+            return self.__variances.get((par, transp), 0.0)
         elif par and not transp:
-            return self.__mst_by_par[par]
+            return self.__to_dense({t: self.__variances[(par, t)] for t in self.__by_par.get(par, {})},
+                                   self.__max_transp)
         elif not par and transp:
-            return self.__mst_by_transp[transp]
+            return self.__to_dense({p: self.__variances[(p, transp)] for p in self.__by_transp.get(transp, {})},
+                                   self.__max_par)
         else:
-            return self.__mst_by_par
+            variances = zeros([self.__max_par + 1, self.__max_transp + 1])
+            for cell, variance in self.__variances.items():
+                variances[cell] = variance
+            return variances
+
+    # Returns the indices, the msts and their variances of the observed cells of a row (par) or a column (transp)
+    def get_line(self, par: int = None, transp: int = None) -> tuple[ndarray, ndarray, ndarray]:
+        line = self.__by_par.get(par, {}) if par else self.__by_transp.get(transp, {})
+        indices = sorted(line)
+        cells = [(par, i) for i in indices] if par else [(i, transp) for i in indices]
+        return array(indices, dtype=int), array([line[i] for i in indices], dtype=float), \
+            array([self.__variances[cell] for cell in cells], dtype=float)
+
+    def get_observed_pars(self) -> list[int]:
+        return sorted(self.__by_par)
+
+    def get_observed_transps(self) -> list[int]:
+        return sorted(self.__by_transp)
 
     # Called by the parallelism controller
     # Returns the number of measurements at different parallelism levels for the current transp level
     def get_measurements_num_par(self, transp: int) -> int:
-        return len([x for x in self.__mst_by_transp[transp] if x > 0])
+        return len(self.__by_transp.get(transp, {}))
 
     # Called by the transprecision controller
     # Returns the number of measurements at different transprecision levels for the current par level
     def get_measurements_num_transp(self, par: int) -> int:
-        return len([x for x in self.__mst_by_par[par] if x > 0])
+        return len(self.__by_par.get(par, {}))
 
     def get_network_distance(self) -> list[int]:
-        return list(self.__ndmax)
+        return list(self.get_network_delays())
+
+    # Returns the network delays of all the parallelism levels, 0 where unknown
+    def get_network_delays(self) -> ndarray:
+        delays = zeros([self.__max_par + 1])
+        for par, nd in self.__ndmax.items():
+            delays[par] = nd
+        return delays
 
     def get_ndmax(self, par: int) -> int:
-        return self.__ndmax[par]
+        return self.__ndmax.get(par, 0)
 
+    # Adds the current sample of the mst to the measurements of the current configuration
     def update_mst(self, context: RuntimeContext) -> None:
         par = context.get_current_par()
         transp = context.get_current_transp()
         mst = context.get_source_input_rate()
         try:
-            self.__mst_by_par[par, transp] = mst
-            self.__mst_by_transp[transp, par] = mst
+            with profiler.span("measurements.update_mst"):
+                if not (0 <= par <= self.__max_par and 0 <= transp <= self.__max_transp):
+                    raise IndexError(f"({par}, {transp}) is out of the configuration space")
+
+                # a null mst is not a measurement, e.g. a sample taken while the sources were idle
+                if mst <= 0:
+                    self.__log.debugg(f"[MEASUREMENTS] Null mst at ({par}, {transp}) ignored")
+                    return
+
+                cell = (par, transp)
+                if cell not in self.__samples:
+                    self.__samples[cell] = MeasurementSamples(self.__samples_size, self.__max_age, self.__aggregation,
+                                                              self.__trim, self.__outlier_threshold)
+                samples = self.__samples[cell]
+                samples.add(context.get_sample_time(), mst)
+                value, variance = samples.get_aggregate()
+
+                if self.__cells.get(cell, 0) != value or self.__variances.get(cell, 0) != variance:
+                    self.__changed_cells.add(cell)
+                self.__cells[cell] = value
+                self.__variances[cell] = variance
+                self.__by_par.setdefault(par, {})[transp] = value
+                self.__by_transp.setdefault(transp, {})[par] = value
+                self.__log.debugg(f"[MEASUREMENTS] ({par}, {transp}): mst {value:.1f} +- {variance ** 0.5:.1f} "
+                                  f"on {len(samples)} samples")
         except IndexError as err:
             self.__log.error(str(traceback.format_exception(None, err, err.__traceback__)))
             self.__log.info(f"par is {par} type {type(par)}")
@@ -58,6 +152,69 @@ class MeasurementsManager:
 
     def update_nd(self, context: RuntimeContext, nd_max: int) -> None:
         par = context.get_current_par()
+        if not 0 <= par <= self.__max_par:
+            raise IndexError(f"Parallelism {par} is out of the configuration space")
+        if self.__ndmax.get(par, 0) != nd_max:
+            self.__changed_nd = True
         self.__ndmax[par] = nd_max
 
+    def __get_aggregation_settings(self) -> ndarray:
+        trimmed = self.__aggregation == DefaultValues.Measurements.AGGREGATION_TRIMMED
+        return array([self.__max_age, float(trimmed), self.__trim, self.__outlier_threshold])
+
+    # Returns the samples of all the measurements and the network delays as arrays, to be saved
+    def get_state(self) -> dict[str, ndarray]:
+        cells = sorted(self.__samples)
+        times = full([len(cells), self.__samples_size], nan)
+        values = full([len(cells), self.__samples_size], nan)
+        for row, cell in enumerate(cells):
+            cell_times, cell_values = self.__samples[cell].get_samples()
+            times[row, :len(cell_times)] = cell_times
+            values[row, :len(cell_values)] = cell_values
+
+        aggregates = array([(self.__cells[cell], self.__variances[cell]) for cell in cells], dtype=float)
+        delays = sorted(self.__ndmax.items())
+        return {"cells": array(cells, dtype=int).reshape(-1, 2), "times": times, "values": values,
+                "aggregates": aggregates.reshape(-1, 2),
+                "settings": self.__get_aggregation_settings(),
+                "delays": array(delays, dtype=float).reshape(-1, 2)}
+
+    # Replaces the measurements with saved ones, the samples out of the configuration space are dropped
+    def set_state(self, state: dict[str, ndarray]) -> None:
+        # the rows of the cells with fewer samples are padded with nan
+        times, values = array(state["times"]), array(state["values"])
+        counts = (~isnan(values)).sum(axis=1)
+        # the saved aggregates are the ones of the current settings only
+        same_settings = array(state["settings"]).tolist() == self.__get_aggregation_settings().tolist()
+
+        samples = {}
+        for (par, transp), cell_times, cell_values, count, (value, variance) in zip(
+                state["cells"].tolist(), times, values, counts, state["aggregates"].tolist()):
+            if count == 0 or not (0 <= par <= self.__max_par and 0 <= transp <= self.__max_transp):
+                continue
+            samples[(par, transp)] = MeasurementSamples(self.__samples_size, self.__max_age, self.__aggregation,
+                                                        self.__trim, self.__outlier_threshold)
+            # the aggregate is kept, unless the buffer is now too short for all the samples
+            samples[(par, transp)].restore(cell_times[:count], cell_values[:count],
+                                           (value, variance) if same_settings else None)
+        ndmax = {int(par): nd for par, nd in state["delays"].tolist() if 0 <= par <= self.__max_par}
+
+        self.__samples = samples
+        self.__cells, self.__variances, self.__by_par, self.__by_transp = {}, {}, {}, {}
+        for (par, transp), cell_samples in self.__samples.items():
+            value, variance = cell_samples.get_aggregate()
+            self.__cells[(par, transp)] = value
+            self.__variances[(par, transp)] = variance
+            self.__by_par.setdefault(par, {})[transp] = value
+            self.__by_transp.setdefault(transp, {})[par] = value
+        self.__ndmax = ndmax
+        # the prediction engine restores its own state: the measurements are not changes for it
+        self.__changed_cells = set()
+        self.__changed_nd = False
 
+    # Returns the cells updated since the last call, and whether any network delay changed meanwhile
+    def pop_changes(self) -> tuple[set[tuple[int, int]], bool]:
+        changes = self.__changed_cells, self.__changed_nd
+        self.__changed_cells = set()
+        self.__changed_nd = False
+        return changes
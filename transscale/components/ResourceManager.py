@@ -1,13 +1,18 @@
-from time import sleep
+from time import monotonic, sleep
+import re
 import subprocess as sp
 import shlex as sx
 from os.path import expanduser
 import traceback
+from typing import Callable
 
 from transscale.components.RuntimeContext import RuntimeContext
 from transscale.utils.Config import Config
 from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
 from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.cluster.ClusterBackend import init_cluster_backend
 
 
 class ResourceManager:
@@ -22,15 +27,46 @@ class ResourceManager:
         self.__log = log
 
         self.__nodes = self.get_nodes()
-        self.__kube_ssh = "pico1"
+        self.__cluster = init_cluster_backend(conf, log)
 
         self.__redis_home = expanduser(conf.get(Key.REDIS_HOME))
+        self.__redis_cli = expanduser(conf.get(Key.REDIS_CLI)) if conf.get(Key.REDIS_CLI) \
+            else f"{self.__redis_home}/src/redis-cli"
         self.__redis_db_num = conf.get(Key.REDIS_DB)
         self.__redis_host = conf.get(Key.REDIS_HOST)
         self.__redis_port = conf.get(Key.REDIS_PORT)
 
         self.__flink_cmd = expanduser(conf.get(Key.FLINK_CMD))
         self.__job_path = expanduser(conf.get(Key.FLINK_JOB_PATH))
+        self.__job_name = conf.get_str(Key.FLINK_JOB_NAME)
+
+        self.__mode = conf.get_str(Key.RECONF_MODE)
+        if self.__mode not in [DefaultValues.Reconfiguration.MODE_CANCEL, DefaultValues.Reconfiguration.MODE_SAVEPOINT]:
+            raise ValueError(f"Unknown reconfiguration mode {self.__mode}")
+        self.__savepoint_path = expanduser(conf.get_str(Key.RECONF_SAVEPOINT_PATH))
+        self.__taskmanagers_reset = conf.get_bool(Key.RECONF_TASKMANAGERS_RESET)
+        # replicas of the task manager deployment, only scaled by the auto-scaler: unknown until its first scale
+        self.__replicas = None
+        self.__in_place_mode = conf.get_str(Key.RECONF_IN_PLACE)
+        if self.__in_place_mode not in [DefaultValues.Reconfiguration.IN_PLACE_AUTO,
+                                        DefaultValues.Reconfiguration.IN_PLACE_ALWAYS,
+                                        DefaultValues.Reconfiguration.IN_PLACE_NEVER]:
+            raise ValueError(f"Unknown in-place reconfiguration mode {self.__in_place_mode}")
+        # whether the cluster rescales jobs in place, unknown until its first parallelism reconfiguration
+        self.__in_place = None
+
+        self.__poll_interval = conf.get_float(Key.RECONF_POLL_INTERVAL)
+        self.__cancel_timeout = conf.get_float(Key.RECONF_CANCEL_TIMEOUT)
+        self.__taskmanagers_timeout = conf.get_float(Key.RECONF_TASKMANAGERS_TIMEOUT)
+        self.__job_timeout = conf.get_float(Key.RECONF_JOB_TIMEOUT)
+        self.__transp_timeout = conf.get_float(Key.RECONF_TRANSP_TIMEOUT)
+        self.__savepoint_timeout = conf.get_float(Key.RECONF_SAVEPOINT_TIMEOUT)
+        self.__rescale_timeout = conf.get_float(Key.RECONF_RESCALE_TIMEOUT)
+        # duration of each step of the last reconfiguration, in seconds, the savepoint it was restored from, and
+        # the task managers it started and stopped
+        self.__timings = {}
+        self.__savepoint = {}
+        self.__pods = {}
 
     def get_nodes(self) -> list[__Node]:
         clus_nodes = [self.__Node("", "", 0) for i in range(10)]
@@ -50,36 +86,250 @@ class ResourceManager:
     def get_max_network_delay(self, par: int) -> int:
         return self.__nodes[par].delay
 
-    def rescale_parallelism(self, context: RuntimeContext) -> bool:
-        cluster_ip = context.get_cluster_ip()
-        job_id = context.get_job_id()
+    # Returns the duration of each step of the last reconfiguration, until the one that failed
+    def get_last_timings(self) -> dict[str, float]:
+        return dict(self.__timings)
+
+    # Returns the location, size in bytes and duration in seconds of the savepoint of the last reconfiguration
+    def get_last_savepoint(self) -> dict[str, any]:
+        return dict(self.__savepoint)
+
+    # Returns the number of task manager pods started and stopped by the last reconfiguration
+    def get_last_pods(self) -> dict[str, int]:
+        return dict(self.__pods)
+
+    def __wait_for(self, step: str, timeout: float, is_ready: Callable[[], bool]) -> bool:
+        # polls the state reported by the cluster until the step is over, instead of sleeping a fixed time
+        start = monotonic()
+        with profiler.span(f"rescale.wait.{step}"):
+            while True:
+                try:
+                    if is_ready():
+                        break
+                except (OSError, LookupError, ValueError) as err:
+                    # e.g. the JobManager does not answer while the task managers restart
+                    self.__log.debugg(f"[RES_MNGR] Waiting for {step}: {err}")
+
+                if monotonic() - start >= timeout:
+                    self.__log.error(f"[RES_MNGR] Step {step} not over after {timeout} seconds")
+                    return False
+                sleep(self.__poll_interval)
+
+        self.__timings[step] = monotonic() - start
+        self.__log.debug(f"\t Step {step} over in {self.__timings[step]:.1f} s")
+        return True
+
+    @staticmethod
+    def __is_job_stopped(context: RuntimeContext, job_id: str) -> bool:
+        job = context.poll_job(job_id)
+        # a job no longer listed has been archived, thus stopped
+        return job is None or job["state"] in ["CANCELED", "FAILED", "FINISHED"]
+
+    def __is_job_running(self, context: RuntimeContext, old_job_id: str, job_id: str | None) -> bool:
+        if job_id is None:
+            # the id was not printed by the client: the job is the last one started with the name of the monitored one,
+            # the other jobs of the cluster are not ours
+            running = [j for j in context.poll_jobs() if j["state"] == "RUNNING" and j["jid"] != old_job_id
+                       and (not self.__job_name or j["name"] == self.__job_name)]
+            if len(running) == 0:
+                return False
+            job_id = max(running, key=lambda j: j.get("start-time", 0))["jid"]
+
+        job = context.poll_job(job_id)
+        # the job is RUNNING as soon as it is scheduled, its tasks only once they are deployed
+        return job is not None and job["state"] == "RUNNING" and all(v["status"] == "RUNNING"
+                                                                     for v in job["vertices"])
+
+    @staticmethod
+    def __is_job_rescaled(context: RuntimeContext, job_id: str, par: int) -> bool:
+        job = context.poll_job(job_id)
+        # the id of the job is kept, the new parallelism shows in its vertices once they are deployed again
+        return job is not None and job["state"] == "RUNNING" and all(v["status"] == "RUNNING"
+                                                                     and v["parallelism"] == par
+                                                                     for v in job["vertices"])
+
+    @staticmethod
+    def __are_taskmanagers_ready(context: RuntimeContext, slots: int) -> bool:
+        # task managers outside of the deployment may be registered as well: only the free slots are required
+        return context.poll_cluster_overview()["slots-available"] >= slots
+
+    @staticmethod
+    def __are_taskmanagers_released(context: RuntimeContext, registered: int) -> bool:
+        return context.poll_cluster_overview()["taskmanagers"] <= registered
+
+    def __stop_with_savepoint(self, context: RuntimeContext, job_id: str) -> str | None:
+        # Returns the location of the savepoint, None if it could not be taken
+        self.__log.info(f"[RES_MNGR] Stopping Flink with a savepoint for re-configuration...")
+        with profiler.span("rescale.savepoint_trigger"):
+            request_id = context.trigger_savepoint(job_id, self.__savepoint_path)
+        self.__log.debug(f"\t Savepoint requested: {request_id}")
+
+        # the savepoint is taken asynchronously: its status is polled until the operation completes
+        operation = {}
+
+        def is_completed() -> bool:
+            res = context.poll_savepoint(job_id, request_id)
+            if res["status"]["id"] != "COMPLETED":
+                return False
+            operation.update(res.get("operation", {}))
+            return True
+
+        if not self.__wait_for("savepoint", self.__savepoint_timeout, is_completed):
+            return None
+        if "location" not in operation:
+            cause = operation.get("failure-cause", {})
+            self.__log.error(f"[RES_MNGR] Savepoint failed: {cause.get('class', cause)}")
+            self.__log.debug(f"\t{cause.get('stack-trace', '')}")
+            return None
+
+        # the size of the savepoint is only in the statistics of the checkpoints of the job
+        size = None
+        try:
+            savepoint = (context.poll_checkpoints(job_id).get("latest") or {}).get("savepoint") or {}
+            if savepoint.get("external_path") == operation["location"]:
+                size = savepoint.get("state_size")
+        except (OSError, LookupError, ValueError) as err:
+            self.__log.debugg(f"[RES_MNGR] No statistics of the savepoint: {err}")
+
+        self.__savepoint = {"location": operation["location"], "size": size, "duration": self.__timings["savepoint"]}
+        self.__log.info(f"[RES_MNGR] Savepoint of {size if size is not None else 'unknown'} bytes taken in "
+                        f"{self.__timings['savepoint']:.1f} s: {operation['location']}")
+        return operation["location"]
+
+    def __supports_in_place(self, context: RuntimeContext, job_id: str) -> bool:
+        if self.__in_place is not None:
+            return self.__in_place
+
+        if self.__in_place_mode != DefaultValues.Reconfiguration.IN_PLACE_AUTO:
+            self.__in_place = self.__in_place_mode == DefaultValues.Reconfiguration.IN_PLACE_ALWAYS
+            return self.__in_place
+
+        # only the adaptive scheduler serves the resource requirements of the jobs
+        try:
+            scheduler = context.poll_jobmanager_config().get("jobmanager.scheduler", "default")
+            # Flink reads the value of the option case-insensitively, e.g. Adaptive
+            adaptive = str(scheduler).lower() == "adaptive"
+            requirements = context.poll_resource_requirements(job_id) if adaptive else None
+        except (OSError, LookupError, ValueError) as err:
+            # the capability is detected again at the next reconfiguration
+            self.__log.debugg(f"[RES_MNGR] Cannot detect the scheduler of the cluster: {err}")
+            return False
+
+        self.__in_place = isinstance(requirements, dict) and len(requirements) > 0 and "errors" not in requirements
+        self.__log.info(f"[RES_MNGR] Scheduler of the cluster: {scheduler} -- parallelism re-configured "
+                        f"{'in place' if self.__in_place else 'by restarting the job'}")
+        return self.__in_place
+
+    def __rescale_in_place(self, context: RuntimeContext, job_id: str) -> bool:
+        current_par = context.get_current_par()
         target_par = context.get_target_par()
 
-        self.__log.info("\n*******************************************************")
-        self.__log.info(f"[RES_MNGR] Re-configuring PARALLELISM")
-        self.__log.info(f"\tCurrent Parallelism: {context.get_current_par()}")
-        self.__log.info(f"\tTarget Parallelism: {target_par}")
+        if target_par > current_par:
+            # the scheduler can only use the slots of the task managers already registered
+            self.__log.info(f"\n[RES_MNGR] Re-scaling number of task managers...")
+            if not self.__scale_taskmanagers(context, target_par):
+                return False
+            if not self.__wait_for("taskmanagers", self.__taskmanagers_timeout,
+                                   lambda: self.__are_taskmanagers_ready(context, target_par - current_par)):
+                return False
+
+        self.__log.info(f"[RES_MNGR] Re-scaling Flink in place...")
+        requirements = context.poll_resource_requirements(job_id)
+        for vertex in requirements.values():
+            bounds = vertex["parallelism"]
+            bounds["lowerBound"] = min(bounds["lowerBound"], target_par)
+            bounds["upperBound"] = target_par
+        self.__log.debug(f"\t Resource requirements: {requirements}")
 
         try:
-            # TODO: Flink checkpointing
+            with profiler.span("rescale.requirements"):
+                context.set_resource_requirements(job_id, requirements)
+        except (OSError, LookupError) as err:
+            if self.__in_place_mode != DefaultValues.Reconfiguration.IN_PLACE_AUTO:
+                raise
+            # the job keeps running as it was, it is restarted instead
+            self.__log.warning(f"[RES_MNGR] Resource requirements rejected, restarting the job instead: {err}")
+            self.__in_place = False
+            return self.__rescale_by_restart(context, job_id)
+
+        if not self.__wait_for("rescale", self.__rescale_timeout,
+                               lambda: self.__is_job_rescaled(context, job_id, target_par)):
+            return False
+
+        if target_par < current_par:
+            # the idle task managers are released once the job runs on the others
+            self.__log.info(f"\n[RES_MNGR] Re-scaling number of task managers...")
+            if not self.__release_taskmanagers(context, target_par, "taskmanagers"):
+                return False
+            # a removed task manager that still ran tasks makes the job restart on the remaining ones
+            if not self.__wait_for("job", self.__job_timeout,
+                                   lambda: self.__is_job_rescaled(context, job_id, target_par)):
+                return False
+        return True
+
+    def __rescale_by_restart(self, context: RuntimeContext, job_id: str) -> bool:
+        cluster_ip = context.get_cluster_ip()
+        target_par = context.get_target_par()
 
+        savepoint = None
+        if self.__mode == DefaultValues.Reconfiguration.MODE_SAVEPOINT:
+            # the job restarts from its state, instead of reprocessing or skipping the records in flight
+            savepoint = self.__stop_with_savepoint(context, job_id)
+            if savepoint is None:
+                return False
+            if not self.__wait_for("stop", self.__cancel_timeout, lambda: self.__is_job_stopped(context, job_id)):
+                return False
+        else:
             self.__log.info(f"[RES_MNGR] Stopping Flink for re-configuration...")
             stop_cmd = f"{self.__flink_cmd} cancel -m {cluster_ip} {job_id}"
             self.__log.debug(f"\t Running command: {stop_cmd}")
-            proc = sp.run(sx.split(stop_cmd), capture_output=True, check=True)
+            with profiler.span("rescale.flink_cancel"):
+                proc = sp.run(sx.split(stop_cmd), capture_output=True, check=True)
             self.__log.debug(f"\t Exit code: {proc.returncode}")
-            sleep(15)  # TODO: parametrize sleeping time
+            if not self.__wait_for("cancel", self.__cancel_timeout,
+                                   lambda: self.__is_job_stopped(context, job_id)):
+                return False
 
-            self.__log.info(f"\n[RES_MNGR] Re-scaling number of task managers...")
-            proc = self.__rescale_kube(context)
-            proc.check_returncode()
-            sleep(5)  # TODO: parametrize sleeping time
+        self.__log.info(f"\n[RES_MNGR] Re-scaling number of task managers...")
+        if not self.__rescale_kube(context):
+            return False
+        # the slots of the cancelled job are free once its task managers are registered again
+        if not self.__wait_for("taskmanagers", self.__taskmanagers_timeout,
+                               lambda: self.__are_taskmanagers_ready(context, target_par)):
+            return False
 
-            self.__log.info(f"\n[RES_MNGR] Resuming Flink with new configuration...")
-            run_cmd = f"{self.__flink_cmd} run -d -m {cluster_ip} -p {target_par} -j {self.__job_path}"
-            self.__log.debug(f"\t Running command: {run_cmd}")
+        self.__log.info(f"\n[RES_MNGR] Resuming Flink with new configuration...")
+        restore = f"-s {savepoint} " if savepoint is not None else ""
+        run_cmd = f"{self.__flink_cmd} run -d -m {cluster_ip} -p {target_par} {restore}-j {self.__job_path}"
+        self.__log.debug(f"\t Running command: {run_cmd}")
+        with profiler.span("rescale.flink_run"):
             proc = sp.run(sx.split(run_cmd), capture_output=True, check=True)
-            self.__log.debug(f"\t Exit code: {proc.returncode}")
+        self.__log.debug(f"\t Exit code: {proc.returncode}")
+
+        submitted = re.search(r"JobID ([0-9a-f]+)", proc.stdout.decode(errors="replace"))
+        new_job_id = submitted.group(1) if submitted else None
+        return self.__wait_for("job", self.__job_timeout,
+                               lambda: self.__is_job_running(context, job_id, new_job_id))
+
+    def rescale_parallelism(self, context: RuntimeContext) -> bool:
+        job_id = context.get_job_id()
+
+        self.__log.info("\n*******************************************************")
+        self.__log.info(f"[RES_MNGR] Re-configuring PARALLELISM")
+        self.__log.info(f"\tCurrent Parallelism: {context.get_current_par()}")
+        self.__log.info(f"\tTarget Parallelism: {context.get_target_par()}")
+
+        self.__timings = {}
+        self.__savepoint = {}
+        self.__pods = {"started": 0, "stopped": 0}
+        start = monotonic()
+        try:
+            if self.__supports_in_place(context, job_id):
+                reconfigured = self.__rescale_in_place(context, job_id)
+            else:
+                reconfigured = self.__rescale_by_restart(context, job_id)
+            if not reconfigured:
+                return False
 
         except sp.CalledProcessError as e:
             self.__log.new_line()
@@ -91,7 +341,14 @@ class ResourceManager:
             self.__log.info("\nSTDERR")
             self.__log.info(e.stderr)
             return False
+        except (OSError, LookupError, ValueError) as err:
+            # a request to the REST API failed, e.g. the trigger of the savepoint
+            self.__log.error(f"[RES_MNGR] Re-configuration failed: {err}")
+            return False
 
+        steps = " -- ".join([f"{step} {duration:.1f} s" for step, duration in self.__timings.items()])
+        self.__log.info(f"[RES_MNGR] Parallelism re-configured in {monotonic() - start:.1f} s: {steps}")
+        self.__log.info(f"\tTask managers started: {self.__pods['started']} -- stopped: {self.__pods['stopped']}")
         return True
 
     def rescale_transprecision(self, context: RuntimeContext) -> bool:
@@ -103,43 +360,66 @@ class ResourceManager:
         self.__log.info(f"\tTarget Transprecision: {target_transp}")
 
         self.__log.info(f"[RES_MNGR] Changing Transprecision Level...")
-        redis_cmd = f"{self.__redis_home}/src/redis-cli -n {self.__redis_db_num} " \
+        redis_cmd = f"{self.__redis_cli} -n {self.__redis_db_num} " \
                     f"-h {self.__redis_host} -p {self.__redis_port} " \
                     f"set transprecision_level {target_transp}"
-        sp.run(sx.split(redis_cmd), capture_output=True, check=True)
+        self.__timings = {}
+        self.__savepoint = {}
+        self.__pods = {}
+        with profiler.span("rescale.redis"):
+            sp.run(sx.split(redis_cmd), capture_output=True, check=True)
 
-        while context.get_current_transp() != target_transp:
-            sleep(5)  # TODO: parametrize sleeping time
-            context.update_state()
+        def is_applied() -> bool:
+            context.update_state(refresh=True)
             self.__log.debug(f"\tCurrent Transprecision: {context.get_current_transp()}")
             self.__log.debug(f"\tTarget Transprecision: {target_transp}")
+            return context.get_current_transp() == target_transp
+
+        if not self.__wait_for("transprecision", self.__transp_timeout, is_applied):
+            return False
 
+        self.__log.info(f"[RES_MNGR] Transprecision re-configured in {self.__timings['transprecision']:.1f} s")
         return True
 
-    def __rescale_kube(self, context: RuntimeContext) -> sp.CompletedProcess:
+    def __rescale_kube(self, context: RuntimeContext) -> bool:
         current_par = context.get_current_par()
         target_par = context.get_target_par()
 
-        increase_cmd = f"sshpass -p pico ssh guru@{self.__kube_ssh} " \
-                       f"kubectl scale --replicas={target_par} deployment/flink-taskmanager"
-        reset_cmd = f"sshpass -p pico ssh guru@{self.__kube_ssh} " \
-                    f"kubectl scale --replicas=0 deployment/flink-taskmanager"
+        # all the task managers must be gone, otherwise the deployment would keep some of the old ones
+        if self.__taskmanagers_reset and target_par <= current_par \
+                and not self.__release_taskmanagers(context, 0, "taskmanagers_stop"):
+            return False
 
-        proc = None
-        try:
-            if target_par > current_par:
-                self.__log.debug(f"\t Running command: {increase_cmd}")
-                proc = sp.run(sx.split(increase_cmd), capture_output=True, check=True)
-                self.__log.debug(f"\t Exit code: {proc.returncode}")
-            else:
-                self.__log.debug(f"\t Running command: {reset_cmd}")
-                proc = sp.run(sx.split(reset_cmd), capture_output=True, check=True)
-                self.__log.debug(f"\t Exit code: {proc.returncode}")
-                sleep(15)
-                self.__log.debug(f"\t Running command: {increase_cmd}")
-                proc = sp.run(sx.split(increase_cmd), capture_output=True, check=True)
-                self.__log.debug(f"\t Exit code: {proc.returncode}")
-        except sp.CalledProcessError:
-            return proc
-
-        return proc
+        # the task managers of the stopped job are idle: only the surplus ones are removed, the others kept warm
+        return self.__scale_taskmanagers(context, target_par)
+
+    def __get_replicas(self, context: RuntimeContext) -> int:
+        # before its first scale, the deployment runs one task manager per task of the job
+        return self.__replicas if self.__replicas is not None else context.get_current_par()
+
+    def __release_taskmanagers(self, context: RuntimeContext, replicas: int, step: str) -> bool:
+        # waits for the task managers removed from the deployment to unregister, the other ones stay registered
+        removed = max(self.__get_replicas(context) - replicas, 0)
+        registered = context.poll_cluster_overview()["taskmanagers"]
+        if not self.__scale_taskmanagers(context, replicas):
+            return False
+        return self.__wait_for(step, self.__taskmanagers_timeout,
+                               lambda: self.__are_taskmanagers_released(context, registered - removed))
+
+    def __scale_taskmanagers(self, context: RuntimeContext, replicas: int) -> bool:
+        previous = self.__get_replicas(context)
+        with profiler.span("rescale.kubectl"):
+            self.__cluster.scale(replicas)
+        self.__replicas = replicas
+        self.__pods["started"] += max(replicas - previous, 0)
+        self.__pods["stopped"] += max(previous - replicas, 0)
+
+        if not self.__cluster.watches_pods:
+            return True
+        # the pods are ready before their task managers register to the JobManager
+        deadline = monotonic() + self.__taskmanagers_timeout
+        return self.__wait_for("pods", self.__taskmanagers_timeout,
+                               lambda: self.__cluster.wait_for_pods(replicas, max(deadline - monotonic(), 0)))
+
+    def close(self) -> None:
+        self.__cluster.close()
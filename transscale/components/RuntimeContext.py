@@ -1,8 +1,20 @@
+from threading import RLock
+from time import monotonic, time
 from typing import Tuple
-import requests as req
+from numpy import zeros
 from transscale.utils.Config import Config
 from transscale.utils.DefaultValues import ConfigKeys as Key
 from transscale.utils.Logger import Logger
+from transscale.utils.metrics.JobGraph import JobGraph, Job, JobVertex, SUBTASK_METRICS
+from transscale.utils.metrics.MetricsBackend import init_backend
+from transscale.utils.metrics.MetricSeries import MetricSeries
+from transscale.utils.metrics.MetricsCollector import MetricsCollector, MetricNotFoundError
+from transscale.utils.metrics.SubtaskStats import SubtaskStats
+from transscale.utils.metrics.TraceRecorder import TraceRecorder
+
+SERIES_BACKPRESSURE = "backpressure"
+SERIES_SOURCE_RATE = "source_rate"
+SERIES_OPERATOR_TPUT = "operator_tput"
 
 
 class RuntimeState:
@@ -22,24 +34,25 @@ class RuntimeState:
 
 class RuntimeContext:
 
-    def __init__(self, conf: Config, log: Logger):
-        self.__job_id = None
-        self.__operator_id = None
-        self.__operator_name = None
-        self.__source_id = None
-
-        self.__job_url = None
-        self.__operator_url = None
-        self.__transprecision_url = None
-        self.__source_url = None
-        self.__source_backpressure_url = None
-        self.__source_tput_url = None
-        self.__operator_tput_url = None
+    def __init__(self, conf: Config, log: Logger, recorder: TraceRecorder = None, collector: MetricsCollector = None):
+        self.__job = None
+        self.__operator = None
+        self.__job_name = conf.get_str(Key.FLINK_JOB_NAME)
 
         self.__job_runtime = 0
         self.__backpressure = 0
+        self.__backpressure_stats = SubtaskStats(zeros(0))
+        self.__operator_stats = SubtaskStats(zeros([len(SUBTASK_METRICS), 0]))
+        self.__percentile = conf.get_float(Key.BACKPRESSURE_PERCENTILE)
+        self.__bp_statistic = conf.get_str(Key.BACKPRESSURE_STATISTIC)
+
+        history = conf.get_int(Key.MONITORING_HISTORY)
+        alpha = conf.get_float(Key.MONITORING_EWMA_ALPHA)
+        self.__series = {name: MetricSeries(history, alpha)
+                         for name in [SERIES_BACKPRESSURE, SERIES_SOURCE_RATE, SERIES_OPERATOR_TPUT]}
         self.__source_throughput = 0
         self.__operator_throughput = 0
+        self.__sample_time = 0.0
 
         self.__current_state = RuntimeState()
         self.__target_state = RuntimeState()
@@ -49,80 +62,124 @@ class RuntimeContext:
 
         self.__cluster_ip = f"{conf.get(Key.FLINK_HOST)}:{conf.get(Key.FLINK_PORT)}"
         self.__cluster_url = f"http://{self.__cluster_ip}"
-        self.__jobs_url = f"{self.__cluster_url}/jobs"
 
         self.__debug = int(conf.get(Key.DEBUG_LEVEL))
         self.__log = log
 
-    def __get_current_job_runtime(self):
-        return req.get(self.__job_url).json()["duration"]
+        # a replay passes its own collector, serving the responses of a recorded trace
+        self.__recorder = recorder
+        self.__collector = collector if collector is not None else MetricsCollector(conf, log, recorder)
+        self.__job_graph = JobGraph(self.__cluster_url, self.__collector, init_backend(conf, log), log)
+        # the samples keep refreshing the job while a reconfiguration discovers it again, from another thread
+        self.__access = RLock()
 
-    def __get_current_backpressure(self) -> float:
-        self.__log.debug(f"\tGetting source backpressure from url {self.__source_backpressure_url}")
-        bp = float(req.get(self.__source_backpressure_url).json()["subtasks"][0]["ratio"])
-        return 0.0 if bp is None else bp
+    def __update_bottleneck(self) -> None:
+        bottleneck = self.__job.get_bottleneck()
+        if self.__operator is not None and bottleneck is not None and bottleneck.id != self.__operator.id:
+            self.__log.info(f"[MONITOR] Bottleneck moved from {self.__operator.name} to {bottleneck.name}")
+        self.__operator = bottleneck
 
-    def __get_current_source_throughput(self) -> int:
-        self.__log.debug(f"\tGetting source throughput from url {self.__source_tput_url}")
-        return int(float(req.get(self.__source_tput_url).json()[0]["value"]))
+    def __discover_job(self) -> None:
+        self.__log.info(f"[MONITOR]: Retrieving job details from {self.__cluster_ip} ...")
+        self.__job_graph.discover()
 
-    def __get_current_operator_throughput(self) -> int:
-        self.__log.debug(f"\tGetting operator throughput from url {self.__operator_tput_url}")
-        return int(float(req.get(self.__operator_tput_url).json()[0]["sum"]))
+        job = self.__job_graph.get_job(self.__job_name)
+        if job is None:
+            # e.g. while the job is being restarted: discover it again at the next tick
+            self.__job_graph.invalidate("no job to monitor is running")
+            raise LookupError(f"No running job {self.__job_name} found on {self.__cluster_ip}")
+        self.__job = job
+
+        # vertex ids survive a restart of the same job graph: keep following the same bottleneck
+        previous = self.__operator.id if self.__operator is not None else None
+        self.__operator = next((v for v in self.__job.vertices if v.id == previous), self.__job.get_bottleneck())
 
     def update_job_details(self) -> None:
-        self.__log.info(f"[MONITOR]: Retrieving job details from {self.__cluster_ip} ...")
+        with self.__access:
+            self.__collector.new_tick()
+            self.__discover_job()
+
+    def invalidate_topology(self, reason: str) -> None:
+        with self.__access:
+            self.__job_graph.invalidate(reason)
+
+    def check_topology(self) -> None:
+        with self.__access:
+            self.__collector.new_tick()
+            self.__job_graph.check_jobs()
+
+    def update_state(self, refresh: bool = False) -> None:
+        with self.__access:
+            # by default reuse the documents already downloaded in the current tick
+            if refresh:
+                self.__collector.new_tick()
+
+            self.__log.debug(f"\tGetting operator parallelism from url {self.__job.url}")
+            self.__job_graph.refresh()
+
+            if self.__operator is not None:
+                self.__current_state.parallelism = self.__operator.parallelism
+            else:
+                self.__log.info(f"[MONITOR] ERROR: Unable to retrieve parallelism, setting it to 0")
+                self.__current_state.parallelism = 0
+
+            transprecision = self.__job.get_transprecision()
+            if transprecision is not None:
+                self.__current_state.transprecision = transprecision
+            else:
+                self.__log.error(f"[MONITOR] Unable to retrieve transprecision, setting it to 0")
+                self.__current_state.transprecision = 0
 
-        self.__job_id = req.get(self.__jobs_url).json()["jobs"][0]["id"]
-        self.__job_url = f"{self.__jobs_url}/{self.__job_id}"
+    def print_details(self) -> None:
+        self.__log.info(f"[MONITOR]:: Details about the job:")
+        self.__log.info(f"\t Job ID: {self.__job.id}")
+        self.__log.info(f"\t Job Name: {self.__job.name}")
+        self.__log.info(f"\t Job Vertices: {len(self.__job.vertices)}")
+        self.__log.info(f"\t Target Operator ID: {self.__operator.id if self.__operator else None}")
+        self.__log.info(f"\t Target Operator Name: {self.__operator.name if self.__operator else None}")
+        self.__log.info(f"\t Target Operator Parallelism: {self.__current_state.parallelism}")
+        self.__log.info(f"\t Target Operator Transprecision: {self.__current_state.transprecision}")
 
-        operator_res = req.get(self.__job_url).json()["vertices"][1]
-        self.__operator_id = operator_res["id"]
-        self.__operator_name = operator_res["name"]
+        other_jobs = [job for job in self.__job_graph.get_jobs() if job is not self.__job]
+        for job in other_jobs:
+            self.__log.debug(f"\t Also running: {job.name} ({job.id}) with {len(job.vertices)} vertices")
 
-        self.__operator_url = f"{self.__job_url}/vertices/{self.__operator_id}"
-        self.__transprecision_url = f"{self.__operator_url}/metrics?get=0.{self.__operator_name}.TransprecisionLevel"
+    def update_job_runtime_metrics(self, timestamp: float = None) -> None:
+        with self.__access:
+            # a new tick: all the documents of a job (including the ones read by update_state) in one parallel round
+            self.__collector.new_tick()
 
-        self.__source_id = req.get(self.__job_url).json()["vertices"][0]["id"]
-        self.__source_url = f"{self.__job_url}/vertices/{self.__source_id}"
+            # the cached topology is reused until a restart of the job is detected
+            if not self.__job_graph.is_valid():
+                self.__discover_job()
 
-        self.__source_backpressure_url = f"{self.__source_url}/backpressure"
-        self.__source_tput_url = f"{self.__source_url}/metrics?get=0.numRecordsOutPerSecond"
+            self.__job_graph.refresh()
+            if not self.__job_graph.is_valid():
+                self.__discover_job()
+                self.__job_graph.refresh()
 
-        # TODO: must be multiplied by transp level, or consider InPerSecond?
-        self.__operator_tput_url = \
-            f"{self.__operator_url}/subtasks/metrics?get={self.__operator_name}.numRecordsOutPerSecond"
+            self.__update_bottleneck()
 
-    def update_state(self) -> None:
-        try:
-            self.__log.debug(f"\tGetting operator parallelism from url {self.__job_url}")
-            operator_res = req.get(self.__job_url).json()["vertices"][1]
-            self.__current_state.parallelism = int(operator_res["parallelism"])
-        except IndexError:
-            self.__log.info(f"[MONITOR] ERROR: Unable to retrieve parallelism, setting it to 0")
-            self.__current_state.parallelism = 0
+            self.__job_runtime = self.__job.duration
+            self.__backpressure = self.__job.get_source_backpressure()
+            self.__backpressure_stats = self.__job.get_source_backpressure_stats(self.__percentile)
+            self.__source_throughput = self.__job.get_source_throughput()
 
-        try:
-            self.__log.debug(f"\tGetting operator transprecision from url {self.__transprecision_url}")
-            transp_res = req.get(self.__transprecision_url).json()[0]
-            self.__current_state.transprecision = int(transp_res["value"])
-        except IndexError:
-            self.__log.error(f"[MONITOR] Unable to retrieve transprecision, setting it to 0")
-            self.__current_state.transprecision = 0
+            if self.__operator is not None:
+                self.__operator_throughput = self.__operator.output_rate
+                self.__operator_stats = self.__operator.get_subtask_stats(self.__percentile)
+            else:
+                self.__operator_throughput = 0
 
-    def print_details(self) -> None:
-        self.__log.info(f"[MONITOR]:: Details about the job:")
-        self.__log.info(f"\t Job ID: {self.__job_id}")
-        self.__log.info(f"\t Target Operator ID: {self.__operator_id}")
-        self.__log.info(f"\t Target Operator Name: {self.__operator_name}")
-        self.__log.info(f"\t Target Operator Parallelism: {self.__current_state.parallelism}")
-        self.__log.info(f"\t Target Operator Transprecision: {self.__current_state.transprecision}")
+            # the measurements outlive the process: their samples are dated by the wall clock, as the recorded traces
+            self.__sample_time = time() if timestamp is None else timestamp
+            timestamp = monotonic() if timestamp is None else timestamp
+            self.__series[SERIES_BACKPRESSURE].push(timestamp, self.__backpressure_stats.get(self.__bp_statistic))
+            self.__series[SERIES_SOURCE_RATE].push(timestamp, self.__source_throughput)
+            self.__series[SERIES_OPERATOR_TPUT].push(timestamp, self.__operator_throughput)
 
-    def update_job_runtime_metrics(self) -> None:
-        self.__job_runtime = self.__get_current_job_runtime()
-        self.__backpressure = self.__get_current_backpressure()
-        self.__source_throughput = self.__get_current_source_throughput()
-        self.__operator_throughput = self.__get_current_operator_throughput()
+            if self.__recorder is not None:
+                self.__recorder.record_sample()
 
     def set_target_state(self, par: int, transp: int) -> None:
         self.__target_state.parallelism = par
@@ -132,7 +189,14 @@ class RuntimeContext:
         self.__log.info(f"[MONITOR]:: Runtime performance metrics:")
         self.__log.info(f"\t Job Run Time: {self.__job_runtime} ms")
         self.__log.info(f"\t Source Backpressure Ratio: {self.__backpressure}")
+        self.__log.info(f"\t Source Backpressure Subtasks: {self.__backpressure_stats}")
+        self.__log.debug(f"\t Bottleneck Subtasks (in, out, busy): {self.__operator_stats}")
         self.__log.info(f"\t Source Input Ratio: {self.__source_throughput}")
+        self.__log.info(f"\t Bottleneck Operator: {self.__operator.name if self.__operator else None}")
+        for vertex in self.__job.vertices:
+            self.__log.debug(f"\t\t{vertex.name}: backpressure {vertex.backpressure} -- busy {vertex.busy_ratio:.2f} "
+                             f"-- in {vertex.input_rate} -- out {vertex.output_rate}")
+        self.__collector.print_timings()
 
     def get_current_state(self) -> Tuple[int, int]:
         return self.__current_state.parallelism, self.__current_state.transprecision
@@ -143,9 +207,29 @@ class RuntimeContext:
     def get_backpressure(self) -> int:
         return self.__backpressure
 
+    def get_backpressure_stats(self) -> SubtaskStats:
+        return self.__backpressure_stats
+
+    # Rows of the statistics are in the order of SUBTASK_METRICS
+    def get_operator_stats(self) -> SubtaskStats:
+        return self.__operator_stats
+
+    def get_series(self, name: str) -> MetricSeries:
+        return self.__series[name]
+
+    def clear_series(self) -> None:
+        with self.__access:
+            for series in self.__series.values():
+                series.clear()
+            self.__job_graph.reset_metrics(self.__collector.get_time())
+
     def get_source_input_rate(self) -> int:
         return self.__source_throughput
 
+    # Time of the last sample of the runtime metrics
+    def get_sample_time(self) -> float:
+        return self.__sample_time
+
     def get_operator_throughput(self) -> int:
         return self.__operator_throughput
 
@@ -170,8 +254,62 @@ class RuntimeContext:
     def get_cluster_ip(self) -> str:
         return self.__cluster_ip
 
+    def get_fetch_timings(self) -> dict[str, float]:
+        return self.__collector.get_timings()
+
+    def get_fetch_time(self) -> float:
+        return self.__collector.get_tick_time()
+
     def get_job_id(self) -> str:
-        return self.__job_id
+        return self.__job.id
+
+    def get_job(self) -> Job:
+        return self.__job
+
+    def get_jobs(self) -> list[Job]:
+        return self.__job_graph.get_jobs()
+
+    # The readiness of the cluster is read from fresh documents, not from the ones of the current tick
+
+    def poll_job(self, job_id: str) -> dict | None:
+        try:
+            return self.__collector.poll(f"{self.__cluster_url}/jobs/{job_id}")
+        except MetricNotFoundError:
+            return None
+
+    def poll_jobs(self) -> list[dict]:
+        return self.__collector.poll(f"{self.__cluster_url}/jobs/overview")["jobs"]
+
+    def poll_cluster_overview(self) -> dict:
+        return self.__collector.poll(f"{self.__cluster_url}/overview")
+
+    # Stops the job once a savepoint of its state is taken, returns the id of the request to follow it
+    def trigger_savepoint(self, job_id: str, directory: str) -> str:
+        body = {"drain": False}
+        if directory:
+            body["targetDirectory"] = directory
+        return self.__collector.post(f"{self.__cluster_url}/jobs/{job_id}/stop", body)["request-id"]
+
+    def poll_savepoint(self, job_id: str, request_id: str) -> dict:
+        return self.__collector.poll(f"{self.__cluster_url}/jobs/{job_id}/savepoints/{request_id}")
+
+    def poll_checkpoints(self, job_id: str) -> dict:
+        return self.__collector.poll(f"{self.__cluster_url}/jobs/{job_id}/checkpoints")
+
+    def poll_jobmanager_config(self) -> dict[str, str]:
+        entries = self.__collector.poll(f"{self.__cluster_url}/jobmanager/config")
+        return {entry["key"]: entry["value"] for entry in entries}
+
+    # Bounds of the parallelism of each vertex, only served by the adaptive scheduler
+    def poll_resource_requirements(self, job_id: str) -> dict[str, dict]:
+        return self.__collector.poll(f"{self.__cluster_url}/jobs/{job_id}/resource-requirements")
+
+    # The adaptive scheduler rescales the running job to the new bounds, without resubmitting it
+    def set_resource_requirements(self, job_id: str, requirements: dict[str, dict]) -> None:
+        self.__collector.put(f"{self.__cluster_url}/jobs/{job_id}/resource-requirements", requirements)
+
+    def get_bottleneck(self) -> JobVertex:
+        return self.__operator
 
     def is_reconf_required(self) -> bool:
         return self.__current_state != self.__target_state
@@ -0,0 +1,130 @@
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.ResourceManager import ResourceManager
+from transscale.components.RuntimeContext import RuntimeContext, SERIES_BACKPRESSURE
+from transscale.controllers.CombinedController import CombinedController
+from transscale.controllers.TransprecisionController import convert_throughput
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+
+BP_LOW = -1
+BP_UNSTABLE = 0
+BP_HIGH = 1
+
+
+# Scaling decisions taken on the current context, independent of how the loop is scheduled
+class ScalingPolicy:
+
+    def __init__(self, conf: Config, log: Logger, context: RuntimeContext, measurements: MeasurementsManager,
+                 resource_manager: ResourceManager, controller: CombinedController):
+        self.__conf = conf
+        self.__log = log
+
+        self.__context = context
+        self.__measurements = measurements
+        self.__resource_manager = resource_manager
+        self.__controller = controller
+
+        self.__window = conf.get_int(Key.MONITORING_WINDOW)
+        self.__bp_threshold = conf.get_float(Key.BACKPRESSURE_THRESHOLD)
+
+    def print_status(self) -> None:
+        ctx = self.__context
+        self.__log.debugg(
+            f"\t\t PAR -- current {ctx.get_current_par()} -- target {ctx.get_target_par()} "
+            f"-- reconf {ctx.get_current_par() != ctx.get_target_par()}")
+        self.__log.debugg(
+            f"\t\t TRANSP -- current {ctx.get_current_transp()} -- target {ctx.get_target_transp()} "
+            f"-- reconf {ctx.get_current_transp() != ctx.get_target_transp()}")
+        self.__log.debugg(
+            f"\t\t CTX -- reconf {ctx.is_reconf_required()} "
+            f"-- par {ctx.is_reconf_par()} -- transp {ctx.is_reconf_transp()}")
+
+    # Returns BP_HIGH or BP_LOW when the whole window agrees, BP_UNSTABLE otherwise
+    def get_backpressure_level(self) -> int:
+        # the series holds the configured statistic over all the source subtasks of each sample
+        series = self.__context.get_series(SERIES_BACKPRESSURE)
+        if len(series) < self.__window:
+            return BP_UNSTABLE
+
+        ewma = series.get_ewma() * 100
+        median = series.get_percentile(50, self.__window) * 100
+        upper = series.get_percentile(75, self.__window) * 100
+        self.__log.debug(f"[POLICY] Source backpressure -- ewma {ewma:.1f}% -- median {median:.1f}% "
+                         f"-- p75 {upper:.1f}% -- trend {series.get_trend() * 100:.3f}%/s")
+
+        # a single spike moves neither the median nor the ewma enough to trigger a scale-up
+        if median > self.__bp_threshold and ewma > self.__bp_threshold:
+            return BP_HIGH
+        if upper <= self.__bp_threshold and ewma <= self.__bp_threshold:
+            return BP_LOW
+        return BP_UNSTABLE
+
+    # While the operator is saturated every sample is a measurement of the mst of the current configuration
+    def observe(self) -> None:
+        ctx = self.__context
+        series = ctx.get_series(SERIES_BACKPRESSURE)
+        if len(series) == 0 or series.get_last() * 100 <= self.__bp_threshold or ctx.get_source_input_rate() <= 0:
+            return
+        nd_max = self.__resource_manager.get_max_network_delay(ctx.get_current_par())
+        self.__measurements.update_mst(ctx)
+        self.__measurements.update_nd(ctx, nd_max)
+        self.__controller.observe(ctx, self.__measurements, nd_max)
+
+    def can_scaleup(self) -> bool:
+        ctx = self.__context
+        if ctx.get_current_par() == ctx.get_max_par() and ctx.get_current_transp() == ctx.get_max_transp():
+            self.__log.warning("Resources are already at max level. Cannot scale-up.")
+            return False
+        return True
+
+    # Returns True when the backpressure stays high on the window and the system must scale up
+    def evaluate(self) -> bool:
+        with profiler.span("policy.evaluate"):
+            return self.__evaluate()
+
+    def __evaluate(self) -> bool:
+        ctx = self.__context
+        level = self.get_backpressure_level()
+
+        if ctx.get_source_input_rate() == 0:
+            self.__log.warning("No data detected. Should stop the monitoring?")
+
+        elif level == BP_LOW:
+            self.__log.info("\t Backpressure level is NOT HIGH")
+
+            if ctx.get_current_par() == 1 and ctx.get_current_transp() == 1:
+                self.__log.warning("Resources are already at min level. Cannot scale-down.")
+
+            else:
+                target_par, target_transp = self.__controller.scaledown(ctx)
+                ctx.set_target_state(par=target_par, transp=target_transp)
+
+        elif level == BP_HIGH:
+            self.__log.new_line()
+            self.__log.warning("Back Pressure Level of Source is HIGH!!")
+            return self.can_scaleup()
+
+        else:
+            self.__log.info("\t Backpressure level is not stable on the window: no re-configuration needed")
+
+        return False
+
+    def scaleup(self) -> None:
+        with profiler.span("policy.scaleup"):
+            self.__scaleup()
+
+    def __scaleup(self) -> None:
+        ctx = self.__context
+        self.__log.info("Backpressure is still high and the system needs a reconfiguration...")
+
+        current_tput = ctx.get_operator_throughput()
+        current_tput = convert_throughput(ctx, self.__conf.get(Key.SCALING_METHOD), current_tput)
+
+        self.__measurements.update_mst(ctx)
+        nd_max = self.__resource_manager.get_max_network_delay(ctx.get_current_par())
+        self.__measurements.update_nd(ctx, nd_max)
+
+        target_par, target_transp = self.__controller.scaleup(ctx, self.__measurements)
+        ctx.set_target_state(par=target_par, transp=target_transp)
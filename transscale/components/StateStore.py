@@ -0,0 +1,130 @@
+import json
+import os
+import re
+from tempfile import NamedTemporaryFile
+
+from numpy import ascontiguousarray, dtype, memmap, ndarray, zeros
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.controllers.CombinedController import CombinedController
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+
+MAGIC = b"TSSTATE1"
+# the arrays start on cache line boundaries, so that they are mapped as they are
+ALIGNMENT = 64
+
+PREFIX_MEASUREMENTS = "measurements."
+PREFIX_ENGINE = "engine."
+
+
+# Keeps the measurements and the fitted prediction state of a job in a file, so that a restarted auto-scaler
+# decides from what it already learned. The file is a JSON header describing raw arrays, which are memory-mapped
+# on load, and it is always replaced as a whole
+class StateStore:
+
+    def __init__(self, conf: Config, log: Logger):
+        self.__log = log
+        self.__directory = conf.get_str(Key.STATE_PATH)
+
+    def is_enabled(self) -> bool:
+        return self.__directory != ""
+
+    def get_path(self, context: RuntimeContext) -> str:
+        # one file per job and cluster
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{context.get_job().name}@{context.get_cluster_ip()}")
+        return os.path.join(self.__directory, f"{name}.state")
+
+    def save(self, context: RuntimeContext, measurements: MeasurementsManager,
+             controller: CombinedController) -> None:
+        if not self.is_enabled():
+            return
+
+        with profiler.span("state.save"):
+            arrays = {PREFIX_MEASUREMENTS + k: v for k, v in measurements.get_state().items()}
+            arrays.update({PREFIX_ENGINE + k: v for k, v in controller.get_engine_state().items()})
+            path = self.get_path(context)
+            self.__write(path, {"engine": controller.get_engine_name()}, arrays)
+        self.__log.debugg(f"[STATE] Saved {len(arrays)} arrays to {path}")
+
+    @staticmethod
+    def __write(path: str, info: dict, arrays: dict[str, ndarray]) -> None:
+        arrays = {name: ascontiguousarray(array) for name, array in arrays.items()}
+
+        # the offsets depend on the length of the header, which contains them: it is padded to a fixed point
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({"info": info, "arrays": layout}).encode()
+        start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # written next to the destination then renamed over it: readers see the old state or the new one, never a mix
+        with NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=".state-", delete=False) as file:
+            try:
+                file.write(MAGIC)
+                file.write(len(header).to_bytes(8, "little"))
+                file.write(header)
+                for name, array in arrays.items():
+                    file.seek(start + layout[name][2])
+                    file.write(array.tobytes())
+                file.truncate(start + offset)
+                file.flush()
+                os.fsync(file.fileno())
+            except Exception:
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, path)
+
+    @staticmethod
+    def __read(path: str) -> tuple[dict, dict[str, ndarray]]:
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a state file")
+            length = int.from_bytes(file.read(8), "little")
+            header = json.loads(file.read(length))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+
+        # the arrays are mapped, not read: only the pages used by the restore are loaded
+        arrays = {}
+        for name, (dtype_str, shape, offset) in header["arrays"].items():
+            if 0 in shape:
+                arrays[name] = zeros(shape, dtype=dtype(dtype_str))
+            else:
+                arrays[name] = memmap(path, dtype=dtype(dtype_str), mode="r", offset=start + offset,
+                                      shape=tuple(shape))
+        return header["info"], arrays
+
+    # Returns True when the measurements were restored, the fits of the prediction engine along with them if possible
+    def load(self, context: RuntimeContext, measurements: MeasurementsManager,
+             controller: CombinedController) -> bool:
+        if not self.is_enabled():
+            return False
+
+        path = self.get_path(context)
+        if not os.path.exists(path):
+            self.__log.info(f"[STATE] No state saved in {path}: starting from scratch")
+            return False
+
+        try:
+            with profiler.span("state.load"):
+                info, arrays = self.__read(path)
+                measurements.set_state({k[len(PREFIX_MEASUREMENTS):]: v for k, v in arrays.items()
+                                        if k.startswith(PREFIX_MEASUREMENTS)})
+
+                # the fits of another engine are of no use: it fits the restored measurements at the first decision
+                restored = info.get("engine") == controller.get_engine_name() and controller.set_engine_state(
+                    {k[len(PREFIX_ENGINE):]: v for k, v in arrays.items() if k.startswith(PREFIX_ENGINE)},
+                    measurements)
+        except (OSError, ValueError, KeyError) as err:
+            self.__log.warning(f"[STATE] Cannot restore the state from {path}: {err}")
+            return False
+
+        self.__log.info(f"[STATE] Restored the measurements{' and the prediction models' if restored else ''} "
+                        f"from {path}")
+        return True
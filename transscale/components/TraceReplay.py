@@ -0,0 +1,151 @@
+import traceback
+from time import perf_counter
+
+from numpy import diff, median
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.ResourceManager import ResourceManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.components.ScalingPolicy import ScalingPolicy, BP_HIGH
+from transscale.controllers.CombinedController import CombinedController
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.JobGraph import OVERVIEW_PATH
+from transscale.utils.metrics.ReplayCollector import ReplayCollector
+from transscale.utils.metrics.TraceRecorder import TraceReader, RECORD_RESPONSE, RECORD_SAMPLE, \
+    RECORD_RECONFIGURATION
+
+
+class ReplayDecision:
+
+    def __init__(self, time: float, kind: str, current: tuple[int, int], target: tuple[int, int]):
+        self.time = time
+        self.kind = kind
+        self.current = current
+        self.target = target
+
+
+# Feeds a recorded trace through the scaling policy, the controllers and the strategies, without sleeping:
+# the decisions are only collected, the trace keeps showing what the recorded auto-scaler did
+class TraceReplay:
+
+    def __init__(self, conf: Config, log: Logger, trace_path: str):
+        self.__log = log
+        self.__debug = int(conf.get(Key.DEBUG_LEVEL))
+
+        self.__interval = conf.get_float(Key.MONITORING_INTERVAL)
+        self.__warmup = conf.get_float(Key.MONITORING_WARMUP)
+
+        responses = []
+        self.__samples = []
+        self.__reconfigurations = []
+        for record_type, timestamp, payload in TraceReader(trace_path):
+            if record_type == RECORD_RESPONSE:
+                responses.append((timestamp, payload))
+            elif record_type == RECORD_SAMPLE:
+                self.__samples.append(timestamp)
+            elif record_type == RECORD_RECONFIGURATION:
+                self.__reconfigurations.append((timestamp, payload))
+
+        if len(self.__samples) == 0:
+            raise ValueError(f"No monitoring sample recorded in {trace_path}")
+
+        # responses older than half a sampling period were not refreshed by the sample being replayed
+        max_age = float(median(diff(self.__samples))) / 2 if len(self.__samples) > 1 else float("inf")
+        self.__collector = ReplayCollector(log, max_age, [OVERVIEW_PATH])
+        for timestamp, res in responses:
+            self.__collector.add_response(timestamp, res["url"], res["status"], res["body"])
+
+        self.__start = self.__samples[0]
+        self.__context = RuntimeContext(conf, log, collector=self.__collector)
+        # the real resource manager only provides the network delays, it never rescales during a replay
+        self.__controller = CombinedController(conf, log)
+        self.__policy = ScalingPolicy(conf, log, self.__context, MeasurementsManager(conf, log),
+                                      ResourceManager(conf, log), self.__controller)
+
+        self.__decisions = []
+        self.__decisions_from = 0.0
+        self.__failures = 0
+
+    def __hold_decisions(self, timestamp: float) -> None:
+        self.__decisions_from = timestamp + (self.__warmup if self.__debug < 2 else 0)
+
+    def __sample(self, timestamp: float) -> bool:
+        self.__collector.set_time(timestamp)
+        try:
+            self.__context.update_job_runtime_metrics(timestamp)
+            self.__context.update_state()
+        except (OSError, LookupError) as err:
+            # e.g. the job was restarting when the sample was recorded, or the JobManager answered with an error
+            self.__log.debug(f"[REPLAY] {timestamp - self.__start:.1f}s -- no sample: {err}")
+            return False
+        return True
+
+    def __decide(self, timestamp: float, kind: str) -> None:
+        ctx = self.__context
+        if not ctx.is_reconf_required():
+            return
+
+        decision = ReplayDecision(timestamp - self.__start, kind, ctx.get_current_state(), ctx.get_target_state())
+        self.__decisions.append(decision)
+        self.__log.info(f"[REPLAY] {decision.time:.1f}s -- {kind}: {decision.current} -> {decision.target}")
+
+        # like the control loop after a reconfiguration, even though the trace goes on with the recorded one
+        ctx.clear_series()
+        self.__hold_decisions(timestamp)
+
+    def run(self) -> list[ReplayDecision]:
+        start = perf_counter()
+        reconfigurations = iter(self.__reconfigurations)
+        next_reconf = next(reconfigurations, None)
+        next_monitor = self.__start + self.__interval
+
+        self.__hold_decisions(self.__start)
+        for timestamp in self.__samples:
+            # the reconfigurations of the recorded auto-scaler restart the window and the warm-up as they did live
+            while next_reconf is not None and next_reconf[0] <= timestamp:
+                if next_reconf[1]["success"]:
+                    self.__context.clear_series()
+                    self.__hold_decisions(next_reconf[0])
+                next_reconf = next(reconfigurations, None)
+
+            if not self.__sample(timestamp):
+                continue
+
+            ctx = self.__context
+            ctx.set_target_state(*ctx.get_current_state())
+            if timestamp < self.__decisions_from:
+                continue
+
+            # as in the control loop, a failed decision is logged and the replay goes on with the next samples
+            try:
+                self.__policy.observe()
+                if self.__policy.get_backpressure_level() == BP_HIGH and self.__policy.can_scaleup():
+                    self.__policy.scaleup()
+                    self.__decide(timestamp, "scaleup")
+
+                elif timestamp >= next_monitor:
+                    next_monitor = timestamp + self.__interval
+                    if self.__policy.evaluate():
+                        self.__policy.scaleup()
+                        self.__decide(timestamp, "scaleup")
+                    else:
+                        self.__decide(timestamp, "scaledown")
+            except Exception as err:
+                self.__failures += 1
+                self.__log.error(f"[REPLAY] {timestamp - self.__start:.1f}s -- decision failed: {err}")
+                self.__log.debug(str(traceback.format_exception(err)))
+
+        self.__controller.close()
+        self.__log.info(f"[REPLAY] Replayed {self.__samples[-1] - self.__start:.0f} seconds of trace "
+                        f"({len(self.__samples)} samples) in {perf_counter() - start:.2f} seconds")
+        if self.__failures > 0:
+            self.__log.warning(f"[REPLAY] {self.__failures} decisions failed")
+        return self.__decisions
+
+    def get_failures(self) -> int:
+        return self.__failures
+
+    def get_recorded_reconfigurations(self) -> list[tuple[float, dict]]:
+        return [(timestamp - self.__start, res) for timestamp, res in self.__reconfigurations]
@@ -1,12 +1,16 @@
+from numpy import ndarray
+
 from transscale.components.MeasurementsManager import MeasurementsManager
 from transscale.components.ReconfigurationManager import ReconfigurationManager
 from transscale.components.RuntimeContext import RuntimeContext
 from transscale.controllers.TransprecisionController import convert_throughput
-from transscale.utils.prediction.PredictionMatrix import PredictionMatrix
+from transscale.utils.prediction.FitCache import fit_cache
+from transscale.utils.prediction.PredictionEngine import init_prediction_engine
 from transscale.utils.prediction.models.ParallelismModel import ParallelismModel
 from transscale.utils.prediction.models.TransprecisionModel import TransprecisionModel
 from transscale.utils.Config import Config
 from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
 from transscale.utils.DefaultValues import DefaultValues, ConfigKeys as Key
 
 
@@ -17,7 +21,7 @@ class CombinedController:
         self.__log = log
 
         self.__reconf_manager = ReconfigurationManager(conf, log)
-        self.__prediction_matrix = PredictionMatrix(conf, log)
+        self.__prediction_matrix = init_prediction_engine(conf, log)
 
     def scaleup(self, context: RuntimeContext, measurements: MeasurementsManager):
         self.__log.info("\n[COMBO_CTRL] Reconf: Scale Up")
@@ -26,10 +30,15 @@ class CombinedController:
                                                  context.get_operator_throughput())
 
         self.__prediction_matrix.update_matrix(measurements)
-        possible_configurations = self.__prediction_matrix \
-            .get_scaling_possibilities(context, operator_throughput)
+        with profiler.span("prediction.possibilities"):
+            possible_configurations = self.__prediction_matrix \
+                .get_scaling_possibilities(context, operator_throughput)
 
-        target_par, target_transp = self.__reconf_manager.get_scaleup_target(possible_configurations, context)
+        with profiler.span("strategy.scaleup"):
+            target_par, target_transp = self.__reconf_manager.get_scaleup_target(possible_configurations, context)
+            # the candidates are numpy integers
+            target_par, target_transp = int(target_par), int(target_transp)
+        fit_cache.print_stats()
 
         if target_par > context.get_max_par() or target_transp > context.get_max_transp():
             self.__log.warning(f"[COMBO_CTRL] Target configuration goes above maximum levels "
@@ -40,16 +49,39 @@ class CombinedController:
 
         return target_par, target_transp
 
+    def get_engine_name(self) -> str:
+        return self.__prediction_matrix.engine_name
+
+    def get_engine_state(self) -> dict[str, ndarray]:
+        return self.__prediction_matrix.get_state()
+
+    def set_engine_state(self, state: dict[str, ndarray], measurements: MeasurementsManager) -> bool:
+        return self.__prediction_matrix.set_state(state, measurements)
+
+    def close(self) -> None:
+        self.__prediction_matrix.close()
+
+    # The current configuration is saturated: the sample, added to the measurements, updates the mst of the engine
+    def observe(self, context: RuntimeContext, measurements: MeasurementsManager, nd_max: int) -> None:
+        par, transp = context.get_current_par(), context.get_current_transp()
+        with profiler.span("prediction.observe"):
+            # the aggregate of the samples, not the sample itself: the outliers are rejected by the measurements
+            self.__prediction_matrix.observe(par, transp, measurements.get_measurements(par, transp), nd_max)
+
     def scaledown(self, context: RuntimeContext) -> tuple[int, int]:
         self.__log.info("\n[COMBO_CTRL] Reconf: Scale Down")
 
         operator_throughput = convert_throughput(context, DefaultValues.Scaling.Transprecision.SAMPLING_DIRECT,
                                                  context.get_operator_throughput())
 
-        possible_configurations = self.__prediction_matrix \
-            .get_scaling_possibilities(context, operator_throughput)
+        with profiler.span("prediction.possibilities"):
+            possible_configurations = self.__prediction_matrix \
+                .get_scaling_possibilities(context, operator_throughput)
 
-        target_par, target_transp = self.__reconf_manager.get_scaledown_target(possible_configurations, context)
+        with profiler.span("strategy.scaledown"):
+            target_par, target_transp = self.__reconf_manager.get_scaledown_target(possible_configurations, context)
+            # the candidates are numpy integers
+            target_par, target_transp = int(target_par), int(target_transp)
 
         if target_par < 1 or target_transp < 1:
             self.__log.warning(f"[COMBO_CTRL] Target configuration goes below minimum levels "
@@ -0,0 +1,613 @@
+import json
+import re
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Iterator
+from urllib.parse import urlparse, parse_qs
+from uuid import uuid4
+
+from numpy import arange, clip, interp
+from numpy.random import default_rng
+
+from transscale.utils.Logger import Logger
+
+JOB_NAME = "transscale-simulated-job"
+SOURCE_NAME = "Source: Simulated"
+OPERATOR_NAME = "TransprecisionOperator"
+SINK_NAME = "Sink: Simulated"
+
+
+class MstSurface:
+
+    def __init__(self, alpha: float = 10000, beta: float = 0.9, gamma: float = 0.8, noise: float = 0.02):
+        # MST(par, transp) = alpha * par^beta * transp^gamma
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.noise = noise
+
+    def get_mst(self, par: int, transp: int) -> float:
+        return self.alpha * par ** self.beta * max(transp, 1) ** self.gamma
+
+
+class SimulatedJob:
+
+    def __init__(self, parallelism: int):
+        self.id = uuid4().hex
+        self.parallelism = parallelism
+        self.state = "RUNNING"
+        self.submit_time = 0.0
+        self.start_time = 0.0
+        self.end_time = None
+        # end of the job it replaces, the downtime lasts until this one is running
+        self.previous_end_time = None
+        self.restored_from = None
+        # upper bound of the parallelism requested to the adaptive scheduler, and start of the in-place rescale
+        self.upper_bound = parallelism
+        self.rescale_time = None
+        self.vertices = [(uuid4().hex, SOURCE_NAME), (uuid4().hex, OPERATOR_NAME), (uuid4().hex, SINK_NAME)]
+
+    def get_vertex_name(self, vertex_id: str) -> str | None:
+        return next((name for vid, name in self.vertices if vid == vertex_id), None)
+
+
+class SimulatedPod:
+
+    def __init__(self, created: float):
+        self.name = f"flink-taskmanager-{uuid4().hex[:10]}"
+        self.created = created
+        self.deleted = None
+        # last phase published to the watches of the Kubernetes API
+        self.published = None
+
+
+class FlinkSimulator:
+
+    def __init__(self, log: Logger, surface: MstSurface, rate_profile: list[tuple[float, float]],
+                 speedup: float = 1.0, parallelism: int = 1, transprecision: int = 1, seed: int = 0,
+                 cancel_delay: float = 2.0, taskmanager_delay: float = 10.0, startup_delay: float = 5.0,
+                 savepoint_delay: float = 5.0, savepoint_size: int = 256 * 2 ** 20, adaptive: bool = False,
+                 rescale_delay: float = 3.0):
+        self.__log = log
+        self.__surface = surface
+        self.__speedup = speedup
+        self.__rng = default_rng(seed)
+        self.__lock = Lock()
+
+        # piecewise linear source rate, as (simulated seconds, records per second) points
+        self.__rate_times = [t for t, _ in rate_profile]
+        self.__rate_values = [r for _, r in rate_profile]
+
+        self.__start = monotonic()
+        self.__jobs = [SimulatedJob(parallelism)]
+        # replicas of the deployment, and its pods: a task manager is registered to the JobManager once its pod is
+        # ready, until its pod is terminated
+        self.__taskmanagers = parallelism
+        self.__pods = [SimulatedPod(-taskmanager_delay) for _ in range(parallelism)]
+        # changes of the pods, as events of the Kubernetes API numbered by resource version
+        self.__pod_events = []
+        self.__resource_version = 0
+        self.__transprecision = transprecision
+
+        # simulated seconds of the transitions: a cancelled job stopping, task managers (de)registering after a
+        # scaling of the deployment, a submitted job deploying its tasks
+        self.__cancel_delay = cancel_delay
+        self.__taskmanager_delay = taskmanager_delay
+        self.__startup_delay = startup_delay
+        # savepoints taken to stop the jobs, by id of the request that triggered them
+        self.__savepoint_delay = savepoint_delay
+        self.__savepoint_size = savepoint_size
+        self.__savepoints = {}
+        # the adaptive scheduler rescales a running job to its new resource requirements, keeping its id
+        self.__adaptive = adaptive
+        self.__rescale_delay = rescale_delay
+
+        self.__stats = {"par_reconfigurations": 0, "transp_reconfigurations": 0, "job_restarts": 0,
+                        "downtime": 0.0, "reaction_times": [], "commands": 0, "savepoints": 0, "restores": 0,
+                        "in_place_rescales": 0, "taskmanagers_started": 0, "taskmanagers_stopped": 0}
+        self.__overload_since = None
+
+        self.__server = None
+
+    # Simulated time and workload
+
+    def now(self) -> float:
+        return (monotonic() - self.__start) * self.__speedup
+
+    def get_rate(self) -> float:
+        return float(interp(self.now(), self.__rate_times, self.__rate_values))
+
+    def __get_running_job(self) -> SimulatedJob | None:
+        return next((job for job in self.__jobs if job.state == "RUNNING"), None)
+
+    def __get_job(self, job_id: str) -> SimulatedJob | None:
+        return next((job for job in self.__jobs if job.id == job_id), None)
+
+    def __get_pod_phase(self, pod: SimulatedPod, now: float) -> str:
+        if pod.deleted is not None:
+            return "Terminating" if now - pod.deleted < self.__taskmanager_delay else "Gone"
+        return "Running" if now - pod.created >= self.__taskmanager_delay else "Pending"
+
+    def __get_registered(self) -> int:
+        now = self.now()
+        # a terminating task manager stays registered until its pod is gone
+        return len([pod for pod in self.__pods if self.__get_pod_phase(pod, now) == "Running"
+                    or (self.__get_pod_phase(pod, now) == "Terminating"
+                        and pod.deleted - pod.created >= self.__taskmanager_delay)])
+
+    def __get_free_slots(self) -> int:
+        # one slot per task manager, held until the job using it is stopped
+        used = sum([job.parallelism for job in self.__jobs if job.state in ["RUNNING", "CANCELLING", "RESTARTING"]])
+        return max(self.__get_registered() - used, 0)
+
+    def __publish_pods(self, now: float) -> None:
+        for pod in self.__pods:
+            phase = self.__get_pod_phase(pod, now)
+            if phase != pod.published:
+                event = "ADDED" if pod.published is None else "DELETED" if phase == "Gone" else "MODIFIED"
+                self.__resource_version += 1
+                self.__pod_events.append((self.__resource_version,
+                                          {"type": event, "object": self.__pod_document(pod, phase)}))
+                pod.published = phase
+        self.__pods = [pod for pod in self.__pods if pod.published != "Gone"]
+
+    def __scale_deployment(self, replicas: int) -> None:
+        now = self.now()
+        alive = [pod for pod in self.__pods if pod.deleted is None]
+        # pods started cold, and pods terminated
+        self.__stats["taskmanagers_started"] += max(replicas - len(alive), 0)
+        self.__stats["taskmanagers_stopped"] += max(len(alive) - replicas, 0)
+
+        self.__pods += [SimulatedPod(now) for _ in range(replicas - len(alive))]
+        # like the ReplicaSet controller, the pods not ready yet are deleted first, then the newest ones
+        surplus = sorted(alive, key=lambda p: (self.__get_pod_phase(p, now) == "Running", -p.created))
+        for pod in surplus[:max(len(alive) - replicas, 0)]:
+            pod.deleted = now
+        self.__taskmanagers = replicas
+        self.__publish_pods(now)
+
+    def __advance(self) -> None:
+        # completes the transitions whose delay is over
+        now = self.now()
+        self.__publish_pods(now)
+
+        for savepoint in self.__savepoints.values():
+            job = self.__get_job(savepoint["job"])
+            if savepoint["location"] is None and now - savepoint["trigger_time"] >= self.__savepoint_delay:
+                # the job finishes once the savepoint is taken
+                savepoint["location"] = f"file:///savepoints/savepoint-{job.id[:6]}-{uuid4().hex[:12]}"
+                savepoint["duration"] = now - savepoint["trigger_time"]
+                job.state = "FINISHED"
+                job.end_time = now
+                self.__stats["savepoints"] += 1
+
+        for job in self.__jobs:
+            if job.state == "CANCELLING" and now - job.end_time >= self.__cancel_delay:
+                job.state = "CANCELED"
+            elif job.state == "CREATED" and now - job.submit_time >= self.__startup_delay \
+                    and self.__get_free_slots() >= job.parallelism:
+                job.state = "RUNNING"
+                job.start_time = now
+                self.__stats["downtime"] += now - (job.previous_end_time or now)
+            elif job.state == "RESTARTING" and now - job.rescale_time >= self.__rescale_delay \
+                    and self.__get_free_slots() + job.parallelism >= job.upper_bound:
+                # the tasks are deployed again with the new parallelism, restored from the last checkpoint
+                job.parallelism = job.upper_bound
+                job.state = "RUNNING"
+                self.__stats["downtime"] += now - job.rescale_time
+
+    def __get_load(self, job: SimulatedJob) -> tuple[float, float, float]:
+        # returns the offered rate, the processed rate and the load factor of the operator
+        rate = self.get_rate()
+        mst = self.__surface.get_mst(job.parallelism, self.__transprecision)
+        mst *= 1 + self.__rng.normal(0, self.__surface.noise)
+        load = rate / mst if mst > 0 else 0.0
+
+        # time at which the job could not sustain the input anymore, to measure the reaction of the controller
+        if load > 1 and self.__overload_since is None:
+            self.__overload_since = self.now()
+        elif load <= 1:
+            self.__overload_since = None
+
+        return rate, min(rate, mst), load
+
+    def __get_backpressure(self, job: SimulatedJob, vertex_name: str) -> list[float]:
+        _, _, load = self.__get_load(job)
+        # sources and upstream of the bottleneck are backpressured, around 0.5 when the load is 1
+        level = clip(load ** 4 / 2, 0, 1) if vertex_name == SOURCE_NAME else 0.0
+        noise = self.__rng.normal(0, 0.03, job.parallelism)
+        return list(clip(level + noise, 0, 1))
+
+    def __get_metric(self, job: SimulatedJob, vertex_name: str, metric: str) -> float | None:
+        rate, processed, load = self.__get_load(job)
+        per_subtask = processed / job.parallelism
+
+        if metric.endswith("TransprecisionLevel"):
+            return self.__transprecision if vertex_name == OPERATOR_NAME else None
+        elif metric == "numRecordsInPerSecond":
+            return per_subtask if vertex_name != SOURCE_NAME else 0.0
+        elif metric == "numRecordsOutPerSecond":
+            return per_subtask
+        elif metric == "busyTimeMsPerSecond":
+            return 1000 * min(load, 1.0) if vertex_name == OPERATOR_NAME else 100 * min(load, 1.0)
+        return None
+
+    # Flink REST API
+
+    def __job_details(self, job: SimulatedJob) -> dict:
+        end = job.end_time if job.end_time is not None else self.now()
+        vertices = [{"id": vid, "name": name, "parallelism": job.parallelism, "status": job.state}
+                    for vid, name in job.vertices]
+        nodes = [{"id": vid, "inputs": [] if i == 0 else [{"id": job.vertices[i - 1][0]}]}
+                 for i, (vid, _) in enumerate(job.vertices)]
+
+        return {"jid": job.id, "name": JOB_NAME, "state": job.state,
+                "duration": int((end - job.start_time) * 1000), "vertices": vertices, "plan": {"nodes": nodes}}
+
+    # Prometheus HTTP API, with the series of the Flink Prometheus reporter
+
+    def __query_range(self, query: dict) -> dict:
+        expr = query.get("query", [""])[0]
+        start, end, step = [float(query[p][0]) for p in ["start", "end", "step"]]
+        job_id = re.search(r'job_id="(\w+)"', expr)
+        job = self.__get_job(job_id.group(1)) if job_id else None
+
+        result = []
+        if job is not None and job.state == "RUNNING":
+            # the current state of the simulation stands for every point of the window
+            operator = "job_task_operator_" in expr
+            names = re.search(r"\(([\w|]+)\)", expr).group(1).split("|")
+
+            for vid, vertex_name in job.vertices:
+                for name in names:
+                    for subtask in range(job.parallelism):
+                        values = []
+                        for t in arange(start, end + step / 2, step):
+                            if name == "backPressuredTimeMsPerSecond":
+                                value = 1000 * self.__get_backpressure(job, vertex_name)[subtask]
+                            else:
+                                value = self.__get_metric(job, vertex_name, name)
+                            if value is not None:
+                                values.append([float(t), str(value)])
+
+                        if len(values) > 0:
+                            prefix = "flink_taskmanager_job_task_operator_" if operator \
+                                else "flink_taskmanager_job_task_"
+                            labels = {"__name__": prefix + name, "job_id": job.id, "task_id": vid,
+                                      "task_name": vertex_name, "subtask_index": str(subtask)}
+                            if operator:
+                                # a single operator per vertex, named as it
+                                labels["operator_name"] = vertex_name
+                            result.append({"metric": labels, "values": values})
+
+        return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+    def __get_savepoint_status(self, request_id: str) -> tuple[int, any]:
+        savepoint = self.__savepoints[request_id]
+        if savepoint["location"] is None:
+            return 200, {"status": {"id": "IN_PROGRESS"}, "operation": None}
+        return 200, {"status": {"id": "COMPLETED"}, "operation": {"location": savepoint["location"]}}
+
+    def __get_checkpoints(self, job: SimulatedJob) -> dict:
+        savepoints = [s for s in self.__savepoints.values() if s["job"] == job.id and s["location"] is not None]
+        latest = {"completed": None, "savepoint": None, "failed": None, "restored": None}
+        if len(savepoints) > 0:
+            latest["savepoint"] = {"id": len(savepoints), "status": "COMPLETED", "is_savepoint": True,
+                                   "state_size": savepoints[-1]["size"],
+                                   "end_to_end_duration": int(savepoints[-1]["duration"] * 1000),
+                                   "external_path": savepoints[-1]["location"], "discarded": False}
+        if job.restored_from is not None:
+            latest["restored"] = {"id": 0, "is_savepoint": True, "external_path": job.restored_from}
+        return {"counts": {"completed": len(savepoints)}, "latest": latest, "history": []}
+
+    def handle_get(self, path: str, query: dict) -> tuple[int, any]:
+        parts = [p for p in path.split("/") if p]
+
+        with self.__lock:
+            self.__advance()
+            if parts == ["overview"]:
+                return 200, {"taskmanagers": self.__get_registered(), "slots-total": self.__get_registered(),
+                             "slots-available": self.__get_free_slots(),
+                             "jobs-running": len([j for j in self.__jobs if j.state == "RUNNING"])}
+
+            if self.is_pods_path(parts):
+                return 200, {"kind": "PodList", "metadata": {"resourceVersion": str(self.__resource_version)},
+                             "items": [self.__pod_document(pod, pod.published) for pod in self.__pods]}
+
+            if self.is_scale_path(parts):
+                return 200, self.__scale_document()
+
+            if parts == ["jobmanager", "config"]:
+                return 200, [{"key": "jobmanager.scheduler", "value": "adaptive" if self.__adaptive else "default"}]
+
+            if parts == ["jobs", "overview"]:
+                return 200, {"jobs": [{"jid": j.id, "name": JOB_NAME, "state": j.state} for j in self.__jobs]}
+
+            if parts == ["jobs"]:
+                return 200, {"jobs": [{"id": j.id, "status": j.state} for j in self.__jobs]}
+
+            if parts == ["simulator", "stats"]:
+                return 200, self.get_stats()
+
+            if parts == ["api", "v1", "query_range"]:
+                return 200, self.__query_range(query)
+
+            if len(parts) < 2 or parts[0] != "jobs" or self.__get_job(parts[1]) is None:
+                return 404, {"errors": ["Not found"]}
+
+            job = self.__get_job(parts[1])
+            if len(parts) == 2:
+                return 200, self.__job_details(job)
+
+            if parts[2:] == ["checkpoints"]:
+                return 200, self.__get_checkpoints(job)
+
+            if len(parts) == 4 and parts[2] == "savepoints" and parts[3] in self.__savepoints:
+                return self.__get_savepoint_status(parts[3])
+
+            if parts[2:] == ["resource-requirements"]:
+                if not self.__adaptive:
+                    return 500, {"errors": ["The scheduler does not support resource requirements"]}
+                return 200, {vid: {"parallelism": {"lowerBound": 1, "upperBound": job.upper_bound}}
+                             for vid, _ in job.vertices}
+
+            vertex_name = job.get_vertex_name(parts[3]) if len(parts) > 3 else None
+            if vertex_name is None or job.state != "RUNNING":
+                return 404, {"errors": ["Not found"]}
+
+            if parts[4:] == ["backpressure"]:
+                ratios = self.__get_backpressure(job, vertex_name)
+                return 200, {"status": "ok", "subtasks": [{"subtask": i, "ratio": r} for i, r in enumerate(ratios)]}
+
+            if parts[4:] == ["metrics"]:
+                names = query.get("get", [""])[0].split(",")
+                res = []
+                for name in names:
+                    subtask, metric = name.split(".", 1)
+                    # the operator metrics are scoped by the name of the operator, the one of its vertex here
+                    metric = metric.removeprefix(f"{vertex_name}.")
+                    value = self.__get_metric(job, vertex_name, metric)
+                    if value is not None and int(subtask) < job.parallelism:
+                        res.append({"id": name, "value": str(value)})
+                return 200, res
+
+        return 404, {"errors": ["Not found"]}
+
+    def handle_post(self, path: str, body: dict) -> tuple[int, any]:
+        parts = [p for p in path.split("/") if p]
+
+        with self.__lock:
+            self.__advance()
+            job = self.__get_job(parts[1]) if len(parts) == 3 and parts[0] == "jobs" else None
+            if job is None or parts[2] != "stop":
+                return 404, {"errors": ["Not found"]}
+            if job.state != "RUNNING" or any([s["job"] == job.id for s in self.__savepoints.values()]):
+                return 409, {"errors": [f"Job {job.id} cannot be stopped"]}
+
+            # stop-with-savepoint: the job keeps running until its savepoint is taken
+            self.__record_reaction()
+            request_id = uuid4().hex
+            self.__savepoints[request_id] = {"job": job.id, "trigger_time": self.now(), "location": None,
+                                             "size": self.__savepoint_size * job.parallelism, "duration": None,
+                                             "directory": body.get("targetDirectory")}
+            return 202, {"request-id": request_id}
+
+    def handle_put(self, path: str, body: dict) -> tuple[int, any]:
+        parts = [p for p in path.split("/") if p]
+
+        with self.__lock:
+            self.__advance()
+            job = self.__get_job(parts[1]) if len(parts) == 3 and parts[0] == "jobs" else None
+            if job is None or parts[2] != "resource-requirements":
+                return 404, {"errors": ["Not found"]}
+            if not self.__adaptive:
+                return 500, {"errors": ["The scheduler does not support resource requirements"]}
+            if job.state != "RUNNING":
+                return 409, {"errors": [f"Job {job.id} cannot be rescaled"]}
+
+            upper_bound = max([vertex["parallelism"]["upperBound"] for vertex in body.values()])
+            if upper_bound != job.parallelism:
+                self.__record_reaction()
+                job.upper_bound = upper_bound
+                job.state = "RESTARTING"
+                job.rescale_time = self.now()
+                self.__stats["par_reconfigurations"] += 1
+                self.__stats["in_place_rescales"] += 1
+            return 200, {}
+
+    # Kubernetes API, of the task manager deployment and its pods
+
+    def __pod_document(self, pod: SimulatedPod, phase: str) -> dict:
+        metadata = {"name": pod.name, "namespace": "default", "resourceVersion": str(self.__resource_version),
+                    "labels": {"app": "flink", "component": "taskmanager"}}
+        if pod.deleted is not None:
+            metadata["deletionTimestamp"] = datetime.fromtimestamp(pod.deleted, timezone.utc).isoformat()
+        ready = "True" if phase == "Running" else "False"
+        return {"metadata": metadata, "status": {"phase": "Pending" if phase == "Pending" else "Running",
+                                                 "conditions": [{"type": "Ready", "status": ready}]}}
+
+    def __scale_document(self) -> dict:
+        return {"kind": "Scale", "metadata": {"name": "flink-taskmanager", "namespace": "default"},
+                "spec": {"replicas": self.__taskmanagers},
+                "status": {"replicas": len([pod for pod in self.__pods if pod.deleted is None])}}
+
+    @staticmethod
+    def is_pods_path(parts: list[str]) -> bool:
+        return len(parts) == 5 and parts[:3] == ["api", "v1", "namespaces"] and parts[4] == "pods"
+
+    @staticmethod
+    def is_scale_path(parts: list[str]) -> bool:
+        return len(parts) == 8 and parts[:4] == ["apis", "apps", "v1", "namespaces"] \
+            and parts[5:] == ["deployments", "flink-taskmanager", "scale"]
+
+    def handle_patch(self, path: str, body: dict) -> tuple[int, any]:
+        parts = [p for p in path.split("/") if p]
+
+        with self.__lock:
+            self.__advance()
+            if not self.is_scale_path(parts):
+                return 404, {"kind": "Status", "status": "Failure", "reason": "NotFound"}
+            self.__log.debug(f"[SIMULATOR] {self.now():.1f}s -- PATCH {path} {body}")
+            self.__scale_deployment(int(body["spec"]["replicas"]))
+            return 200, self.__scale_document()
+
+    # Streams the changes of the pods after the given resource version, until the timeout in real seconds
+    def watch_pods(self, query: dict) -> Iterator[dict]:
+        since = int(query.get("resourceVersion", ["0"])[0] or 0)
+        deadline = monotonic() + float(query.get("timeoutSeconds", ["60"])[0])
+
+        while monotonic() < deadline:
+            with self.__lock:
+                self.__advance()
+                events = [event for version, event in self.__pod_events if version > since]
+                since = self.__resource_version
+            for event in events:
+                yield event
+            sleep(0.02)
+
+    # Commands issued by the ResourceManager, forwarded by SimulatorCli
+
+    def __record_reaction(self) -> None:
+        self.__stats["commands"] += 1
+        if self.__overload_since is not None:
+            self.__stats["reaction_times"].append(self.now() - self.__overload_since)
+            self.__overload_since = None
+
+    def __run_flink(self, args: list[str]) -> tuple[int, str]:
+        if args[0] == "cancel":
+            job = self.__get_job(args[-1])
+            if job is None or job.state != "RUNNING":
+                return 1, f"Job {args[-1]} not running"
+            self.__record_reaction()
+            # the job stops processing at once, its slots are released once it is cancelled
+            job.state = "CANCELLING"
+            job.end_time = self.now()
+            return 0, f"Cancelled job {job.id}"
+
+        if args[0] == "run":
+            if any([job.state in ["RUNNING", "CREATED"] for job in self.__jobs]):
+                return 1, "A job is already running"
+            parallelism = int(args[args.index("-p") + 1])
+            last = self.__jobs[-1]
+
+            # the job waits for its tasks to be deployed, and for enough free slots
+            job = SimulatedJob(parallelism)
+            job.state = "CREATED"
+            job.submit_time = job.start_time = self.now()
+            job.previous_end_time = last.end_time
+            if "-s" in args:
+                job.restored_from = args[args.index("-s") + 1]
+                self.__stats["restores"] += 1
+            self.__stats["par_reconfigurations"] += 1
+            self.__stats["job_restarts"] += 1
+            self.__jobs.append(job)
+            return 0, f"Job has been submitted with JobID {job.id}"
+
+        return 1, f"Unsupported flink command {args}"
+
+    def __run_kubectl(self, args: list[str]) -> tuple[int, str]:
+        if args[0] == "scale":
+            self.__scale_deployment(int(next(a for a in args if a.startswith("--replicas=")).split("=")[1]))
+            return 0, "deployment.apps/flink-taskmanager scaled"
+        return 1, f"Unsupported kubectl command {args}"
+
+    def __run_redis(self, args: list[str]) -> tuple[int, str]:
+        command = [a for i, a in enumerate(args) if not a.startswith("-") and not args[i - 1].startswith("-")]
+        if command[:2] == ["set", "transprecision_level"]:
+            self.__record_reaction()
+            self.__transprecision = int(command[2])
+            self.__stats["transp_reconfigurations"] += 1
+            return 0, "OK"
+        return 1, f"Unsupported redis command {args}"
+
+    def handle_command(self, tool: str, args: list[str]) -> tuple[int, str]:
+        self.__log.debug(f"[SIMULATOR] {self.now():.1f}s -- {tool} {' '.join(args)}")
+        with self.__lock:
+            self.__advance()
+            if tool == "flink":
+                return self.__run_flink(args)
+            elif tool == "kubectl":
+                return self.__run_kubectl(args)
+            elif tool == "redis-cli":
+                return self.__run_redis(args)
+        return 1, f"Unsupported tool {tool}"
+
+    def get_stats(self) -> dict:
+        job = self.__get_running_job()
+        return dict(self.__stats, sim_time=self.now(), taskmanagers=self.__get_registered(),
+                    parallelism=job.parallelism if job is not None else 0, transprecision=self.__transprecision)
+
+    # Server
+
+    def start(self, host: str = "127.0.0.1", port: int = 8081) -> None:
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive connections, as the Flink and Kubernetes API servers
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def __reply(self, code: int, res: any) -> None:
+                body = json.dumps(res).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def __stream(self, events: Iterator[dict]) -> None:
+                # one json document per line, in chunks sent as soon as the events happen
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for event in events:
+                        line = json.dumps(event).encode() + b"\n"
+                        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client stops watching once the pods are ready
+                    self.close_connection = True
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if simulator.is_pods_path([p for p in url.path.split("/") if p]) and query.get("watch") == ["true"]:
+                    self.__stream(simulator.watch_pods(query))
+                else:
+                    self.__reply(*simulator.handle_get(url.path, query))
+
+            def do_PATCH(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self.__reply(*simulator.handle_patch(urlparse(self.path).path, body))
+
+            def do_POST(self) -> None:
+                parts = [p for p in urlparse(self.path).path.split("/") if p]
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if len(parts) == 3 and parts[:2] == ["simulator", "commands"]:
+                    code, output = simulator.handle_command(parts[2], body.get("args", []))
+                    self.__reply(200, {"code": code, "output": output})
+                else:
+                    self.__reply(*simulator.handle_post(urlparse(self.path).path, body))
+
+            def do_PUT(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                self.__reply(*simulator.handle_put(urlparse(self.path).path, body))
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        Thread(target=self.__server.serve_forever, daemon=True).start()
+        self.__log.info(f"[SIMULATOR] Serving the Flink REST and Prometheus APIs on "
+                        f"http://{host}:{self.__server.server_port} at {self.__speedup}x speed")
+
+    def get_port(self) -> int:
+        return self.__server.server_port
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -0,0 +1,20 @@
+import argparse
+import sys
+
+import requests as req
+
+
+# Stand-in for the flink, kubectl and redis-cli executables: forwards the command to a running FlinkSimulator.
+# e.g. flink.cmd = python -m transscale.simulator.SimulatorCli -u http://127.0.0.1:8081 flink
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Forward a flink, kubectl or redis-cli command to the simulator')
+    parser.add_argument('-u', '--url', dest='url', action='store', default="http://127.0.0.1:8081",
+                        help='url of the simulator')
+    parser.add_argument('tool', choices=["flink", "kubectl", "redis-cli"], help='simulated executable')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the command')
+
+    args = parser.parse_args()
+
+    res = req.post(f"{args.url}/simulator/commands/{args.tool}", json={"args": args.args}).json()
+    print(res["output"])
+    sys.exit(res["code"])
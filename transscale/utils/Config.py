@@ -23,6 +23,11 @@ class Config:
     def __init_defaults(self):
         self.__config[Key.MONITORING_INTERVAL] = Value.System.Monitoring.interval
         self.__config[Key.MONITORING_WARMUP] = Value.System.Monitoring.warmup
+        self.__config[Key.MONITORING_HOUSEKEEPING] = Value.System.Monitoring.housekeeping
+        self.__config[Key.MONITORING_SAMPLING] = Value.System.Monitoring.sampling
+        self.__config[Key.MONITORING_HISTORY] = Value.System.Monitoring.history
+        self.__config[Key.MONITORING_WINDOW] = Value.System.Monitoring.window
+        self.__config[Key.MONITORING_EWMA_ALPHA] = Value.System.Monitoring.ewma_alpha
         self.__config[Key.MAX_PAR] = Value.System.Environment.max_par
         self.__config[Key.MAX_TRANSP] = Value.System.Environment.max_transp
 
@@ -32,8 +37,12 @@ class Config:
         self.__config[Key.TPUT_THRESHOLD_TRANSP] = Value.Scaling.Transprecision.threshold
         self.__config[Key.TPUT_THRESHOLD_PAR] = Value.Scaling.Parallelism.threshold
         self.__config[Key.TPUT_THRESHOLD_COMBO] = Value.Scaling.Combined.threshold
+        self.__config[Key.BACKPRESSURE_THRESHOLD] = Value.Scaling.Backpressure.threshold
+        self.__config[Key.BACKPRESSURE_STATISTIC] = Value.Scaling.Backpressure.statistic
+        self.__config[Key.BACKPRESSURE_PERCENTILE] = Value.Scaling.Backpressure.percentile
 
         self.__config[Key.REDIS_HOME] = Value.Redis.home
+        self.__config[Key.REDIS_CLI] = Value.Redis.cli
         self.__config[Key.REDIS_DB] = Value.Redis.db_num
         self.__config[Key.REDIS_HOST] = Value.Redis.host
         self.__config[Key.REDIS_PORT] = Value.Redis.port
@@ -42,6 +51,58 @@ class Config:
         self.__config[Key.FLINK_PORT] = Value.Flink.port
         self.__config[Key.FLINK_CMD] = Value.Flink.command
         self.__config[Key.FLINK_JOB_PATH] = Value.Flink.job_path
+        self.__config[Key.FLINK_JOB_NAME] = Value.Flink.job_name
+        self.__config[Key.FLINK_REST_TIMEOUT] = Value.Flink.Rest.timeout
+        self.__config[Key.FLINK_REST_WORKERS] = Value.Flink.Rest.workers
+
+        self.__config[Key.KUBE_BACKEND] = Value.Kube.backend
+        self.__config[Key.KUBE_CMD] = Value.Kube.command
+        self.__config[Key.KUBE_NAMESPACE] = Value.Kube.namespace
+        self.__config[Key.KUBE_DEPLOYMENT] = Value.Kube.deployment
+        self.__config[Key.KUBE_POD_SELECTOR] = Value.Kube.pod_selector
+        self.__config[Key.KUBE_API_URL] = Value.Kube.Api.url
+        self.__config[Key.KUBE_API_TOKEN] = Value.Kube.Api.token
+        self.__config[Key.KUBE_API_CA] = Value.Kube.Api.ca
+        self.__config[Key.KUBE_API_TIMEOUT] = Value.Kube.Api.timeout
+
+        self.__config[Key.RECONF_MODE] = Value.Reconfiguration.mode
+        self.__config[Key.RECONF_IN_PLACE] = Value.Reconfiguration.in_place
+        self.__config[Key.RECONF_SAVEPOINT_PATH] = Value.Reconfiguration.savepoint_path
+        self.__config[Key.RECONF_POLL_INTERVAL] = Value.Reconfiguration.poll_interval
+        self.__config[Key.RECONF_CANCEL_TIMEOUT] = Value.Reconfiguration.cancel_timeout
+        self.__config[Key.RECONF_TASKMANAGERS_TIMEOUT] = Value.Reconfiguration.taskmanagers_timeout
+        self.__config[Key.RECONF_TASKMANAGERS_RESET] = Value.Reconfiguration.taskmanagers_reset
+        self.__config[Key.RECONF_JOB_TIMEOUT] = Value.Reconfiguration.job_timeout
+        self.__config[Key.RECONF_TRANSP_TIMEOUT] = Value.Reconfiguration.transprecision_timeout
+        self.__config[Key.RECONF_SAVEPOINT_TIMEOUT] = Value.Reconfiguration.savepoint_timeout
+        self.__config[Key.RECONF_RESCALE_TIMEOUT] = Value.Reconfiguration.rescale_timeout
+
+        self.__config[Key.METRICS_BACKEND] = Value.Metrics.backend
+        self.__config[Key.PROMETHEUS_HOST] = Value.Prometheus.host
+        self.__config[Key.PROMETHEUS_PORT] = Value.Prometheus.port
+        self.__config[Key.PROMETHEUS_WINDOW] = Value.Prometheus.window
+        self.__config[Key.PROMETHEUS_STEP] = Value.Prometheus.step
+
+        self.__config[Key.TRACE_RECORD_PATH] = Value.Trace.record_path
+
+        self.__config[Key.STATE_PATH] = Value.State.path
+
+        self.__config[Key.MEASUREMENTS_SAMPLES] = Value.Measurements.samples
+        self.__config[Key.MEASUREMENTS_MAX_AGE] = Value.Measurements.max_age
+        self.__config[Key.MEASUREMENTS_AGGREGATION] = Value.Measurements.aggregation
+        self.__config[Key.MEASUREMENTS_TRIM] = Value.Measurements.trim
+        self.__config[Key.MEASUREMENTS_OUTLIER_THRESHOLD] = Value.Measurements.outlier_threshold
+
+        self.__config[Key.PREDICTION_ENGINE] = Value.Prediction.engine
+        self.__config[Key.PREDICTION_FIT_CACHE_SIZE] = Value.Prediction.fit_cache_size
+        self.__config[Key.PREDICTION_ONLINE_ENABLED] = Value.Prediction.online_enabled
+        self.__config[Key.PREDICTION_ONLINE_FORGETTING] = Value.Prediction.online_forgetting
+        self.__config[Key.PREDICTION_MATRIX_FILL] = Value.Prediction.matrix_fill
+        self.__config[Key.PREDICTION_MATRIX_WORKERS] = Value.Prediction.matrix_workers
+        self.__config[Key.PREDICTION_MATRIX_POOL] = Value.Prediction.matrix_pool
+
+        self.__config[Key.PROFILING_ENABLED] = Value.Profiling.enabled
+        self.__config[Key.PROFILING_DUMP_PATH] = Value.Profiling.dump_path
 
         self.__config[Key.DEBUG_LEVEL] = Value.System.Debug.level
 
@@ -58,6 +119,13 @@ class Config:
     def get_str(self, key):
         return str(self.get(key))
 
+    def get_bool(self, key) -> bool:
+        # values read from the configuration file are strings
+        value = self.get(key)
+        if isinstance(value, str):
+            return value.strip().lower() in ["1", "true", "yes", "on"]
+        return bool(value)
+
     def set(self, key, value):
         self.__config[key] = value
 
@@ -4,6 +4,11 @@ from os.path import join
 class ConfigKeys:
     MONITORING_INTERVAL = "sys.monitoring.interval"
     MONITORING_WARMUP = "sys.monitoring.warmup"
+    MONITORING_HOUSEKEEPING = "sys.monitoring.housekeeping"
+    MONITORING_SAMPLING = "sys.monitoring.sampling"
+    MONITORING_HISTORY = "sys.monitoring.history"
+    MONITORING_WINDOW = "sys.monitoring.window"
+    MONITORING_EWMA_ALPHA = "sys.monitoring.ewma.alpha"
     MAX_PAR = "sys.max.par"
     MAX_TRANSP = "sys.max.transp"
 
@@ -13,17 +18,73 @@ class ConfigKeys:
     TPUT_THRESHOLD_TRANSP = "scaling.transprecision.threshold"
     TPUT_THRESHOLD_PAR = "scaling.parallelism.threshold"
     TPUT_THRESHOLD_COMBO = "scaling.combined.threshold"
+    BACKPRESSURE_THRESHOLD = "scaling.backpressure.threshold"
+    BACKPRESSURE_STATISTIC = "scaling.backpressure.statistic"
+    BACKPRESSURE_PERCENTILE = "scaling.backpressure.percentile"
 
     FLINK_HOST = "flink.host"
     FLINK_PORT = "flink.port"
     FLINK_CMD = "flink.cmd"
     FLINK_JOB_PATH = "flink.job.path"
+    FLINK_JOB_NAME = "flink.job.name"
+    FLINK_REST_TIMEOUT = "flink.rest.timeout"
+    FLINK_REST_WORKERS = "flink.rest.workers"
 
     REDIS_HOME = "redis.home"
+    REDIS_CLI = "redis.cli"
     REDIS_DB = "redis.db.num"
     REDIS_HOST = "redis.host"
     REDIS_PORT = "redis.port"
 
+    KUBE_BACKEND = "kube.backend"
+    KUBE_CMD = "kube.cmd"
+    KUBE_NAMESPACE = "kube.namespace"
+    KUBE_DEPLOYMENT = "kube.deployment"
+    KUBE_POD_SELECTOR = "kube.pod.selector"
+    KUBE_API_URL = "kube.api.url"
+    KUBE_API_TOKEN = "kube.api.token"
+    KUBE_API_CA = "kube.api.ca"
+    KUBE_API_TIMEOUT = "kube.api.timeout"
+
+    RECONF_MODE = "reconfiguration.mode"
+    RECONF_IN_PLACE = "reconfiguration.inplace"
+    RECONF_SAVEPOINT_PATH = "reconfiguration.savepoint.path"
+    RECONF_POLL_INTERVAL = "reconfiguration.poll.interval"
+    RECONF_CANCEL_TIMEOUT = "reconfiguration.cancel.timeout"
+    RECONF_TASKMANAGERS_TIMEOUT = "reconfiguration.taskmanagers.timeout"
+    RECONF_TASKMANAGERS_RESET = "reconfiguration.taskmanagers.reset"
+    RECONF_JOB_TIMEOUT = "reconfiguration.job.timeout"
+    RECONF_TRANSP_TIMEOUT = "reconfiguration.transprecision.timeout"
+    RECONF_SAVEPOINT_TIMEOUT = "reconfiguration.savepoint.timeout"
+    RECONF_RESCALE_TIMEOUT = "reconfiguration.rescale.timeout"
+
+    METRICS_BACKEND = "metrics.backend"
+    PROMETHEUS_HOST = "prometheus.host"
+    PROMETHEUS_PORT = "prometheus.port"
+    PROMETHEUS_WINDOW = "prometheus.window"
+    PROMETHEUS_STEP = "prometheus.step"
+
+    TRACE_RECORD_PATH = "trace.record.path"
+
+    STATE_PATH = "state.path"
+
+    MEASUREMENTS_SAMPLES = "measurements.samples"
+    MEASUREMENTS_MAX_AGE = "measurements.samples.max.age"
+    MEASUREMENTS_AGGREGATION = "measurements.aggregation"
+    MEASUREMENTS_TRIM = "measurements.aggregation.trim"
+    MEASUREMENTS_OUTLIER_THRESHOLD = "measurements.outlier.threshold"
+
+    PREDICTION_ENGINE = "prediction.engine"
+    PREDICTION_FIT_CACHE_SIZE = "prediction.fit.cache.size"
+    PREDICTION_ONLINE_ENABLED = "prediction.online.enabled"
+    PREDICTION_ONLINE_FORGETTING = "prediction.online.forgetting"
+    PREDICTION_MATRIX_FILL = "prediction.matrix.fill"
+    PREDICTION_MATRIX_WORKERS = "prediction.matrix.workers"
+    PREDICTION_MATRIX_POOL = "prediction.matrix.pool"
+
+    PROFILING_ENABLED = "profiling.enabled"
+    PROFILING_DUMP_PATH = "profiling.dump.path"
+
     DEBUG_LEVEL = "debug.level"
 
 
@@ -40,6 +101,11 @@ class DefaultValues:
         class Monitoring:
             interval = 60
             warmup = 300
+            housekeeping = 300
+            sampling = 10
+            history = 60
+            window = 6
+            ewma_alpha = 0.3
 
         class Environment:
             max_par = 6
@@ -74,8 +140,18 @@ class DefaultValues:
         class Combined:
             threshold = 30
 
+        class Backpressure:
+            STAT_MAX = "max"
+            STAT_MEAN = "mean"
+            STAT_PERCENTILE = "percentile"
+
+            threshold = 50
+            statistic = STAT_MAX
+            percentile = 95
+
     class Redis:
         home = join("~", "redis-6.2.6")
+        cli = ""
         db_num = "15"
         host = "localhost"
         port = "6379"
@@ -85,3 +161,104 @@ class DefaultValues:
         port = "8081"
         command = "flink"
         job_path = "flink-job.jar"
+        job_name = ""
+
+        class Rest:
+            timeout = 10
+            workers = 8
+
+    class Kube:
+        # the task managers are scaled by forking kubectl, or through the Kubernetes API
+        BACKEND_KUBECTL = "kubectl"
+        BACKEND_API = "api"
+
+        backend = BACKEND_KUBECTL
+        # a wrapper reaching the cluster, e.g. ssh to its master, is set by the configuration of the deployment
+        command = "kubectl"
+        # the namespace of kubectl is the one of its context
+        namespace = "default"
+        deployment = "flink-taskmanager"
+        pod_selector = "app=flink,component=taskmanager"
+
+        class Api:
+            # in-cluster defaults, with the service account of the pod
+            url = "https://kubernetes.default.svc"
+            token = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+            ca = "/var/run/secrets/kubernetes.io/serviceaccount/ca.crt"
+            timeout = 10
+
+    class Reconfiguration:
+        # the job is cancelled and restarted without its state, or stopped with a savepoint and restored from it
+        MODE_CANCEL = "cancel"
+        MODE_SAVEPOINT = "savepoint"
+
+        # clusters running the adaptive scheduler can rescale the job in place, the mode above being the fallback
+        IN_PLACE_AUTO = "auto"
+        IN_PLACE_ALWAYS = "always"
+        IN_PLACE_NEVER = "never"
+
+        mode = MODE_CANCEL
+        in_place = IN_PLACE_AUTO
+        # directory of the savepoints, the one configured in the cluster if empty
+        savepoint_path = ""
+        # a restarted job runs on fresh task managers, instead of the surplus ones only being removed
+        taskmanagers_reset = False
+
+        # seconds between two readings of the state of the cluster, and deadlines of the steps
+        poll_interval = 1
+        cancel_timeout = 60
+        taskmanagers_timeout = 180
+        job_timeout = 120
+        transprecision_timeout = 120
+        savepoint_timeout = 600
+        rescale_timeout = 120
+
+    class Metrics:
+        BACKEND_FLINK = "flink"
+        BACKEND_PROMETHEUS = "prometheus"
+
+        backend = BACKEND_FLINK
+
+    class Prometheus:
+        host = "localhost"
+        port = "9090"
+        window = 30
+        step = 5
+
+    class Trace:
+        record_path = ""
+
+    class State:
+        path = ""
+
+    class Measurements:
+        AGGREGATION_MEDIAN = "median"
+        AGGREGATION_TRIMMED = "trimmed"
+
+        samples = 32
+        max_age = 900
+        aggregation = AGGREGATION_MEDIAN
+        trim = 0.2
+        outlier_threshold = 3.5
+
+    class Prediction:
+        ENGINE_MATRIX = "matrix"
+        ENGINE_JOINT = "joint"
+        ENGINE_LAZY = "lazy"
+        FILL_SEQUENTIAL = "sequential"
+        FILL_WAVES = "waves"
+        POOL_PROCESS = "process"
+        POOL_THREAD = "thread"
+
+        engine = ENGINE_MATRIX
+        fit_cache_size = 1024
+        online_enabled = False
+        online_forgetting = 0.98
+        matrix_fill = FILL_SEQUENTIAL
+        # 0: one worker per cpu
+        matrix_workers = 0
+        matrix_pool = POOL_PROCESS
+
+    class Profiling:
+        enabled = False
+        dump_path = ""
@@ -0,0 +1,127 @@
+import json
+from contextlib import nullcontext
+from math import log2
+from threading import Lock
+from time import perf_counter
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+
+# log-scale buckets of the durations in microseconds, 4 per power of two (about 19% wide), up to ~3 hours
+BUCKETS_PER_OCTAVE = 4
+BUCKETS = 34 * BUCKETS_PER_OCTAVE
+
+
+class PhaseHistogram:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+
+        us = duration * 1e6
+        bucket = int(log2(us) * BUCKETS_PER_OCTAVE) if us > 1 else 0
+        self.buckets[min(bucket, BUCKETS - 1)] += 1
+
+    def get_percentile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th percentile, capped by the largest duration seen
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if n > 0 and seen >= rank:
+                return min(2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1e6, self.max)
+        return self.max
+
+    def get_stats(self) -> dict[str, float]:
+        # the histogram lists the upper bound in seconds and the count of the non-empty buckets
+        histogram = [(2 ** ((b + 1) / BUCKETS_PER_OCTAVE) / 1e6, n) for b, n in enumerate(self.buckets) if n > 0]
+        return {"count": self.count, "total": self.total, "mean": self.total / self.count if self.count else 0.0,
+                "min": self.min if self.count else 0.0, "max": self.max,
+                "p50": self.get_percentile(50), "p95": self.get_percentile(95), "p99": self.get_percentile(99),
+                "histogram": histogram}
+
+
+class Span:
+
+    def __init__(self, profiler: "Profiler", phase: str):
+        self.__profiler = profiler
+        self.__phase = phase
+        self.__start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.__start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.__profiler.record(self.__phase, perf_counter() - self.__start)
+
+
+class Profiler:
+
+    def __init__(self):
+        self.__enabled = False
+        self.__log = None
+        self.__path = ""
+
+        self.__lock = Lock()
+        self.__phases = {}
+        # a single reusable no-op span: a disabled profiler costs one attribute test per phase
+        self.__disabled_span = nullcontext()
+
+    def configure(self, conf: Config, log: Logger) -> None:
+        self.__log = log
+        self.__enabled = conf.get_bool(Key.PROFILING_ENABLED)
+        self.__path = conf.get_str(Key.PROFILING_DUMP_PATH)
+
+    def is_enabled(self) -> bool:
+        return self.__enabled
+
+    def span(self, phase: str) -> Span | nullcontext:
+        if not self.__enabled:
+            return self.__disabled_span
+        return Span(self, phase)
+
+    def record(self, phase: str, duration: float) -> None:
+        with self.__lock:
+            histogram = self.__phases.get(phase)
+            if histogram is None:
+                histogram = self.__phases[phase] = PhaseHistogram()
+            histogram.add(duration)
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        with self.__lock:
+            return {phase: histogram.get_stats() for phase, histogram in sorted(self.__phases.items())}
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__phases = {}
+
+    def dump(self) -> None:
+        if not self.__enabled:
+            return
+        stats = self.get_stats()
+
+        self.__log.info(f"[PROFILER] Time spent per phase (ms):")
+        self.__log.info(f"\t{'phase':<32} {'count':>7} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+        for phase, s in stats.items():
+            self.__log.info(f"\t{phase:<32} {s['count']:>7} {s['mean'] * 1000:>10.2f} {s['p50'] * 1000:>10.2f} "
+                            f"{s['p95'] * 1000:>10.2f} {s['p99'] * 1000:>10.2f} {s['max'] * 1000:>10.2f}")
+
+        if self.__path:
+            with open(self.__path, "w") as dump_file:
+                json.dump(stats, dump_file, indent=2)
+            self.__log.info(f"[PROFILER] Phase histograms written to {self.__path}")
+
+
+# shared by all the components, enabled from the configuration by the entry points
+profiler = Profiler()
@@ -0,0 +1,35 @@
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import DefaultValues, ConfigKeys as Key
+from transscale.utils.Logger import Logger
+
+
+# How the replicas of the task manager deployment are changed
+class BaseClusterBackend:
+
+    def __init__(self, conf: Config, log: Logger):
+        self.log = log
+        self.backend_name = "BaseClusterBackend"
+        # without a watch of the pods, their readiness is only observed through the JobManager
+        self.watches_pods = False
+
+    def scale(self, replicas: int) -> None:
+        pass
+
+    def wait_for_pods(self, replicas: int, timeout: float) -> bool:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def init_cluster_backend(conf: Config, log: Logger) -> BaseClusterBackend:
+    backend = conf.get_str(Key.KUBE_BACKEND)
+
+    if backend == DefaultValues.Kube.BACKEND_KUBECTL:
+        from transscale.utils.cluster.KubectlBackend import KubectlBackend
+        return KubectlBackend(conf, log)
+    elif backend == DefaultValues.Kube.BACKEND_API:
+        from transscale.utils.cluster.KubeApiBackend import KubeApiBackend
+        return KubeApiBackend(conf, log)
+
+    raise ValueError(f"Unknown cluster backend {backend}")
@@ -0,0 +1,102 @@
+import json
+from math import ceil
+from os.path import exists, expanduser
+from time import monotonic
+
+import requests as req
+from requests.adapters import HTTPAdapter
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.cluster.ClusterBackend import BaseClusterBackend
+
+
+class KubeApiBackend(BaseClusterBackend):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(KubeApiBackend, self).__init__(conf, log)
+        self.backend_name = "KubeApiBackend"
+        self.watches_pods = True
+
+        url = conf.get_str(Key.KUBE_API_URL).rstrip("/")
+        namespace = conf.get_str(Key.KUBE_NAMESPACE)
+        self.__scale_url = f"{url}/apis/apps/v1/namespaces/{namespace}/deployments/" \
+                           f"{conf.get_str(Key.KUBE_DEPLOYMENT)}/scale"
+        self.__pods_url = f"{url}/api/v1/namespaces/{namespace}/pods"
+        self.__selector = conf.get_str(Key.KUBE_POD_SELECTOR)
+        self.__timeout = conf.get_float(Key.KUBE_API_TIMEOUT)
+
+        # one keep-alive session, authenticated once with the token of the service account
+        self.__session = req.Session()
+        self.__session.mount("http://", HTTPAdapter(pool_maxsize=1))
+        self.__session.mount("https://", HTTPAdapter(pool_maxsize=1))
+        token_path = expanduser(conf.get_str(Key.KUBE_API_TOKEN))
+        if token_path and exists(token_path):
+            with open(token_path) as token:
+                self.__session.headers["Authorization"] = f"Bearer {token.read().strip()}"
+        elif token_path:
+            self.log.warning(f"[KUBE_API] No token at [{token_path}], requests are not authenticated")
+        ca_path = expanduser(conf.get_str(Key.KUBE_API_CA))
+        if ca_path and exists(ca_path):
+            self.__session.verify = ca_path
+
+    def scale(self, replicas: int) -> None:
+        self.log.debug(f"\t Scaling {self.__scale_url} to {replicas} replicas")
+        res = self.__session.patch(self.__scale_url, data=json.dumps({"spec": {"replicas": replicas}}),
+                                   headers={"Content-Type": "application/merge-patch+json"}, timeout=self.__timeout)
+        res.raise_for_status()
+
+    @staticmethod
+    def __are_pods_ready(pods: dict[str, dict], replicas: int) -> bool:
+        # the terminating pods must be gone, and all the others ready
+        if len(pods) != replicas:
+            return False
+        for pod in pods.values():
+            conditions = pod.get("status", {}).get("conditions") or []
+            if "deletionTimestamp" in pod["metadata"] or not any(c["type"] == "Ready" and c["status"] == "True"
+                                                                 for c in conditions):
+                return False
+        return True
+
+    def wait_for_pods(self, replicas: int, timeout: float) -> bool:
+        # lists the pods once, then follows their changes as a stream of events from the version of the list
+        deadline = monotonic() + timeout
+        res = self.__session.get(self.__pods_url, params={"labelSelector": self.__selector}, timeout=self.__timeout)
+        res.raise_for_status()
+        pod_list = res.json()
+        pods = {pod["metadata"]["name"]: pod for pod in pod_list["items"]}
+        version = pod_list["metadata"]["resourceVersion"]
+
+        while not self.__are_pods_ready(pods, replicas):
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return False
+
+            params = {"labelSelector": self.__selector, "watch": "true", "resourceVersion": version,
+                      "timeoutSeconds": max(ceil(remaining), 1)}
+            with self.__session.get(self.__pods_url, params=params, stream=True,
+                                    timeout=(self.__timeout, remaining + self.__timeout)) as res:
+                res.raise_for_status()
+                for line in res.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "ERROR":
+                        # e.g. the version of the list is too old: the pods are listed again
+                        raise LookupError(f"Watch of the pods failed: {event['object'].get('message')}")
+
+                    pod = event["object"]
+                    version = pod["metadata"]["resourceVersion"]
+                    if event["type"] == "DELETED":
+                        pods.pop(pod["metadata"]["name"], None)
+                    else:
+                        pods[pod["metadata"]["name"]] = pod
+                    self.log.debugg(f"[KUBE_API] {event['type']} pod {pod['metadata']['name']}")
+
+                    if self.__are_pods_ready(pods, replicas):
+                        return True
+        return True
+
+    def close(self) -> None:
+        self.__session.close()
@@ -0,0 +1,25 @@
+import subprocess as sp
+import shlex as sx
+from os.path import expanduser
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.cluster.ClusterBackend import BaseClusterBackend
+
+
+class KubectlBackend(BaseClusterBackend):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(KubectlBackend, self).__init__(conf, log)
+        self.backend_name = "KubectlBackend"
+
+        self.__kube_cmd = expanduser(conf.get(Key.KUBE_CMD))
+        self.__deployment = conf.get_str(Key.KUBE_DEPLOYMENT)
+
+    def scale(self, replicas: int) -> None:
+        # one process per command, its failure raises a CalledProcessError
+        scale_cmd = f"{self.__kube_cmd} scale --replicas={replicas} deployment/{self.__deployment}"
+        self.log.debug(f"\t Running command: {scale_cmd}")
+        proc = sp.run(sx.split(scale_cmd), capture_output=True, check=True)
+        self.log.debug(f"\t Exit code: {proc.returncode}")
@@ -0,0 +1,18 @@
+from transscale.utils.Config import Config
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.JobGraph import Job
+from transscale.utils.metrics.MetricsBackend import BaseMetricsBackend
+
+
+class FlinkRestBackend(BaseMetricsBackend):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(FlinkRestBackend, self).__init__(conf, log)
+        self.backend_name = "FlinkRestBackend"
+
+    def get_urls(self, job: Job, now: float) -> list[str]:
+        # the job document, then the backpressure and the metrics of every vertex
+        return job.get_urls()
+
+    def update_metrics(self, job: Job, responses: dict[str, any]) -> None:
+        job.update_metrics(responses)
@@ -0,0 +1,244 @@
+from typing import TYPE_CHECKING
+
+from numpy import array, concatenate, nan_to_num, ndarray, zeros
+
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.MetricsCollector import MetricsCollector, MetricNotFoundError
+from transscale.utils.metrics.SubtaskStats import SubtaskStats
+
+if TYPE_CHECKING:
+    from transscale.utils.metrics.MetricsBackend import BaseMetricsBackend
+
+BACKPRESSURE_HIGH = 0.5
+# the running jobs, only requested to discover the topology and to check it
+OVERVIEW_PATH = "/jobs/overview"
+
+RECORDS_IN = 0
+RECORDS_OUT = 1
+BUSY_TIME = 2
+SUBTASK_METRICS = ["numRecordsInPerSecond", "numRecordsOutPerSecond", "busyTimeMsPerSecond"]
+# the task-level output of a chained vertex is the one of its last operator: the operator-scoped metric is preferred,
+# and the task-level one only kept for the vertices whose operator does not report it, e.g. chains
+OPERATOR_RECORDS_OUT = "numRecordsOutPerSecond"
+
+
+class JobVertex:
+
+    def __init__(self, job_url: str, vertex_res: dict):
+        self.id = vertex_res["id"]
+        self.name = vertex_res["name"]
+        self.parallelism = int(vertex_res["parallelism"])
+        self.inputs = []
+
+        self.url = f"{job_url}/vertices/{self.id}"
+        self.backpressure_url = f"{self.url}/backpressure"
+        self.transprecision_url = f"{self.url}/metrics?get=0.{self.name}.TransprecisionLevel"
+        self.operator_records_out = f"{self.name}.{OPERATOR_RECORDS_OUT}"
+
+        # per-subtask values: backpressure ratios and a row per SUBTASK_METRICS
+        self.backpressure_ratios = zeros(0)
+        self.subtask_metrics = zeros([len(SUBTASK_METRICS), 0])
+
+        self.backpressure = 0.0
+        self.input_rate = 0
+        self.output_rate = 0
+        self.busy_ratio = 0.0
+        self.transprecision = None
+
+    @property
+    def metrics_url(self) -> str:
+        # all the metrics of all the subtasks in a single request, whatever the parallelism
+        # TODO: must be multiplied by transp level, or consider InPerSecond?
+        names = ",".join([f"{i}.{m}" for i in range(self.parallelism)
+                          for m in SUBTASK_METRICS + [self.operator_records_out]])
+        return f"{self.url}/metrics?get={names}"
+
+    def get_urls(self) -> list[str]:
+        return [self.backpressure_url, self.metrics_url, self.transprecision_url]
+
+    def is_source(self) -> bool:
+        return len(self.inputs) == 0
+
+    def is_backpressured(self) -> bool:
+        return self.backpressure > BACKPRESSURE_HIGH
+
+    def set_metrics(self, backpressure_ratios: ndarray, subtask_metrics: ndarray, transprecision: int | None,
+                    operator_output: dict[int, float] = None) -> None:
+        self.backpressure_ratios = backpressure_ratios
+        # idle subtasks report NaN busy time
+        self.subtask_metrics = nan_to_num(subtask_metrics)
+        for subtask, value in (operator_output or {}).items():
+            self.subtask_metrics[RECORDS_OUT, subtask] = nan_to_num(value)
+
+        self.backpressure = float(self.backpressure_ratios.max()) if len(self.backpressure_ratios) > 0 else 0.0
+        self.input_rate, self.output_rate, _ = self.subtask_metrics.sum(axis=1).astype(int)
+        self.busy_ratio = float(self.subtask_metrics[BUSY_TIME].mean()) / 1000 if self.parallelism > 0 else 0.0
+        self.transprecision = transprecision
+
+    def update_metrics(self, responses: dict[str, any]) -> None:
+        # the first request of the backpressure only triggers the sampling, so subtasks may be missing
+        subtasks = responses[self.backpressure_url].get("subtasks", [])
+        ratios = array([float(s["ratio"]) for s in subtasks])
+
+        values = zeros([len(SUBTASK_METRICS), self.parallelism])
+        operator_output = {}
+        for metric in responses[self.metrics_url]:
+            subtask, name = metric["id"].split(".", 1)
+            if name == self.operator_records_out:
+                operator_output[int(subtask)] = float(metric["value"])
+            else:
+                values[SUBTASK_METRICS.index(name), int(subtask)] = float(metric["value"])
+
+        transp_res = responses[self.transprecision_url]
+        self.set_metrics(ratios, values, int(float(transp_res[0]["value"])) if len(transp_res) > 0 else None,
+                         operator_output)
+
+    def get_backpressure_stats(self, q: float = 95) -> SubtaskStats:
+        return SubtaskStats(self.backpressure_ratios, q)
+
+    def get_subtask_stats(self, q: float = 95) -> SubtaskStats:
+        return SubtaskStats(self.subtask_metrics, q)
+
+
+class Job:
+
+    def __init__(self, jobs_url: str, job_res: dict):
+        self.id = job_res["jid"]
+        self.name = job_res["name"]
+        self.url = f"{jobs_url}/{self.id}"
+
+        self.state = job_res.get("state")
+        self.duration = job_res.get("duration", 0)
+        self.vertices = []
+
+    def update_topology(self, job_res: dict) -> None:
+        # vertices are listed by Flink in topological order, the plan gives the edges among them
+        self.vertices = [JobVertex(self.url, v) for v in job_res["vertices"]]
+        inputs = {n["id"]: [i["id"] for i in n.get("inputs", [])] for n in job_res.get("plan", {}).get("nodes", [])}
+
+        for vertex in self.vertices:
+            vertex.inputs = inputs.get(vertex.id, [])
+
+        self.update_status(job_res)
+
+    def update_status(self, job_res: dict) -> None:
+        self.state = job_res["state"]
+        self.duration = job_res["duration"]
+
+        parallelism = {v["id"]: int(v["parallelism"]) for v in job_res["vertices"]}
+        for vertex in self.vertices:
+            vertex.parallelism = parallelism.get(vertex.id, vertex.parallelism)
+
+    def get_vertex(self, vertex_id: str) -> JobVertex:
+        return next(v for v in self.vertices if v.id == vertex_id)
+
+    def get_sources(self) -> list[JobVertex]:
+        return [v for v in self.vertices if v.is_source()]
+
+    def get_urls(self) -> list[str]:
+        return [self.url] + [url for v in self.vertices for url in v.get_urls()]
+
+    def update_metrics(self, responses: dict[str, any]) -> None:
+        # vertices first: the urls just fetched depend on the parallelism before the status update
+        for vertex in self.vertices:
+            vertex.update_metrics(responses)
+        self.update_status(responses[self.url])
+
+    def get_source_backpressure(self) -> float:
+        return max([v.backpressure for v in self.get_sources()], default=0.0)
+
+    def get_source_backpressure_stats(self, q: float = 95) -> SubtaskStats:
+        ratios = [v.backpressure_ratios for v in self.get_sources()]
+        return SubtaskStats(concatenate(ratios) if len(ratios) > 0 else zeros(0), q)
+
+    def get_source_throughput(self) -> int:
+        return sum([v.output_rate for v in self.get_sources()])
+
+    def get_transprecision(self) -> int | None:
+        return next((v.transprecision for v in self.vertices if v.transprecision is not None), None)
+
+    def get_bottleneck(self) -> JobVertex | None:
+        operators = [v for v in self.vertices if not v.is_source()]
+        if len(operators) == 0:
+            return None
+
+        # a vertex slows down the job when all its inputs are backpressured while itself is not
+        backpressured = {v.id for v in self.vertices if v.is_backpressured()}
+        candidates = [v for v in operators
+                      if v.id not in backpressured and all([i in backpressured for i in v.inputs])]
+
+        if len(candidates) == 0:
+            candidates = operators
+
+        bottleneck = max(candidates, key=lambda v: v.busy_ratio)
+        if bottleneck.busy_ratio == 0:
+            # no busy time reported: fall back to the first operator after the sources
+            bottleneck = candidates[0]
+
+        return bottleneck
+
+
+class JobGraph:
+
+    def __init__(self, cluster_url: str, collector: MetricsCollector, backend: "BaseMetricsBackend", log: Logger):
+        self.__log = log
+        self.__collector = collector
+        self.__backend = backend
+
+        self.__jobs_url = f"{cluster_url}/jobs"
+        self.__overview_url = f"{cluster_url}{OVERVIEW_PATH}"
+        self.__jobs = []
+        self.__valid = False
+
+    def __get_running_jobs(self) -> list[dict]:
+        return [j for j in self.__collector.get(self.__overview_url)["jobs"] if j["state"] == "RUNNING"]
+
+    def discover(self) -> None:
+        self.__jobs = [Job(self.__jobs_url, j) for j in self.__get_running_jobs()]
+
+        details = self.__collector.fetch([job.url for job in self.__jobs])
+        for job in self.__jobs:
+            job.update_topology(details[job.url])
+
+        self.__valid = True
+        self.__log.debug(f"[JOB_GRAPH] Discovered {len(self.__jobs)} running jobs with "
+                         f"{sum([len(job.vertices) for job in self.__jobs])} vertices")
+
+    def is_valid(self) -> bool:
+        return self.__valid
+
+    def invalidate(self, reason: str) -> None:
+        if self.__valid:
+            self.__log.info(f"[JOB_GRAPH] Topology invalidated: {reason}")
+        self.__valid = False
+
+    def check_jobs(self) -> None:
+        # a single request to notice jobs restarted with a new id, or started and stopped meanwhile
+        running = {j["jid"] for j in self.__get_running_jobs()}
+        if running != {job.id for job in self.__jobs}:
+            self.invalidate("the set of running jobs changed")
+
+    def refresh(self) -> None:
+        # one parallel round of requests per job, linear in the number of its vertices with the Flink REST API
+        try:
+            for job in self.__jobs:
+                urls = self.__backend.get_urls(job, self.__collector.get_time())
+                self.__backend.update_metrics(job, self.__collector.fetch(urls))
+        except MetricNotFoundError as err:
+            self.invalidate(str(err))
+            return
+
+        for job in self.__jobs:
+            if job.state != "RUNNING":
+                self.invalidate(f"job {job.name} ({job.id}) is {job.state}")
+
+    def reset_metrics(self, timestamp: float) -> None:
+        self.__backend.reset(timestamp)
+
+    def get_jobs(self) -> list[Job]:
+        return self.__jobs
+
+    def get_job(self, name: str = None) -> Job | None:
+        if name:
+            return next((job for job in self.__jobs if job.name == name), None)
+        return self.__jobs[0] if len(self.__jobs) > 0 else None
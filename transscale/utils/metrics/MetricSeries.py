@@ -0,0 +1,82 @@
+from numpy import arange, ndarray, percentile, zeros
+
+
+class MetricSeries:
+
+    def __init__(self, size: int, alpha: float):
+        self.__size = size
+        self.__alpha = alpha
+
+        self.__times = zeros(size)
+        self.__values = zeros(size)
+        self.__head = 0
+        self.__count = 0
+
+        self.__ewma = 0.0
+        self.__origin = None
+
+        # running sums of the samples in the buffer, for the least squares trend
+        self.__sum_t = 0.0
+        self.__sum_tt = 0.0
+        self.__sum_v = 0.0
+        self.__sum_tv = 0.0
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def push(self, time: float, value: float) -> None:
+        if self.__origin is None:
+            # times relative to the first sample, to keep the running sums well conditioned
+            self.__origin = time
+            self.__ewma = value
+        else:
+            self.__ewma = self.__alpha * value + (1 - self.__alpha) * self.__ewma
+
+        if self.__count == self.__size:
+            old_t, old_v = self.__times[self.__head], self.__values[self.__head]
+            self.__sum_t -= old_t
+            self.__sum_tt -= old_t * old_t
+            self.__sum_v -= old_v
+            self.__sum_tv -= old_t * old_v
+        else:
+            self.__count += 1
+
+        t = time - self.__origin
+        self.__times[self.__head] = t
+        self.__values[self.__head] = value
+        self.__head = (self.__head + 1) % self.__size
+
+        self.__sum_t += t
+        self.__sum_tt += t * t
+        self.__sum_v += value
+        self.__sum_tv += t * value
+
+    def clear(self) -> None:
+        self.__head = 0
+        self.__count = 0
+        self.__ewma = 0.0
+        self.__origin = None
+        self.__sum_t = self.__sum_tt = self.__sum_v = self.__sum_tv = 0.0
+
+    def get_last(self) -> float:
+        return float(self.__values[self.__head - 1]) if self.__count > 0 else 0.0
+
+    def get_window(self, n: int = None) -> ndarray:
+        # the last n samples, oldest first
+        n = self.__count if n is None else min(n, self.__count)
+        return self.__values[(self.__head - n + arange(n)) % self.__size]
+
+    def get_ewma(self) -> float:
+        return self.__ewma
+
+    def get_percentile(self, q: float, n: int = None) -> float:
+        window = self.get_window(n)
+        return float(percentile(window, q)) if len(window) > 0 else 0.0
+
+    def get_trend(self) -> float:
+        # slope of the least squares line over the buffer, in value units per second
+        n = self.__count
+        denominator = n * self.__sum_tt - self.__sum_t * self.__sum_t
+        if n < 2 or denominator == 0:
+            return 0.0
+        return (n * self.__sum_tv - self.__sum_t * self.__sum_v) / denominator
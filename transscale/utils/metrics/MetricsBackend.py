@@ -0,0 +1,35 @@
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import DefaultValues, ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.JobGraph import Job
+
+
+# Where the per-subtask metrics of the vertices come from, the topology is always read from the Flink REST API
+class BaseMetricsBackend:
+
+    def __init__(self, conf: Config, log: Logger):
+        self.log = log
+        self.backend_name = "BaseMetricsBackend"
+
+    def get_urls(self, job: Job, now: float) -> list[str]:
+        pass
+
+    def update_metrics(self, job: Job, responses: dict[str, any]) -> None:
+        pass
+
+    # The samples taken before the timestamp, e.g. of a reconfiguration, do not describe the running configuration
+    def reset(self, timestamp: float) -> None:
+        pass
+
+
+def init_backend(conf: Config, log: Logger) -> BaseMetricsBackend:
+    backend = conf.get_str(Key.METRICS_BACKEND)
+
+    if backend == DefaultValues.Metrics.BACKEND_FLINK:
+        from transscale.utils.metrics.FlinkRestBackend import FlinkRestBackend
+        return FlinkRestBackend(conf, log)
+    elif backend == DefaultValues.Metrics.BACKEND_PROMETHEUS:
+        from transscale.utils.metrics.PrometheusBackend import PrometheusBackend
+        return PrometheusBackend(conf, log)
+
+    raise ValueError(f"Unknown metrics backend {backend}")
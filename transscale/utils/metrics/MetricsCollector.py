@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter, time
+
+import requests as req
+from requests.adapters import HTTPAdapter
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.metrics.TraceRecorder import TraceRecorder
+
+
+class MetricNotFoundError(LookupError):
+
+    def __init__(self, url: str):
+        super(MetricNotFoundError, self).__init__(f"{url} not found")
+        self.url = url
+
+
+class MetricsCollector:
+
+    def __init__(self, conf: Config, log: Logger, recorder: TraceRecorder = None):
+        self.__log = log
+        self.__recorder = recorder
+        self.__timeout = conf.get_float(Key.FLINK_REST_TIMEOUT)
+        workers = conf.get_int(Key.FLINK_REST_WORKERS)
+
+        # one keep-alive session shared by all the fetches, with a pool big enough for the parallel ones
+        self.__session = req.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collector")
+        self.__lock = Lock()
+
+        # responses and fetch times of the current tick, indexed by url
+        self.__responses = {}
+        self.__timings = {}
+        self.__tick_time = 0.0
+
+    def __fetch_url(self, url: str) -> tuple[any, float]:
+        start = perf_counter()
+        res = self.__session.get(url, timeout=self.__timeout)
+        # the body of an error is not a document, e.g. the html page of a proxy
+        body = res.json() if res.ok else None
+        if self.__recorder is not None:
+            self.__recorder.record_response(url, res.status_code, body)
+
+        if res.status_code == 404:
+            # the url belongs to a vertex or a job that does not exist anymore
+            raise MetricNotFoundError(url)
+        res.raise_for_status()
+        return body, perf_counter() - start
+
+    def new_tick(self) -> None:
+        with self.__lock:
+            self.__responses = {}
+            self.__timings = {}
+            self.__tick_time = 0.0
+
+    def fetch(self, urls: list[str]) -> dict[str, any]:
+        # identical urls are downloaded once per tick, the missing ones all together in parallel
+        with self.__lock:
+            cached = {url: self.__responses[url] for url in urls if url in self.__responses}
+        missing = [url for url in dict.fromkeys(urls) if url not in cached]
+
+        results = {}
+        if len(missing) > 0:
+            start = perf_counter()
+            with profiler.span("rest.fetch"):
+                futures = {url: self.__executor.submit(self.__fetch_url, url) for url in missing}
+
+                for url, future in futures.items():
+                    results[url] = future.result()
+
+            elapsed = perf_counter() - start
+            with self.__lock:
+                for url, (res, fetch_time) in results.items():
+                    self.__responses[url] = res
+                    self.__timings[url] = fetch_time
+                self.__tick_time += elapsed
+
+            self.__log.debugg(f"[COLLECTOR] Fetched {len(missing)} urls in {elapsed * 1000:.1f} ms")
+
+        return {url: cached[url] if url in cached else results[url][0] for url in urls}
+
+    def get(self, url: str) -> any:
+        return self.fetch([url])[url]
+
+    # Downloads a document now, whether or not it was already in the current tick
+    def poll(self, url: str) -> any:
+        with profiler.span("rest.poll"):
+            return self.__fetch_url(url)[0]
+
+    def __send(self, method: str, url: str, body: dict) -> any:
+        with profiler.span(f"rest.{method.lower()}"):
+            res = self.__session.request(method, url, json=body, timeout=self.__timeout)
+        if res.status_code == 404:
+            raise MetricNotFoundError(url)
+        res.raise_for_status()
+        return res.json() if len(res.content) > 0 else None
+
+    # Sends a request triggering an operation, e.g. a savepoint, and returns the response
+    def post(self, url: str, body: dict) -> any:
+        return self.__send("POST", url, body)
+
+    # Sends a request replacing a document, e.g. the resource requirements of a job, and returns the response
+    def put(self, url: str, body: dict) -> any:
+        return self.__send("PUT", url, body)
+
+    def get_time(self) -> float:
+        return time()
+
+    def get_timings(self) -> dict[str, float]:
+        with self.__lock:
+            return dict(self.__timings)
+
+    def get_tick_time(self) -> float:
+        return self.__tick_time
+
+    def print_timings(self) -> None:
+        self.__log.debug(f"[COLLECTOR] Fetch times of the current tick (total {self.__tick_time * 1000:.1f} ms):")
+        for url, fetch_time in self.get_timings().items():
+            self.__log.debug(f"\t{fetch_time * 1000:.1f} ms -- {url}")
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=False)
+        self.__session.close()
@@ -0,0 +1,120 @@
+from math import floor
+from urllib.parse import urlencode
+
+from numpy import zeros
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.JobGraph import Job, OPERATOR_RECORDS_OUT, SUBTASK_METRICS
+from transscale.utils.metrics.MetricsBackend import BaseMetricsBackend
+
+# names given by the Prometheus reporter of Flink to the task and operator metrics
+TASK_PREFIX = "flink_taskmanager_job_task_"
+OPERATOR_PREFIX = "flink_taskmanager_job_task_operator_"
+BACKPRESSURE_METRIC = "backPressuredTimeMsPerSecond"
+TRANSPRECISION_METRIC = "TransprecisionLevel"
+
+
+class PrometheusBackend(BaseMetricsBackend):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(PrometheusBackend, self).__init__(conf, log)
+        self.backend_name = "PrometheusBackend"
+
+        self.__query_url = f"http://{conf.get(Key.PROMETHEUS_HOST)}:{conf.get(Key.PROMETHEUS_PORT)}/api/v1/query_range"
+        self.__window = conf.get_float(Key.PROMETHEUS_WINDOW)
+        self.__step = conf.get_float(Key.PROMETHEUS_STEP)
+
+        # query urls of the window last requested for each job
+        self.__urls = {}
+        # the task metrics are only averaged on the samples taken since the last reconfiguration
+        self.__reset_time = 0.0
+
+    def __get_query_url(self, query: str, now: float) -> str:
+        # windows aligned on the step: the urls of a tick are identical, and so cached by the collector
+        end = floor(now / self.__step) * self.__step
+        params = {"query": query, "start": end - self.__window, "end": end, "step": self.__step}
+        return f"{self.__query_url}?{urlencode(params)}"
+
+    def __get_queries(self, job: Job) -> tuple[str, str]:
+        # every task metric of all the vertices and subtasks of the job in one query, the operator metrics in another
+        names = "|".join([BACKPRESSURE_METRIC] + SUBTASK_METRICS)
+        tasks = f'{{__name__=~"{TASK_PREFIX}({names})",job_id="{job.id}"}}'
+        names = f"{TRANSPRECISION_METRIC}|{OPERATOR_RECORDS_OUT}"
+        operators = f'{{__name__=~"{OPERATOR_PREFIX}({names})",job_id="{job.id}"}}'
+        return tasks, operators
+
+    def get_urls(self, job: Job, now: float) -> list[str]:
+        # the job document still comes from Flink, it tells the state of the job and the parallelism of the vertices
+        self.__urls[job.id] = [self.__get_query_url(query, now) for query in self.__get_queries(job)]
+        return [job.url] + self.__urls[job.id]
+
+    def reset(self, timestamp: float) -> None:
+        self.__reset_time = timestamp
+
+    @staticmethod
+    def __get_running_since(job_res: dict) -> float:
+        # the job enters RUNNING again when it restarts, e.g. rescaled in place by the adaptive scheduler
+        timestamps = job_res.get("timestamps") or {}
+        return max(timestamps.get("RUNNING", job_res.get("start-time", 0)), 0) / 1000
+
+    def __get_results(self, res: dict) -> list[dict]:
+        if res.get("status") != "success":
+            self.log.error(f"[PROMETHEUS] Query failed: {res.get('error', res)}")
+            return []
+        return res["data"]["result"]
+
+    def __get_series(self, res: dict, since: float) -> list[tuple[dict, float]]:
+        # the samples of the window taken since the given time are averaged, the series without any are dropped
+        series = []
+        for result in self.__get_results(res):
+            values = [float(v) for t, v in result["values"] if float(t) >= since]
+            if len(values) > 0:
+                series.append((result["metric"], sum(values) / len(values)))
+        return series
+
+    def __get_last_values(self, res: dict) -> list[tuple[dict, float]]:
+        # a gauge is worth its last sample: averaged over a change of level, it would be neither of the two levels
+        return [(result["metric"], float(result["values"][-1][1])) for result in self.__get_results(res)
+                if len(result["values"]) > 0]
+
+    def update_metrics(self, job: Job, responses: dict[str, any]) -> None:
+        tasks_url, operators_url = self.__urls[job.id]
+
+        vertices = {v.id: v for v in job.vertices}
+        ratios = {v.id: zeros(v.parallelism) for v in job.vertices}
+        values = {v.id: zeros([len(SUBTASK_METRICS), v.parallelism]) for v in job.vertices}
+        transprecision = {}
+        operator_output = {v.id: {} for v in job.vertices}
+
+        since = max(self.__reset_time, self.__get_running_since(responses[job.url]))
+        for labels, value in self.__get_series(responses[tasks_url], since):
+            vertex, subtask = labels.get("task_id"), int(labels.get("subtask_index", -1))
+            # series of vertices or subtasks that are gone, e.g. after a scale-down
+            if vertex not in vertices or not 0 <= subtask < vertices[vertex].parallelism:
+                continue
+
+            name = labels["__name__"][len(TASK_PREFIX):]
+            if name == BACKPRESSURE_METRIC:
+                ratios[vertex][subtask] = value / 1000
+            else:
+                values[vertex][SUBTASK_METRICS.index(name), subtask] = value
+
+        for labels, value in self.__get_last_values(responses[operators_url]):
+            if labels["__name__"] == OPERATOR_PREFIX + TRANSPRECISION_METRIC and labels.get("task_id") in vertices \
+                    and labels.get("subtask_index") == "0":
+                transprecision[labels["task_id"]] = int(round(value))
+
+        # only the operator named as its vertex: the operators chained in a vertex are named after themselves
+        for labels, value in self.__get_series(responses[operators_url], since):
+            vertex, subtask = labels.get("task_id"), int(labels.get("subtask_index", -1))
+            if labels["__name__"] == OPERATOR_PREFIX + OPERATOR_RECORDS_OUT and vertex in vertices \
+                    and labels.get("operator_name") == vertices[vertex].name \
+                    and 0 <= subtask < vertices[vertex].parallelism:
+                operator_output[vertex][subtask] = value
+
+        for vertex in job.vertices:
+            vertex.set_metrics(ratios[vertex.id], values[vertex.id], transprecision.get(vertex.id),
+                               operator_output[vertex.id])
+        job.update_status(responses[job.url])
@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from urllib.parse import urlsplit
+
+from requests import HTTPError
+
+from transscale.utils.Logger import Logger
+from transscale.utils.metrics.MetricsCollector import MetricNotFoundError
+
+
+# Serves the responses of a recorded trace in place of the MetricsCollector, at the time set by the replay
+class ReplayCollector:
+
+    def __init__(self, log: Logger, max_age: float, cached_paths: list[str] = None):
+        self.__log = log
+        self.__max_age = max_age
+        # documents the recorded auto-scaler did not request at every sample, valid until their next response
+        self.__cached_paths = set(cached_paths or [])
+
+        # per url, the sorted times of its responses and the (status, body) recorded at each of them
+        self.__times = {}
+        self.__responses = {}
+        self.__missing = set()
+        self.__now = 0.0
+        self.__served = 0
+
+    @staticmethod
+    def __key(url: str) -> str:
+        # the responses are looked up without the cluster address, the replay may not use the recorded one
+        parts = urlsplit(url)
+        return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+    def add_response(self, timestamp: float, url: str, status: int, body: any) -> None:
+        url = self.__key(url)
+        times = self.__times.setdefault(url, [])
+        responses = self.__responses.setdefault(url, [])
+
+        # responses fetched in parallel may be appended slightly out of order
+        i = bisect_right(times, timestamp)
+        times.insert(i, timestamp)
+        responses.insert(i, (status, body))
+
+    def set_time(self, timestamp: float) -> None:
+        self.__now = timestamp
+
+    def __lookup(self, url: str) -> any:
+        key = self.__key(url)
+        if key not in self.__times and key not in self.__missing:
+            # e.g. a job or a metric other than the recorded ones: no sample can be replayed from it
+            self.__missing.add(key)
+            self.__log.warning(f"[REPLAY] No response to {key} in the trace")
+
+        times = self.__times.get(key, [])
+        i = bisect_right(times, self.__now) - 1
+
+        # a url not fetched recently did not exist at that time for the recorded auto-scaler
+        if i < 0 or (key not in self.__cached_paths and self.__now - times[i] > self.__max_age):
+            raise MetricNotFoundError(url)
+
+        status, body = self.__responses[key][i]
+        if status == 404:
+            raise MetricNotFoundError(url)
+        if status >= 400:
+            # as the recorded auto-scaler failed on it
+            raise HTTPError(f"{status} Error for url: {url}")
+        return body
+
+    def new_tick(self) -> None:
+        self.__served = 0
+
+    def fetch(self, urls: list[str]) -> dict[str, any]:
+        self.__served += len(urls)
+        return {url: self.__lookup(url) for url in urls}
+
+    def get(self, url: str) -> any:
+        return self.fetch([url])[url]
+
+    def poll(self, url: str) -> any:
+        return self.__lookup(url)
+
+    def post(self, url: str, body: dict) -> any:
+        # a replay only observes the recorded cluster
+        raise MetricNotFoundError(url)
+
+    def put(self, url: str, body: dict) -> any:
+        raise MetricNotFoundError(url)
+
+    def get_time(self) -> float:
+        return self.__now
+
+    def get_timings(self) -> dict[str, float]:
+        return {}
+
+    def get_tick_time(self) -> float:
+        return 0.0
+
+    def print_timings(self) -> None:
+        self.__log.debugg(f"[REPLAY] {self.__served} responses served from the trace in the current tick")
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,38 @@
+from numpy import ndarray, atleast_2d, zeros, percentile
+
+from transscale.utils.DefaultValues import DefaultValues
+
+
+class SubtaskStats:
+
+    def __init__(self, values: ndarray, q: float = 95):
+        # values holds one metric per row and one subtask per column, all the rows are reduced together
+        self.values = atleast_2d(values)
+        rows = self.values.shape[0]
+
+        if self.values.shape[1] == 0:
+            self.max = self.mean = self.percentile = self.std = self.skew = zeros(rows)
+            return
+
+        self.max = self.values.max(axis=1)
+        self.mean = self.values.mean(axis=1)
+        self.percentile = percentile(self.values, q, axis=1)
+        self.std = self.values.std(axis=1)
+
+        # skew as the imbalance of the hottest subtask with respect to the average one
+        self.skew = zeros(rows)
+        loaded = self.mean > 0
+        self.skew[loaded] = self.max[loaded] / self.mean[loaded]
+
+    def get(self, statistic: str, row: int = 0) -> float:
+        if statistic == DefaultValues.Scaling.Backpressure.STAT_MAX:
+            return float(self.max[row])
+        elif statistic == DefaultValues.Scaling.Backpressure.STAT_MEAN:
+            return float(self.mean[row])
+        elif statistic == DefaultValues.Scaling.Backpressure.STAT_PERCENTILE:
+            return float(self.percentile[row])
+        raise ValueError(f"Unknown statistic {statistic}")
+
+    def __str__(self) -> str:
+        return " | ".join([f"max {self.max[r]:.2f} -- mean {self.mean[r]:.2f} -- pctl {self.percentile[r]:.2f} "
+                           f"-- skew {self.skew[r]:.2f}" for r in range(self.values.shape[0])])
@@ -0,0 +1,85 @@
+import json
+import struct
+import zlib
+from os.path import exists, getsize
+from threading import Lock
+from time import time
+from typing import Iterator
+
+from transscale.utils.Logger import Logger
+
+TRACE_MAGIC = b"TSTRACE1"
+
+RECORD_RESPONSE = 1
+RECORD_SAMPLE = 2
+RECORD_RECONFIGURATION = 3
+
+# type, wall clock timestamp and length of the compressed payload that follows
+RECORD_HEADER = struct.Struct("<BdI")
+
+
+class TraceRecorder:
+
+    def __init__(self, path: str, log: Logger):
+        self.__path = path
+        self.__log = log
+        self.__lock = Lock()
+
+        # traces are append-only: a restarted auto-scaler continues the same file
+        new_file = not exists(path) or getsize(path) == 0
+        self.__file = open(path, "ab")
+        if new_file:
+            self.__file.write(TRACE_MAGIC)
+            self.__file.flush()
+
+        self.__log.info(f"[TRACE] Recording the monitoring trace to {path}")
+
+    def __write(self, record_type: int, payload: dict, timestamp: float = None) -> None:
+        data = zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+        timestamp = time() if timestamp is None else timestamp
+
+        with self.__lock:
+            self.__file.write(RECORD_HEADER.pack(record_type, timestamp, len(data)))
+            self.__file.write(data)
+            self.__file.flush()
+
+    def record_response(self, url: str, status: int, body: any) -> None:
+        self.__write(RECORD_RESPONSE, {"url": url, "status": status, "body": body})
+
+    def record_sample(self) -> None:
+        # all the responses a sample is computed from are recorded before it
+        self.__write(RECORD_SAMPLE, {})
+
+    def record_reconfiguration(self, kind: str, current: int, target: int, success: bool,
+                               timings: dict[str, float] = None, savepoint: dict[str, any] = None,
+                               pods: dict[str, int] = None) -> None:
+        self.__write(RECORD_RECONFIGURATION, {"kind": kind, "current": current, "target": target, "success": success,
+                                              "timings": timings or {}, "savepoint": savepoint or {},
+                                              "pods": pods or {}})
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+
+class TraceReader:
+
+    def __init__(self, path: str):
+        self.__path = path
+
+    def __iter__(self) -> Iterator[tuple[int, float, dict]]:
+        with open(self.__path, "rb") as trace:
+            if trace.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise ValueError(f"{self.__path} is not a monitoring trace")
+
+            while True:
+                header = trace.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                record_type, timestamp, length = RECORD_HEADER.unpack(header)
+
+                data = trace.read(length)
+                if len(data) < length:
+                    # the last record of a trace still being written, or of a killed recorder
+                    return
+                yield record_type, timestamp, json.loads(zlib.decompress(data))
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from typing import Callable, TYPE_CHECKING
+
+from numpy import asarray
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
+from transscale.utils.Logger import Logger
+
+if TYPE_CHECKING:
+    from transscale.utils.prediction.models.PerformanceModel import BasePerformanceModel
+
+
+class FitCache:
+
+    def __init__(self):
+        self.__log = None
+        self.__size = DefaultValues.Prediction.fit_cache_size
+
+        self.__lock = Lock()
+        # model status after a fit, by hash of the inputs of the fit, least recently used first
+        self.__fits = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def configure(self, conf: Config, log: Logger) -> None:
+        self.__log = log
+        self.__size = conf.get_int(Key.PREDICTION_FIT_CACHE_SIZE)
+        self.clear()
+
+    @staticmethod
+    def __get_key(model: "BasePerformanceModel", kind: str, measurements_array: list,
+                  network_array: list | None, variance_array: list | None) -> bytes:
+        key = blake2b(digest_size=16)
+        key.update(f"{type(model).__name__}:{kind}:".encode())
+        # the parameters kept from the previous fits are inputs of the fit as much as the measurements
+        key.update(asarray(model.get_fit_inputs(kind), dtype=float).tobytes())
+        key.update(b":")
+        measurements = asarray(measurements_array, dtype=float)
+        key.update(f"{measurements.shape}".encode())
+        key.update(measurements.tobytes())
+        if network_array is not None:
+            key.update(b":")
+            key.update(asarray(network_array, dtype=float).tobytes())
+        if variance_array is not None:
+            key.update(b"~")
+            key.update(asarray(variance_array, dtype=float).tobytes())
+        return key.digest()
+
+    # Trains the model with fit, unless a fit of the same kind on the same inputs is cached
+    def fit(self, model: "BasePerformanceModel", kind: str, measurements_array: list, network_array: list | None,
+            fit: Callable[[], None], variance_array: list | None = None) -> None:
+        if self.__size <= 0:
+            fit()
+            return
+
+        key = self.__get_key(model, kind, measurements_array, network_array, variance_array)
+        with self.__lock:
+            status = self.__fits.get(key)
+            if status is not None:
+                self.__fits.move_to_end(key)
+                self.__hits += 1
+
+        if status is not None:
+            model.set_status(status)
+            return
+
+        fit()
+        with self.__lock:
+            self.__misses += 1
+            self.__fits[key] = dict(model.get_status())
+            while len(self.__fits) > self.__size:
+                self.__fits.popitem(last=False)
+
+    def get_stats(self) -> dict[str, int]:
+        with self.__lock:
+            return {"hits": self.__hits, "misses": self.__misses, "size": len(self.__fits)}
+
+    def print_stats(self) -> None:
+        if self.__log is None:
+            return
+        stats = self.get_stats()
+        lookups = stats["hits"] + stats["misses"]
+        self.__log.debug(f"[FIT_CACHE] {stats['hits']} hits, {stats['misses']} misses "
+                         f"({100 * stats['hits'] / lookups if lookups else 0:.1f}% hit rate), "
+                         f"{stats['size']} fits cached")
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__fits = OrderedDict()
+            self.__hits = 0
+            self.__misses = 0
+
+
+# shared by all the performance models, configured by the entry points
+fit_cache = FitCache()
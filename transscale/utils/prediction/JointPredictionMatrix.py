@@ -0,0 +1,76 @@
+from numpy import arange, array, ndarray, trunc, zeros
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.PredictionEngine import BasePredictionEngine, find_scaling_possibilities
+from transscale.utils.prediction.models.JointModel import JointModel
+
+
+# Fits a single surface on all the measurements and evaluates the whole grid from it, independently of any fill order
+class JointPredictionMatrix(BasePredictionEngine):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(JointPredictionMatrix, self).__init__(conf, log)
+        self.engine_name = "JointPredictionMatrix"
+        self.__log = log
+
+        self.__max_par = conf.get_int(Key.MAX_PAR)
+        self.__max_transp = conf.get_int(Key.MAX_TRANSP)
+
+        self.__model = JointModel(log)
+        self.__prediction_matrix = zeros([self.__max_par + 1, self.__max_transp + 1])
+        self.__updated = False
+
+    def update_matrix(self, measurements: MeasurementsManager) -> None:
+        with profiler.span("prediction.update_matrix"):
+            changed_cells, changed_nd = measurements.pop_changes()
+            if self.__updated and len(changed_cells) == 0 and not changed_nd:
+                self.__log.debugg(f"[PRED_MATRIX] No new measurement: prediction matrix unchanged")
+                return
+
+            measurements_array = measurements.get_measurements()
+            network_array = measurements.get_network_delays()
+            observed = measurements_array > 0
+            if not observed.any():
+                self.__prediction_matrix = zeros([self.__max_par + 1, self.__max_transp + 1])
+                return
+
+            with profiler.span("prediction.fit.joint"):
+                self.__model.train_full_model(measurements_array, network_array, measurements.get_variances())
+
+            pars = arange(self.__max_par + 1)[:, None]
+            transps = arange(self.__max_transp + 1)[None, :]
+            # predictions are truncated as the ones of the line by line matrix, measured cells are kept as they are
+            matrix = trunc(self.__model.get_mst(pars, transps, network_array[:, None]))
+            matrix[observed] = measurements_array[observed]
+            matrix[0, :] = 0
+            matrix[:, 0] = 0
+
+            self.__prediction_matrix = matrix
+            self.__updated = True
+            self.__log.debugg(f"[PRED_MATRIX] Updated prediction matrix is:\n {self.__prediction_matrix}")
+
+    def get_state(self) -> dict[str, ndarray]:
+        if not self.__updated:
+            return {}
+        return {"matrix": self.__prediction_matrix.copy(),
+                "model": array(list(self.__model.get_status().values()), dtype=float)}
+
+    def set_state(self, state: dict[str, ndarray], measurements: MeasurementsManager) -> bool:
+        if "matrix" not in state or state["matrix"].shape != self.__prediction_matrix.shape:
+            return False
+        self.__prediction_matrix = array(state["matrix"])
+        self.__model.set_status(dict(zip(self.__model.get_status(), state["model"].tolist())))
+        self.__updated = True
+        return True
+
+    def get_scaling_possibilities(self, context: RuntimeContext, target_tput: int,
+                                  low_throughput_threshold: int = DefaultValues.Scaling.Combined.threshold
+                                  ) -> ndarray:
+        return find_scaling_possibilities(self.__log, self.__prediction_matrix, context.get_current_state(),
+                                          target_tput, low_throughput_threshold)
@@ -0,0 +1,307 @@
+from typing import Callable
+
+from numpy import arange, array, column_stack, errstate, flatnonzero, insert, ndarray, searchsorted, where, zeros
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.PredictionEngine import BasePredictionEngine
+from transscale.utils.prediction.models.ParallelismModel import ParallelismModel
+from transscale.utils.prediction.models.PerformanceModel import BasePerformanceModel
+from transscale.utils.prediction.models.RecursiveLeastSquares import RecursiveLeastSquares
+from transscale.utils.prediction.models.TransprecisionModel import TransprecisionModel
+
+
+# Fits the observed lines only and predicts a column of the grid when the candidate search reaches it:
+# memory and update time grow with the observed configurations, not with the size of the grid
+class LazyPredictionMatrix(BasePredictionEngine):
+
+    def __init__(self, conf: Config, log: Logger):
+        super(LazyPredictionMatrix, self).__init__(conf, log)
+        self.engine_name = "LazyPredictionMatrix"
+        self.__log = log
+
+        self.__max_par = conf.get_int(Key.MAX_PAR)
+        self.__max_transp = conf.get_int(Key.MAX_TRANSP)
+
+        self.__par_model = ParallelismModel(log)
+        self.__transp_model = TransprecisionModel(log)
+        self.__par_default = self.__par_model.get_status()
+        self.__transp_default = self.__transp_model.get_status()
+
+        # observed (indices, msts, variances) of the columns and the rows, and the model status fitted on each of them
+        self.__columns = {}
+        self.__rows = {}
+        self.__column_fits = {}
+        self.__row_fits = {}
+        # the most measured row, whose transprecision model scales the columns without measurements
+        self.__profile = None
+        self.__nd = zeros([self.__max_par + 1])
+        self.__updated = False
+
+        # with the online updates every sample of a known configuration refreshes the models of its column and row
+        self.__online = conf.get_bool(Key.PREDICTION_ONLINE_ENABLED)
+        self.__forgetting = conf.get_float(Key.PREDICTION_ONLINE_FORGETTING)
+        self.__column_rls = {}
+        self.__row_rls = {}
+
+    @staticmethod
+    def __to_dense(indices: ndarray, values: ndarray) -> ndarray:
+        # the models read the lines by index: up to the highest observed one only
+        line = zeros([indices[-1] + 1])
+        line[indices] = values
+        return line
+
+    def __train_parallelism_model(self, pars: ndarray, msts: ndarray, variances: ndarray) -> None:
+        line = self.__to_dense(pars, msts)
+        network = self.__nd[:len(line)]
+
+        with profiler.span("prediction.fit.parallelism"):
+            if len(pars) > 2:
+                self.__par_model.train_full_model(line, network, self.__to_dense(pars, variances))
+            elif len(pars) > 1:
+                self.__par_model.train_reduced_model(line, network, self.__to_dense(pars, variances))
+            else:
+                self.__par_model.train_min_model(line)
+
+    def __train_transprecision_model(self, transps: ndarray, msts: ndarray, variances: ndarray) -> None:
+        line = self.__to_dense(transps, msts)
+
+        with profiler.span("prediction.fit.transprecision"):
+            if len(transps) > 1:
+                self.__transp_model.train_full_model(line, variance_array=self.__to_dense(transps, variances))
+            else:
+                self.__transp_model.train_min_model(line)
+
+    @staticmethod
+    def __fit_lines(lines: dict, previous_fits: dict, model: BasePerformanceModel, full_from: int,
+                    default: dict[str, float], train: Callable[[ndarray, ndarray, ndarray], None]
+                    ) -> tuple[dict, int]:
+        # Returns the status fitted on each line, and the most measured line if it had a full fit.
+        # It is fitted first: the lines with too few measurements for a full fit keep its parameters
+        order = sorted(lines, key=lambda i: (-len(lines[i][0]), i))
+        fits = {}
+        reference = default
+        reference_line = None
+
+        for i in order:
+            full = len(lines[i][0]) >= full_from
+            # a full fit starts from the previous fit of the line
+            model.set_status(previous_fits.get(i, reference) if full else reference)
+            train(*lines[i])
+            fits[i] = dict(model.get_status())
+            if i == order[0] and full:
+                reference = fits[i]
+                reference_line = i
+
+        return fits, reference_line
+
+    def __init_online(self, lines: dict, fits: dict, model: BasePerformanceModel,
+                      nd: ndarray = None) -> dict[int, RecursiveLeastSquares]:
+        estimators = {}
+        for i, (indices, msts, _) in lines.items():
+            model.set_status(fits[i])
+            estimators[i] = RecursiveLeastSquares(self.__forgetting)
+            model.init_online(estimators[i], indices, msts, nd[indices] if nd is not None else None)
+        return estimators
+
+    def __fit(self) -> None:
+        # the fits of the lines that did not change are served by the fit cache
+        self.__column_fits, _ = self.__fit_lines(self.__columns, self.__column_fits, self.__par_model, 3,
+                                                 self.__par_default, self.__train_parallelism_model)
+        self.__row_fits, self.__profile = self.__fit_lines(self.__rows, self.__row_fits, self.__transp_model, 2,
+                                                           self.__transp_default, self.__train_transprecision_model)
+        if self.__online:
+            self.__column_rls = self.__init_online(self.__columns, self.__column_fits, self.__par_model, self.__nd)
+            self.__row_rls = self.__init_online(self.__rows, self.__row_fits, self.__transp_model)
+
+        self.__log.debugg(f"[PRED_MATRIX] {len(self.__column_fits)} columns and {len(self.__row_fits)} rows "
+                          f"fitted on {sum(len(c[0]) for c in self.__columns.values())} measurements")
+
+    def __is_observed(self, par: int, transp: int) -> bool:
+        return transp in self.__columns and par in self.__columns[transp][0]
+
+    def __get_observed(self, par: int, transp: int) -> float:
+        indices, msts, _ = self.__columns[transp]
+        return msts[searchsorted(indices, par)]
+
+    def __set_observed(self, par: int, transp: int, mst: float, variance: float = None) -> None:
+        # the cell is updated or inserted in its column and its row, both sorted by index.
+        # The variance of a cell is refreshed by the measurements at the next decision, the one of a new cell is unknown
+        for lines, line, i in [(self.__columns, transp, par), (self.__rows, par, transp)]:
+            indices, msts, variances = lines.get(line, (zeros([0], dtype=int), zeros([0]), zeros([0])))
+            pos = searchsorted(indices, i)
+            if pos < len(indices) and indices[pos] == i:
+                msts[pos] = mst
+                variances[pos] = variances[pos] if variance is None else variance
+            else:
+                lines[line] = insert(indices, pos, i), insert(msts, pos, mst), \
+                    insert(variances, pos, 0.0 if variance is None else variance)
+
+    def update_matrix(self, measurements: MeasurementsManager) -> None:
+        with profiler.span("prediction.update_matrix"):
+            changed_cells, changed_nd = measurements.pop_changes()
+            if self.__updated and len(changed_cells) == 0 and not changed_nd:
+                self.__log.debugg(f"[PRED_MATRIX] No new measurement: prediction models unchanged")
+                return
+
+            if self.__online and self.__updated:
+                self.__update_online(measurements, changed_cells)
+                return
+
+            self.__nd = measurements.get_network_delays()
+            self.__columns = {t: measurements.get_line(transp=t) for t in measurements.get_observed_transps()}
+            self.__rows = {p: measurements.get_line(par=p) for p in measurements.get_observed_pars()}
+            self.__fit()
+            self.__updated = True
+
+    def __update_online(self, measurements: MeasurementsManager, changed_cells: set[tuple[int, int]]) -> None:
+        # the samples already refreshed the models: the measurements are merged, only a new configuration is fitted
+        new_cells = [cell for cell in changed_cells if not self.__is_observed(*cell)]
+        for par, transp in changed_cells:
+            self.__set_observed(par, transp, measurements.get_measurements(par, transp),
+                                measurements.get_variances(par, transp))
+        delays = measurements.get_network_delays()
+        self.__nd = where(delays > 0, delays, self.__nd)
+
+        if len(new_cells) > 0:
+            self.__fit()
+        else:
+            self.__log.debugg(f"[PRED_MATRIX] Online models up to date: no fit before the decision")
+
+    def observe(self, par: int, transp: int, mst: float, nd: float) -> None:
+        # until the first decision the models are fitted on the measurements
+        if not self.__online or not self.__updated:
+            return
+
+        self.__nd[par] = nd
+        if not self.__is_observed(par, transp):
+            # the lines of a new configuration are fitted now rather than at the next decision
+            self.__set_observed(par, transp, mst)
+            self.__fit()
+            return
+
+        # the sample was an outlier, or left the aggregate as it was: the models are up to date
+        if self.__get_observed(par, transp) == mst:
+            return
+
+        self.__set_observed(par, transp, mst)
+        for model, estimators, fits, line, level in [
+                (self.__par_model, self.__column_rls, self.__column_fits, transp, par),
+                (self.__transp_model, self.__row_rls, self.__row_fits, par, transp)]:
+            model.set_status(fits[line])
+            model.update_online(estimators[line], level, mst, nd)
+            fits[line] = dict(model.get_status())
+
+    @staticmethod
+    def __fits_to_array(fits: dict[int, dict[str, float]]) -> ndarray:
+        # one row per line: its index, then the values of its status
+        return array([[i] + list(status.values()) for i, status in sorted(fits.items())], dtype=float)
+
+    @staticmethod
+    def __fits_from_array(rows: ndarray, default: dict[str, float]) -> dict[int, dict[str, float]]:
+        return {int(row[0]): dict(zip(default, row[1:].tolist())) for row in rows}
+
+    def get_state(self) -> dict[str, ndarray]:
+        if not self.__updated:
+            return {}
+        return {"nd": self.__nd.copy(),
+                "column_fits": self.__fits_to_array(self.__column_fits).reshape(-1, 1 + len(self.__par_default)),
+                "row_fits": self.__fits_to_array(self.__row_fits).reshape(-1, 1 + len(self.__transp_default)),
+                "profile": array([-1 if self.__profile is None else self.__profile])}
+
+    def set_state(self, state: dict[str, ndarray], measurements: MeasurementsManager) -> bool:
+        if "nd" not in state or len(state["nd"]) != self.__max_par + 1:
+            return False
+        column_fits = self.__fits_from_array(state["column_fits"], self.__par_default)
+        row_fits = self.__fits_from_array(state["row_fits"], self.__transp_default)
+        profile = int(state["profile"][0])
+
+        # the fits must be the ones of the lines observed in the restored measurements
+        transps, pars = measurements.get_observed_transps(), measurements.get_observed_pars()
+        if sorted(column_fits) != transps or sorted(row_fits) != pars or (profile >= 0 and profile not in row_fits):
+            return False
+
+        self.__nd = array(state["nd"])
+        self.__columns = {t: measurements.get_line(transp=t) for t in transps}
+        self.__rows = {p: measurements.get_line(par=p) for p in pars}
+        self.__column_fits, self.__row_fits = column_fits, row_fits
+        self.__profile = profile if profile >= 0 else None
+        if self.__online:
+            self.__column_rls = self.__init_online(self.__columns, self.__column_fits, self.__par_model, self.__nd)
+            self.__row_rls = self.__init_online(self.__rows, self.__row_fits, self.__transp_model)
+        self.__updated = True
+        return True
+
+    def __predict_separable(self, transp: int, pars: ndarray) -> ndarray:
+        # the nearest measured column, scaled by the transprecision profile
+        if len(self.__column_fits) == 0:
+            return zeros([len(pars)])
+        reference = min(self.__column_fits, key=lambda t: (abs(t - transp), t))
+
+        self.__par_model.set_status(self.__column_fits[reference])
+        column = self.__par_model.get_mst(pars, self.__nd)
+        self.__transp_model.set_status(self.__row_fits[self.__profile] if self.__profile is not None
+                                       else self.__transp_default)
+        return column * self.__transp_model.get_mst(transp) / self.__transp_model.get_mst(reference)
+
+    # Returns the predicted mst of all the parallelism levels at a transprecision level, indexed by parallelism
+    def __predict_column(self, transp: int) -> ndarray:
+        pars = arange(self.__max_par + 1)
+
+        if transp in self.__column_fits:
+            self.__par_model.set_status(self.__column_fits[transp])
+            column = self.__par_model.get_mst(pars, self.__nd)
+        else:
+            column = self.__predict_separable(transp, pars)
+            # a row measured at other transprecision levels has its own model
+            for par, status in self.__row_fits.items():
+                self.__transp_model.set_status(status)
+                column[par] = self.__transp_model.get_mst(transp)
+
+        if transp in self.__columns:
+            observed_pars, observed_msts, _ = self.__columns[transp]
+            column[observed_pars] = observed_msts
+        column[0] = 0
+        return column
+
+    def get_scaling_possibilities(self, context: RuntimeContext, target_tput: int,
+                                  low_throughput_threshold: int = DefaultValues.Scaling.Combined.threshold
+                                  ) -> ndarray:
+        current_par, current_transp = context.get_current_state()
+
+        # per parallelism, the lowest transprecision sustaining the target, 0 until one is found
+        first_transp = zeros([self.__max_par + 1], dtype=int)
+        # higher parallelisms are not considered once the lowest transprecision is enough
+        last_par = 1 if self.__max_transp == 1 else self.__max_par
+
+        # the columns are predicted in order, until every parallelism considered has its candidate
+        for transp in range(1, self.__max_transp + 1):
+            pending = first_transp[1:last_par + 1] == 0
+            if not pending.any():
+                break
+
+            mst = self.__predict_column(transp)[1:last_par + 1]
+            throughput_diff = mst - target_tput
+            with errstate(divide="ignore", invalid="ignore"):
+                throughput_diff_perc = where(throughput_diff == 0, 0, 100 * throughput_diff / mst)
+
+            feasible = (throughput_diff_perc > low_throughput_threshold) & pending
+            if transp == current_transp and 1 <= current_par <= last_par:
+                feasible[current_par - 1] = False
+            first_transp[1:last_par + 1][feasible] = transp
+
+            if transp == 1:
+                enough = flatnonzero(feasible)
+                last_par = enough[0] + 1 if len(enough) > 0 else last_par
+
+        pars = flatnonzero(first_transp[1:last_par + 1]) + 1
+        pos = column_stack((pars, first_transp[pars]))
+
+        if self.__log.debug_level > 0:
+            self.__log.debug(f"[PRED_MATRIX] Scaling Possibilities: {pos.tolist()}")
+        return pos
@@ -0,0 +1,100 @@
+from numpy import column_stack, errstate, flatnonzero, ndarray, where
+
+from transscale.components.MeasurementsManager import MeasurementsManager
+from transscale.components.RuntimeContext import RuntimeContext
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import DefaultValues, ConfigKeys as Key
+from transscale.utils.Logger import Logger
+
+
+# Predicts the mst of the configurations from the measurements, and lists the ones sustaining a throughput
+class BasePredictionEngine:
+
+    def __init__(self, conf: Config, log: Logger):
+        self.log = log
+        self.engine_name = "BasePredictionEngine"
+
+    def update_matrix(self, measurements: MeasurementsManager) -> None:
+        pass
+
+    # Called with the mst measured at every monitoring sample of a saturated operator
+    def observe(self, par: int, transp: int, mst: float, nd: float) -> None:
+        pass
+
+    # Returns the fitted state of the engine as arrays, to be saved along with the measurements
+    def get_state(self) -> dict[str, ndarray]:
+        return {}
+
+    # Restores a saved state fitted on the measurements, returns False if it does not fit this engine
+    def set_state(self, state: dict[str, ndarray], measurements: MeasurementsManager) -> bool:
+        return False
+
+    # Releases the workers and the buffers of the engine, if any
+    def close(self) -> None:
+        pass
+
+    # Returns the candidate configurations as an array of (par, transp) rows
+    def get_scaling_possibilities(self, context: RuntimeContext, target_tput: int,
+                                  low_throughput_threshold: int = DefaultValues.Scaling.Combined.threshold
+                                  ) -> ndarray:
+        pass
+
+
+# Returns, per parallelism, the lowest transprecision of the matrix sustaining the target throughput
+def find_scaling_possibilities(log: Logger, matrix: ndarray, current_state: tuple[int, int], target_tput: int,
+                               low_throughput_threshold: int) -> ndarray:
+    debug = log.debug_level > 0
+    if debug:
+        log.debug(f"[PRED_MATRIX] Current prediction matrix is:\n {matrix}")
+
+    current_par, current_transp = current_state
+    max_par, max_transp = matrix.shape[0] - 1, matrix.shape[1] - 1
+
+    # headroom of every configuration over the target throughput, in percent of its predicted mst
+    mst = matrix[1:, 1:]
+    throughput_diff = mst - target_tput
+    with errstate(divide="ignore", invalid="ignore"):
+        throughput_diff_perc = where(throughput_diff == 0, 0, 100 * throughput_diff / mst)
+
+    feasible = throughput_diff_perc > low_throughput_threshold
+    if 1 <= current_par <= max_par and 1 <= current_transp <= max_transp:
+        feasible[current_par - 1, current_transp - 1] = False
+
+    # per parallelism, the lowest transprecision sustaining the target
+    has_feasible = feasible.any(axis=1)
+    first_transp = feasible.argmax(axis=1)
+
+    # higher parallelisms are not considered once the lowest transprecision is enough
+    if max_transp == 1:
+        last_par = 0
+    else:
+        enough = flatnonzero(has_feasible & (first_transp == 0))
+        last_par = enough[0] if len(enough) > 0 else max_par - 1
+
+    pars = flatnonzero(has_feasible[:last_par + 1])
+    pos = column_stack((pars + 1, first_transp[pars] + 1))
+
+    if debug:
+        for new_par, new_transp in pos:
+            log.debug(f"[PRED_MATRIX] \tpar, transp: {new_par}, {new_transp} "
+                      f"target tput: {target_tput} "
+                      f"new_tput %: {mst[new_par - 1, new_transp - 1]} "
+                      f"tput diff %: {throughput_diff_perc[new_par - 1, new_transp - 1]} ADDED")
+        log.debug(f"[PRED_MATRIX] Scaling Possibilities: {pos.tolist()}")
+    return pos
+
+
+def init_prediction_engine(conf: Config, log: Logger) -> BasePredictionEngine:
+    engine = conf.get_str(Key.PREDICTION_ENGINE)
+
+    if engine == DefaultValues.Prediction.ENGINE_MATRIX:
+        from transscale.utils.prediction.PredictionMatrix import PredictionMatrix
+        return PredictionMatrix(conf, log)
+    elif engine == DefaultValues.Prediction.ENGINE_JOINT:
+        from transscale.utils.prediction.JointPredictionMatrix import JointPredictionMatrix
+        return JointPredictionMatrix(conf, log)
+    elif engine == DefaultValues.Prediction.ENGINE_LAZY:
+        from transscale.utils.prediction.LazyPredictionMatrix import LazyPredictionMatrix
+        return LazyPredictionMatrix(conf, log)
+
+    raise ValueError(f"Unknown prediction engine {engine}")
@@ -5,15 +5,24 @@ from transscale.utils.DefaultValues import ConfigKeys as Key
 from transscale.utils.DefaultValues import DefaultValues
 
 from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.PredictionEngine import BasePredictionEngine, find_scaling_possibilities
 from transscale.utils.prediction.models.ParallelismModel import ParallelismModel
+from transscale.utils.prediction.models.PerformanceModel import FIT_FULL, FIT_MIN, FIT_REDUCED
 from transscale.utils.prediction.models.TransprecisionModel import TransprecisionModel
+from transscale.utils.prediction.WaveFiller import LINE_PAR, LINE_TRANSP, WaveFiller, predict_line, train_line_model
 
-from numpy import ndarray, zeros
+from heapq import heappop, heappush
 
+from numpy import array, ndarray, zeros
 
-class PredictionMatrix:
+
+# Fills the whole grid, line by line, each fit also using the predictions of the lines filled before it
+class PredictionMatrix(BasePredictionEngine):
 
     def __init__(self, conf: Config, log: Logger):
+        super(PredictionMatrix, self).__init__(conf, log)
+        self.engine_name = "PredictionMatrix"
         self.__log = log
 
         self.__max_par = conf.get_int(Key.MAX_PAR)
@@ -23,113 +32,313 @@ class PredictionMatrix:
         self.__transp_model = TransprecisionModel(log)
 
         self.__prediction_matrix = zeros([self.__max_par + 1, self.__max_transp + 1])
+        # variances of the measured cells, the predicted ones are unknown
+        self.__variances = zeros([self.__max_par + 1, self.__max_transp + 1])
+        # per line, the inputs of its last fit and the cells it predicted
+        self.__fits = {}
+        # the fill order of the last update, as waves of (line, number of values when fitted) sharing the same start
+        # status of the model and followed by the status of their first line, and the cells measured then
+        self.__order = []
+        self.__measured = set()
+        self.__updated = False
+
+        # the independent lines are fitted together, in waves, rather than one after the other
+        self.__waves = None
+        if conf.get_str(Key.PREDICTION_MATRIX_FILL) == DefaultValues.Prediction.FILL_WAVES:
+            self.__waves = WaveFiller(conf, log)
+        elif conf.get_str(Key.PREDICTION_MATRIX_FILL) != DefaultValues.Prediction.FILL_SEQUENTIAL:
+            raise ValueError(f"Unknown prediction matrix fill {conf.get_str(Key.PREDICTION_MATRIX_FILL)}")
+
+    def __get_kept_status(self, param: str, num_measurements: int) -> tuple:
+        # the parameters a fit does not estimate are kept from the previous fits, so they are inputs as well
+        if param == LINE_TRANSP:
+            kind = FIT_FULL if num_measurements > 2 else FIT_REDUCED if num_measurements > 1 else FIT_MIN
+            return self.__par_model.get_fit_inputs(kind)
+        return self.__transp_model.get_fit_inputs(FIT_FULL if num_measurements > 1 else FIT_MIN)
+
+    def __get_fit_inputs(self, param: str, val: int, num_measurements: int, network_array: list) -> tuple:
+        inputs = tuple(self.__get_line(param, val)) + tuple(self.__get_line(param, val, self.__variances)) \
+            + self.__get_kept_status(param, num_measurements)
+        if param == LINE_TRANSP:
+            inputs += tuple(network_array)
+        return inputs
+
+    def __get_line(self, param: str, val: int, matrix: ndarray = None) -> ndarray:
+        matrix = self.__prediction_matrix if matrix is None else matrix
+        return matrix[val] if param == LINE_PAR else matrix[:, val]
+
+    def __fit_line(self, param: str, val: int, n_pred: int, network_array: list) -> dict[int, float]:
+        # Returns the predictions of the missing cells of a line, from the model trained on the line
+        line = self.__get_line(param, val)
+        # the column of transp = val is predicted for the missing parallelisms by the parallelism model,
+        # the row of par = val by the transprecision model
+        model = self.__par_model if param == LINE_TRANSP else self.__transp_model
+        train_line_model(model, param, n_pred, list(line), network_array,
+                         list(self.__get_line(param, val, self.__variances)))
+        return predict_line(model, param, line, network_array)
 
-    def __build_queue(self, measurements: ndarray, prediction_matrix: ndarray) -> list:
-        queue = []
-
-        for p in range(1, self.__max_par + 1):
-            n_real = len([x for x in measurements[p] if x > 0])
-            n_pred = len([x for x in prediction_matrix[p] if x > 0])
-            if n_pred != 0 and n_pred != self.__max_transp:
-                queue.append(("PAR", p, n_real, n_pred))
-
-        for t in range(1, self.__max_transp + 1):
-            n_real = len([x for x in measurements.transpose()[t] if x > 0])
-            n_pred = len([x for x in prediction_matrix.transpose()[t] if x > 0])
-            if n_pred != 0 and n_pred != self.__max_par:
-                queue.append(("TRANSP", t, n_real, n_pred))
-
-        queue = sorted(queue, key=lambda x: (x[2], x[3]), reverse=True)
-
-        return queue
-
-    def __train_transprecision_model(self, num_measurements: int, measurements_array: list) -> None:
-        if num_measurements > 1:
-            self.__transp_model.train_full_model(measurements_array)
-        else:
-            self.__transp_model.train_min_model(measurements_array)
-
-    def __train_parallelism_model(self, num_measurements: int, measurements_array: list, network_array: list) -> None:
-        if num_measurements > 2:
-            self.__par_model.train_full_model(measurements_array, network_array)
-        elif num_measurements > 1:
-            self.__par_model.train_reduced_model(measurements_array, network_array)
-        else:
-            self.__par_model.train_min_model(measurements_array)
-
-    def __predict(self, elem: list, network_array: list) -> None:
-
-        param, val, real, pred = elem
-        if param == "TRANSP":
-            # it means that the row of transp = val is the one with 'pred' elements
-            # so it means fixing the measurements to transp = val and predict it for the missing values of parallelism
-            # hence must use parallelism model
-            measurements_array = list(self.__prediction_matrix.transpose()[val])
-
-            self.__train_parallelism_model(pred, measurements_array, network_array)
+    def __update(self, measurements: MeasurementsManager, network_array: list) -> None:
+        measurements_array = measurements.get_measurements()
+        self.__prediction_matrix = measurements_array.copy()
+        self.__variances = measurements.get_variances()
+        self.__measured = {(int(p), int(t)) for p, t in zip(*measurements_array.nonzero())}
+        self.__order = []
+        matrix = self.__prediction_matrix
 
-            for i in range(1, self.__max_par + 1):
-                if self.__prediction_matrix[i, val] <= 0:
-                    self.__prediction_matrix[i, val] = int(self.__par_model.get_mst(i, network_array[i]))
+        # the lines are filled one at a time, the one with the most measurements then the most values first:
+        # counters and a heap replace the scan of the whole matrix after every fill
+        n_real = {LINE_PAR: (measurements_array > 0).sum(axis=1), LINE_TRANSP: (measurements_array > 0).sum(axis=0)}
+        n_pred = {LINE_PAR: n_real[LINE_PAR].copy(), LINE_TRANSP: n_real[LINE_TRANSP].copy()}
+        full = {LINE_PAR: self.__max_transp, LINE_TRANSP: self.__max_par}
+        # ties are broken as the original queue: rows by parallelism, then columns by transprecision
+        order = {LINE_PAR: lambda v: v, LINE_TRANSP: lambda v: self.__max_par + v}
 
-        elif param == "PAR":
-            self.__train_transprecision_model(pred, list(self.__prediction_matrix[val]))
+        heap = []
 
-            for i in range(1, self.__max_transp + 1):
-                if self.__prediction_matrix[val, i] <= 0:
-                    self.__prediction_matrix[val, i] = int(self.__transp_model.get_mst(i))
+        def push(param: str, val: int) -> None:
+            if 0 < n_pred[param][val] < full[param]:
+                heappush(heap, (-n_real[param][val], -n_pred[param][val], order[param](val), param, val))
 
-    def __update(self, measurements: MeasurementsManager, network_array: list) -> None:
+        for p in range(1, self.__max_par + 1):
+            push(LINE_PAR, p)
+        for t in range(1, self.__max_transp + 1):
+            push(LINE_TRANSP, t)
+
+        # lines are refitted only when their inputs differ from the previous update
+        previous_fits = self.__fits
+        self.__fits = {}
+        filled = set()
+        refits = 0
+
+        while len(heap) > 0:
+            _, neg_pred, _, param, val = heappop(heap)
+            # entries left behind by a fill of a crossing line, or lines already filled
+            if (param, val) in filled or -neg_pred != n_pred[param][val]:
+                continue
+            filled.add((param, val))
+
+            model = self.__par_model if param == LINE_TRANSP else self.__transp_model
+            inputs = self.__get_fit_inputs(param, val, int(n_pred[param][val]), network_array)
+
+            previous = previous_fits.get((param, val))
+            if previous is not None and previous[0] == inputs:
+                predictions, status = previous[1], previous[2]
+                # the model ends in the state the fit would leave it in, for the fits that follow
+                model.set_status(status)
+            else:
+                predictions = self.__fit_line(param, val, int(n_pred[param][val]), network_array)
+                status = model.get_status()
+                refits += 1
+            self.__fits[(param, val)] = (inputs, predictions, status)
+            self.__order.append((param, [(val, int(n_pred[param][val]))], val))
+
+            other = LINE_TRANSP if param == LINE_PAR else LINE_PAR
+            for i, value in predictions.items():
+                cell = (val, i) if param == LINE_PAR else (i, val)
+                matrix[cell] = value
+                # a line whose prediction is not positive is not queued again: it would be refitted forever
+                if value > 0:
+                    n_pred[param][val] += 1
+                    n_pred[other][i] += 1
+                    if (other, i) not in filled:
+                        push(other, i)
+
+        self.__log.debugg(f"[PRED_MATRIX] {refits} lines refitted, {len(self.__fits) - refits} reused")
+        self.__log.debugg(f"[PRED_MATRIX] Updated prediction matrix is:\n {self.__prediction_matrix}")
 
+    def __update_waves(self, measurements: MeasurementsManager, network_array: list) -> None:
         measurements_array = measurements.get_measurements()
         self.__prediction_matrix = measurements_array.copy()
+        self.__variances = measurements.get_variances()
+        self.__measured = {(int(p), int(t)) for p, t in zip(*measurements_array.nonzero())}
+        self.__order = []
+        matrix = self.__prediction_matrix
+
+        n_real = {LINE_PAR: (measurements_array > 0).sum(axis=1), LINE_TRANSP: (measurements_array > 0).sum(axis=0)}
+        n_pred = {LINE_PAR: n_real[LINE_PAR].copy(), LINE_TRANSP: n_real[LINE_TRANSP].copy()}
+        full = {LINE_PAR: self.__max_transp, LINE_TRANSP: self.__max_par}
+        other = {LINE_PAR: LINE_TRANSP, LINE_TRANSP: LINE_PAR}
+
+        previous_fits = self.__fits
+        self.__fits = {}
+        filled = set()
+        refits = 0
+        waves = 0
+
+        def get_pending(param: str) -> list[int]:
+            return [val for val in range(1, len(n_pred[param])) if (param, val) not in filled
+                    and 0 < n_pred[param][val] < full[param]]
+
+        # rows never cross each other, nor do columns: all the pending rows are fitted at once on the same grid,
+        # then all the pending columns on the grid they completed, and so on. The first wave goes in the direction
+        # of the line with the most measurements, the one the sequential fill starts with
+        best = {param: max([n_real[param][val] for val in get_pending(param)], default=-1) for param in full}
+        param = LINE_PAR if best[LINE_PAR] >= best[LINE_TRANSP] else LINE_TRANSP
+
+        while True:
+            lines = get_pending(param)
+            if len(lines) == 0:
+                param = other[param]
+                lines = get_pending(param)
+                if len(lines) == 0:
+                    break
 
-        predict_queue = self.__build_queue(measurements_array, self.__prediction_matrix)
-
-        while len(predict_queue) > 0:
-            predict_elem = predict_queue[0]
-            self.__predict(predict_elem, network_array)
-            predict_queue = self.__build_queue(measurements_array, self.__prediction_matrix)
-
+            model = self.__par_model if param == LINE_TRANSP else self.__transp_model
+            results = {}
+            to_fit = []
+            for val in lines:
+                inputs = self.__get_fit_inputs(param, val, int(n_pred[param][val]), network_array)
+                previous = previous_fits.get((param, val))
+                if previous is not None and previous[0] == inputs:
+                    results[val] = previous
+                else:
+                    to_fit.append((val, inputs))
+
+            # every line of the wave is fitted from the model as the previous wave left it
+            with profiler.span("prediction.fit.wave"):
+                fitted = self.__waves.fill(matrix, self.__variances, network_array, param,
+                                           [(val, int(n_pred[param][val])) for val, _ in to_fit], model.get_status())
+            for (val, inputs), (predictions, status) in zip(to_fit, fitted):
+                results[val] = (inputs, predictions, status)
+            refits += len(to_fit)
+            waves += 1
+
+            # the next wave starts from the fit of the line with the most measurements
+            first = min(lines, key=lambda v: (-n_real[param][v], -n_pred[param][v], v))
+            model.set_status(results[first][2])
+            self.__order.append((param, [(val, int(n_pred[param][val])) for val in lines], first))
+
+            for val in lines:
+                filled.add((param, val))
+                self.__fits[(param, val)] = results[val]
+                for i, value in results[val][1].items():
+                    cell = (val, i) if param == LINE_PAR else (i, val)
+                    matrix[cell] = value
+                    if value > 0:
+                        n_pred[param][val] += 1
+                        n_pred[other[param]][i] += 1
+            param = other[param]
+
+        self.__log.debugg(f"[PRED_MATRIX] {waves} waves: {refits} lines refitted, {len(self.__fits) - refits} reused")
         self.__log.debugg(f"[PRED_MATRIX] Updated prediction matrix is:\n {self.__prediction_matrix}")
 
+    def __update_changes(self, measurements: MeasurementsManager, changed_cells: set[tuple[int, int]],
+                         network_array: list) -> bool:
+        # Replays the fill order of the last update, refitting only the lines whose inputs changed: the lines of the
+        # changed cells, the lines crossing a prediction that changed, and the lines whose kept model parameters
+        # changed. Returns False, with the grid untouched, when the changes alter the fill order
+        if len(self.__order) == 0 or any([cell not in self.__measured for cell in changed_cells]):
+            return False
+
+        matrix = self.__prediction_matrix
+        other = {LINE_PAR: LINE_TRANSP, LINE_TRANSP: LINE_PAR}
+        size = {LINE_PAR: self.__max_transp + 1, LINE_TRANSP: self.__max_par + 1}
+        par_status, transp_status = self.__par_model.get_status(), self.__transp_model.get_status()
+
+        # new values of the cells, measured or predicted by the lines replayed so far
+        changed = {cell: measurements.get_measurements(*cell) for cell in changed_cells}
+        dirty = {(LINE_PAR, p) for p, _ in changed_cells} | {(LINE_TRANSP, t) for _, t in changed_cells}
+        fits = {}
+        refits = 0
+
+        for param, lines, first in self.__order:
+            model = self.__par_model if param == LINE_TRANSP else self.__transp_model
+            start = model.get_status()
+            for val, num_measurements in lines:
+                inputs, predictions, status = self.__fits[(param, val)]
+                # every line of a wave is fitted from the same status
+                model.set_status(start)
+                kept = self.__get_kept_status(param, num_measurements)
+                n = size[param]
+                if (param, val) not in dirty and inputs[2 * n:2 * n + len(kept)] == kept:
+                    continue
+
+                # the line as it was when fitted, the cells predicted after it were still missing then
+                cells = [(val, i) if param == LINE_PAR else (i, val) for i in range(n)]
+                line = array([changed.get(cell, value) for cell, value in zip(cells, inputs[:n])])
+                variance_line = [measurements.get_variances(*cell) if cell in changed_cells else value
+                                 for cell, value in zip(cells, inputs[n:2 * n])]
+                new_inputs = tuple(line) + tuple(variance_line) + kept
+                if param == LINE_TRANSP:
+                    new_inputs += tuple(network_array)
+                if new_inputs == inputs:
+                    continue
+
+                train_line_model(model, param, num_measurements, list(line), network_array, variance_line)
+                new_predictions = predict_line(model, param, line, network_array)
+                refits += 1
+                # a prediction changing sign changes the lines queued after it
+                if any([(value > 0) != (predictions.get(i, 0) > 0) for i, value in new_predictions.items()]) \
+                        or new_predictions.keys() != predictions.keys():
+                    self.__par_model.set_status(par_status)
+                    self.__transp_model.set_status(transp_status)
+                    return False
+
+                fits[(param, val)] = (new_inputs, new_predictions, model.get_status())
+                for i, value in new_predictions.items():
+                    if value != predictions[i]:
+                        dirty.add((other[param], i))
+                    # a cell predicted not positive is predicted again by its crossing line, the last one holds
+                    if value != predictions[i] or cells[i] in changed:
+                        changed[cells[i]] = value
+
+            # the next wave starts from the fit of its first line, as in the fill
+            model.set_status(fits.get((param, first), self.__fits[(param, first)])[2])
+
+        # the grid only changes at the changed cells
+        for cell in changed_cells:
+            self.__variances[cell] = measurements.get_variances(*cell)
+        for cell, value in changed.items():
+            matrix[cell] = value
+        self.__fits.update(fits)
+
+        self.__log.debugg(f"[PRED_MATRIX] {len(changed_cells)} measurements changed: {refits} lines refitted, "
+                          f"{len(self.__fits) - refits} reused")
+        return True
+
     def update_matrix(self, measurements: MeasurementsManager):
-        network_array = measurements.get_network_distance()
-        self.__update(measurements, network_array)
+        with profiler.span("prediction.update_matrix"):
+            changed_cells, changed_nd = measurements.pop_changes()
+            if self.__updated and len(changed_cells) == 0 and not changed_nd:
+                self.__log.debugg(f"[PRED_MATRIX] No new measurement: prediction matrix unchanged")
+                return
+
+            network_array = measurements.get_network_distance()
+            # new samples of the configurations already measured only refit the lines depending on them
+            incremental = self.__updated and not changed_nd
+            if not incremental or not self.__update_changes(measurements, changed_cells, network_array):
+                if self.__waves is not None:
+                    self.__update_waves(measurements, network_array)
+                else:
+                    self.__update(measurements, network_array)
+            self.__updated = True
+
+    def get_state(self) -> dict[str, ndarray]:
+        if not self.__updated:
+            return {}
+        return {"matrix": self.__prediction_matrix.copy(), "variances": self.__variances.copy(),
+                "par_model": array(list(self.__par_model.get_status().values()), dtype=float),
+                "transp_model": array(list(self.__transp_model.get_status().values()), dtype=float)}
+
+    def set_state(self, state: dict[str, ndarray], measurements: MeasurementsManager) -> bool:
+        if "matrix" not in state or state["matrix"].shape != self.__prediction_matrix.shape:
+            return False
+        self.__prediction_matrix = array(state["matrix"])
+        self.__variances = array(state["variances"])
+        self.__par_model.set_status(dict(zip(self.__par_model.get_status(), state["par_model"].tolist())))
+        self.__transp_model.set_status(dict(zip(self.__transp_model.get_status(), state["transp_model"].tolist())))
+        # the lines are refitted at the first change of the measurements
+        self.__fits = {}
+        self.__order = []
+        self.__updated = True
+        return True
+
+    def close(self) -> None:
+        if self.__waves is not None:
+            self.__waves.close()
 
     def get_scaling_possibilities(self, context: RuntimeContext, target_tput: int,
                                   low_throughput_threshold: int = DefaultValues.Scaling.Combined.threshold
-                                  ) -> list:
-
-        self.__log.debug(f"[PRED_MATRIX] Current prediction matrix is:\n {self.__prediction_matrix}")
-
-        current_par, current_transp = context.get_current_state()
-
-        pos = []
-        new_transp = 1
-        for new_par in range(1, self.__max_par + 1):
-            for new_transp in range(1, self.__max_transp + 1):
-                new_mst = self.__prediction_matrix[new_par][new_transp]
-
-                throughput_diff = new_mst - target_tput
-                throughput_diff_perc = 0 if throughput_diff == 0 else 100 * throughput_diff / new_mst
-
-                debug_status = f"[PRED_MATRIX] "\
-                               f"\tpar, transp: {new_par}, {new_transp} "\
-                               f"target tput: {target_tput} "\
-                               f"new_tput %: {new_mst} "\
-                               f"tput diff %: {throughput_diff_perc} "
-
-                if throughput_diff_perc > low_throughput_threshold \
-                        and (new_par, new_transp) != (current_par, current_transp):
-                    pos.append((new_par, new_transp))
-                    self.__log.debug(debug_status + "ADDED")
-                    break
-                else:
-                    self.__log.debug(debug_status)
-
-            if new_transp == 1:
-                break
-
-        self.__log.debug(f"[PRED_MATRIX] Scaling Possibilities: {pos}")
-        return pos
+                                  ) -> ndarray:
+        return find_scaling_possibilities(self.__log, self.__prediction_matrix, context.get_current_state(),
+                                          target_tput, low_throughput_threshold)
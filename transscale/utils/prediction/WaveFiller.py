@@ -0,0 +1,184 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+
+from numpy import flatnonzero, ndarray, zeros
+
+from transscale.utils.Config import Config
+from transscale.utils.DefaultValues import ConfigKeys as Key
+from transscale.utils.DefaultValues import DefaultValues
+from transscale.utils.Logger import Logger
+from transscale.utils.Profiler import profiler
+from transscale.utils.prediction.models.ParallelismModel import ParallelismModel
+from transscale.utils.prediction.models.PerformanceModel import BasePerformanceModel
+from transscale.utils.prediction.models.TransprecisionModel import TransprecisionModel
+
+LINE_PAR = "PAR"
+LINE_TRANSP = "TRANSP"
+
+# lines of a wave under which the dispatch to the pool costs more than the fits
+MIN_PARALLEL_LINES = 16
+MAX_ATTACHED_GRIDS = 4
+
+
+def train_line_model(model: BasePerformanceModel, param: str, num_measurements: int, measurements_array: list,
+                     network_array: list, variance_array: list) -> None:
+    # the columns (transp = val) are fitted by the parallelism model, the rows by the transprecision one
+    if param == LINE_TRANSP:
+        with profiler.span("prediction.fit.parallelism"):
+            if num_measurements > 2:
+                model.train_full_model(measurements_array, network_array, variance_array)
+            elif num_measurements > 1:
+                model.train_reduced_model(measurements_array, network_array, variance_array)
+            else:
+                model.train_min_model(measurements_array)
+    else:
+        with profiler.span("prediction.fit.transprecision"):
+            if num_measurements > 1:
+                model.train_full_model(measurements_array, variance_array=variance_array)
+            else:
+                model.train_min_model(measurements_array)
+
+
+# Returns the predictions of the missing cells of a line, from the model trained on it
+def predict_line(model: BasePerformanceModel, param: str, line: ndarray, network_array: list) -> dict[int, int]:
+    if param == LINE_TRANSP:
+        return {i: int(model.get_mst(i, network_array[i])) for i in range(1, len(line)) if line[i] <= 0}
+    return {i: int(model.get_mst(i)) for i in range(1, len(line)) if line[i] <= 0}
+
+
+# Fits the lines of a wave, each from the model status at the start of the wave, and writes their predictions in
+# output. Returns the status each fit left the model in
+def fit_lines(matrix: ndarray, variances: ndarray, output: ndarray, network_array: list, param: str,
+              lines: list[tuple[int, int]], status: dict[str, float]) -> list[dict[str, float]]:
+    model = ParallelismModel(Logger()) if param == LINE_TRANSP else TransprecisionModel(Logger())
+
+    statuses = []
+    for val, num_measurements in lines:
+        line = matrix[val] if param == LINE_PAR else matrix[:, val]
+        variance_line = variances[val] if param == LINE_PAR else variances[:, val]
+        model.set_status(status)
+        train_line_model(model, param, num_measurements, list(line), network_array, list(variance_line))
+
+        predictions = predict_line(model, param, line, network_array)
+        if len(predictions) > 0:
+            cells = list(predictions)
+            if param == LINE_PAR:
+                output[val, cells] = list(predictions.values())
+            else:
+                output[cells, val] = list(predictions.values())
+        statuses.append(dict(model.get_status()))
+    return statuses
+
+
+# shared memory blocks attached by a worker process, by name: a fill allocates them once for all its waves
+_attached = {}
+
+
+def _attach(name: str, shape: tuple[int, int]) -> ndarray:
+    if name not in _attached:
+        # blocks of grids since replaced by larger ones
+        if len(_attached) >= 3 * MAX_ATTACHED_GRIDS:
+            for block in _attached.values():
+                block.close()
+            _attached.clear()
+        _attached[name] = SharedMemory(name=name)
+    return ndarray(shape, dtype=float, buffer=_attached[name].buf)
+
+
+# Entry point of the worker processes, which receive the names of the shared blocks rather than copies of the grid
+def fit_shared_lines(names: tuple[str, str, str], shape: tuple[int, int], network_array: list, param: str,
+                     lines: list[tuple[int, int]], status: dict[str, float]) -> list[dict[str, float]]:
+    matrix, variances, output = (_attach(name, shape) for name in names)
+    return fit_lines(matrix, variances, output, network_array, param, lines, status)
+
+
+# Fits all the lines of a wave at once, on a pool of workers sharing the grid
+class WaveFiller:
+
+    def __init__(self, conf: Config, log: Logger):
+        self.__log = log
+        self.__kind = conf.get_str(Key.PREDICTION_MATRIX_POOL)
+        self.__workers = conf.get_int(Key.PREDICTION_MATRIX_WORKERS) or cpu_count() or 1
+        if self.__kind not in [DefaultValues.Prediction.POOL_PROCESS, DefaultValues.Prediction.POOL_THREAD]:
+            raise ValueError(f"Unknown worker pool {self.__kind}")
+
+        self.__pool = None
+        # the shared blocks of the process workers and their views
+        self.__blocks = None
+
+    def __get_pool(self) -> Executor:
+        if self.__pool is None:
+            if self.__kind == DefaultValues.Prediction.POOL_PROCESS:
+                # spawned, not forked: the auto-scaler runs threads that a fork would copy in any state
+                self.__pool = ProcessPoolExecutor(self.__workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self.__pool = ThreadPoolExecutor(self.__workers)
+            self.__log.debug(f"[PRED_MATRIX] Fitting the waves on {self.__workers} {self.__kind} workers")
+        return self.__pool
+
+    def __get_blocks(self, shape: tuple[int, int]) -> tuple[tuple[str, str, str], list[ndarray]]:
+        # the grid, the variances and the predictions, allocated once per grid size
+        if self.__blocks is None or self.__blocks[1][0].shape != shape:
+            self.__close_blocks()
+            size = max(shape[0] * shape[1] * 8, 1)
+            blocks = [SharedMemory(create=True, size=size) for _ in range(3)]
+            self.__blocks = (blocks, [ndarray(shape, dtype=float, buffer=block.buf) for block in blocks])
+        blocks, arrays = self.__blocks
+        return (blocks[0].name, blocks[1].name, blocks[2].name), arrays
+
+    # Returns the predictions of the missing cells of each line and the status of the model fitted on it
+    def fill(self, matrix: ndarray, variances: ndarray, network_array: list, param: str,
+             lines: list[tuple[int, int]], status: dict[str, float]) -> list[tuple[dict[int, int], dict[str, float]]]:
+        network_array = list(network_array)
+        if len(lines) < MIN_PARALLEL_LINES or self.__workers < 2:
+            output = zeros(matrix.shape)
+            statuses = fit_lines(matrix, variances, output, network_array, param, lines, status)
+        else:
+            statuses, output = self.__fill_parallel(matrix, variances, network_array, param, lines, status)
+
+        results = []
+        for (val, _), line_status in zip(lines, statuses):
+            line = matrix[val] if param == LINE_PAR else matrix[:, val]
+            predicted = output[val] if param == LINE_PAR else output[:, val]
+            missing = flatnonzero(line[1:] <= 0) + 1
+            results.append(({int(i): int(predicted[i]) for i in missing}, line_status))
+        return results
+
+    def __fill_parallel(self, matrix: ndarray, variances: ndarray, network_array: list, param: str,
+                        lines: list[tuple[int, int]], status: dict[str, float]
+                        ) -> tuple[list[dict[str, float]], ndarray]:
+        pool = self.__get_pool()
+        # one chunk per worker: the lines are interleaved, since the cost of a fit grows with its measurements
+        chunks = [lines[i::self.__workers] for i in range(min(self.__workers, len(lines)))]
+
+        if self.__kind == DefaultValues.Prediction.POOL_PROCESS:
+            names, (shared_matrix, shared_variances, output) = self.__get_blocks(matrix.shape)
+            shared_matrix[:] = matrix
+            shared_variances[:] = variances
+            futures = [pool.submit(fit_shared_lines, names, matrix.shape, network_array, param, chunk, status)
+                       for chunk in chunks]
+        else:
+            # the threads share the arrays of the engine as they are
+            output = zeros(matrix.shape)
+            futures = [pool.submit(fit_lines, matrix, variances, output, network_array, param, chunk, status)
+                       for chunk in chunks]
+
+        statuses = {}
+        for chunk, future in zip(chunks, futures):
+            statuses.update({val: line_status for (val, _), line_status in zip(chunk, future.result())})
+        return [statuses[val] for val, _ in lines], output
+
+    def __close_blocks(self) -> None:
+        if self.__blocks is not None:
+            for block in self.__blocks[0]:
+                block.close()
+                block.unlink()
+            self.__blocks = None
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+        self.__close_blocks()
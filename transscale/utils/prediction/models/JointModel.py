@@ -0,0 +1,115 @@
+from .ModelFitting import get_weights
+from .PerformanceModel import BasePerformanceModel
+
+from numpy import append, array, column_stack, exp, isfinite, log, nonzero, ones, ndarray
+from numpy.linalg import lstsq
+from scipy.optimize import least_squares
+
+from transscale.utils.Logger import Logger
+
+PARAMETERS = ["alpha", "beta", "delta", "gamma"]
+LOWER_BOUNDS = array([0.0, 0.0, -4.0, 0.0])
+UPPER_BOUNDS = array([float("inf"), 4.0, 4.0, float("inf")])
+# value of the parameters the measurements cannot estimate, e.g. beta when a single parallelism was measured
+DEFAULT_STATUS = {"alpha": 1.0, "beta": 1.0, "delta": 1.0, "gamma": 0.0}
+# evaluations of the least squares solve before it stops with the best parameters found
+MAX_NFEV = 200
+# weight of the penalty on the network term: network delays growing with the parallelism can trade gamma for alpha,
+# the penalty keeps the smallest gamma explaining the measurements
+NETWORK_RIDGE = 0.1
+
+
+# mst(par, transp, nd) = alpha * par ** beta * transp ** delta - gamma * nd, fitted on all the measured cells at once
+class JointModel(BasePerformanceModel):
+
+    def __init__(self, log: Logger):
+        super(JointModel, self).__init__()
+        self.__alpha: float = DEFAULT_STATUS["alpha"]
+        self.__beta: float = DEFAULT_STATUS["beta"]
+        self.__delta: float = DEFAULT_STATUS["delta"]
+        self.__gamma: float = DEFAULT_STATUS["gamma"]
+
+        self.__log = log
+
+    def get_status(self) -> dict[str, float]:
+        return {"alpha": self.__alpha, "beta": self.__beta, "delta": self.__delta, "gamma": self.__gamma}
+
+    def set_status(self, status: dict[str, float]) -> None:
+        self.__alpha, self.__beta, self.__delta, self.__gamma = (status[k] for k in PARAMETERS)
+
+    def get_fit_inputs(self, kind: str) -> tuple:
+        # the parameters not estimated take their defaults: a fit only depends on the measurements
+        return ()
+
+    def print_model_status(self) -> None:
+        self.__log.info(f"[JOINT_MDL] Model Status")
+        for parameter, value in self.get_status().items():
+            self.__log.info(f"\t{parameter}: {value}")
+
+    @staticmethod
+    def __get_start(par: ndarray, transp: ndarray, mst: ndarray, weights: ndarray, free: list[int]) -> ndarray:
+        # log-linear regression of the measurements, ignoring the network delays, weighted by their relative errors
+        start = array([DEFAULT_STATUS[k] for k in PARAMETERS])
+        exponents = [i for i in free if i in (1, 2)]
+        columns = [ones(len(mst))] + [log(par) if i == 1 else log(transp) for i in exponents]
+        log_weights = (weights * mst)[:, None]
+        solution = lstsq(log_weights * column_stack(columns), log_weights[:, 0] * log(mst), rcond=None)[0]
+
+        start[0] = exp(solution[0])
+        for i, value in zip(exponents, solution[1:]):
+            start[i] = value
+        return start.clip(LOWER_BOUNDS, UPPER_BOUNDS)
+
+    # The measurements are the matrix of the mst by parallelism and transprecision, 0 where not measured
+    def curve_fit_full(self, measurements_array: ndarray, network_array: list[int] = None,
+                       variance_array: ndarray = None) -> None:
+        matrix = array(measurements_array, dtype=float)
+        par_idx, transp_idx = nonzero(matrix > 0)
+        par, transp, mst = par_idx.astype(float), transp_idx.astype(float), matrix[par_idx, transp_idx]
+        nd = array(network_array, dtype=float)[par_idx] if network_array is not None else 0 * mst
+        if len(mst) == 0:
+            return
+        weights = get_weights(mst, array(variance_array, dtype=float)[par_idx, transp_idx]
+                              if variance_array is not None else None)
+
+        # an exponent needs two levels to be estimated, gamma a network delay
+        free = [0] + [i for i, levels in [(1, par), (2, transp)] if len(set(levels)) > 1] + ([3] if nd.any() else [])
+        # no more parameters than measurements: gamma, then delta, keep their defaults first
+        free = free[:len(mst)]
+        start = self.__get_start(par, transp, mst, weights, free)
+
+        def predict(x: ndarray) -> tuple[ndarray, ndarray]:
+            params = start.copy()
+            params[free] = x
+            alpha, beta, delta, gamma = params
+            scale = par ** beta * transp ** delta
+            return params, alpha * scale - gamma * nd
+
+        ridge = NETWORK_RIDGE * nd.mean()
+
+        def residuals(x: ndarray) -> ndarray:
+            params, prediction = predict(x)
+            return append(weights * (prediction - mst), ridge * params[3])
+
+        def jacobian(x: ndarray) -> ndarray:
+            (alpha, beta, delta, gamma), _ = predict(x)
+            scale = par ** beta * transp ** delta
+            columns = [scale, alpha * scale * log(par), alpha * scale * log(transp), -nd]
+            penalty = [0.0, 0.0, 0.0, ridge]
+            return column_stack([append(weights * columns[i], penalty[i]) for i in free])
+
+        params = start
+        try:
+            res = least_squares(residuals, start[free], jac=jacobian, bounds=(LOWER_BOUNDS[free], UPPER_BOUNDS[free]),
+                                x_scale="jac", max_nfev=MAX_NFEV)
+            if isfinite(res.cost) and res.cost <= 0.5 * (residuals(start[free]) ** 2).sum():
+                params = predict(res.x)[0]
+        except ValueError as err:
+            # the log-linear start is kept
+            self.__log.warning(f"[JOINT_MDL] Least squares fit failed: {err}")
+
+        self.__alpha, self.__beta, self.__delta, self.__gamma = (float(v) for v in params)
+        self.__log.debuggg(f"[JOINT_MDL] Fitted on {len(mst)} measurements: {self.get_status()}")
+
+    def get_mst(self, par: int | ndarray, transp: int | ndarray, nd: int | ndarray = 0) -> float | ndarray:
+        return self.__alpha * par ** self.__beta * transp ** self.__delta - nd * self.__gamma
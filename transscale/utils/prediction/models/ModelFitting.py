@@ -0,0 +1,98 @@
+from typing import Callable
+
+from numpy import array, asarray, column_stack, exp, isfinite, log, maximum, ndarray, ones, sqrt, where
+from scipy.optimize import minimize_scalar, nnls
+
+# a bounded search stops after this many iterations, keeping the best exponent found so far
+MAX_ITER = 100
+EXPONENT_TOL = 1e-6
+# the search starts on this neighbourhood of the warm start, and covers the whole bounds only if needed
+WARM_WIDTH = 0.25
+# relative standard error under which a measurement does not weigh more: a few samples can agree by chance
+NOISE_FLOOR = 0.01
+
+
+def get_weights(mst: ndarray, variance: ndarray | None) -> ndarray:
+    # Weights of the measurements in a least squares fit: the inverse of their standard error, with a mean of 1.
+    # A measurement of unknown variance gets the largest relative error of the others, all weigh 1 if none is known
+    if variance is None:
+        return ones(len(mst))
+    variance = asarray(variance, dtype=float)
+    known = variance > 0
+    if not known.any():
+        return ones(len(mst))
+
+    relative = maximum(sqrt(variance) / mst, NOISE_FLOOR)
+    relative = where(known, relative, relative[known].max())
+    weights = 1 / (relative * mst)
+    return weights / weights.mean()
+
+
+def fit_nonneg_pair(a: ndarray, b: ndarray, y: ndarray) -> tuple[ndarray, float]:
+    # Closed form of the non-negative least squares on two columns: the unconstrained solution if it is feasible,
+    # otherwise the best solution on one column only
+    aa, ab, bb, ay, by = a @ a, a @ b, b @ b, a @ y, b @ y
+    det = aa * bb - ab * ab
+    if det > 1e-12 * aa * bb:
+        x, z = (bb * ay - ab * by) / det, (aa * by - ab * ay) / det
+        if x >= 0 and z >= 0:
+            coef = array([x, z])
+            return coef, float(sqrt(max(0.0, y @ y - coef[0] * ay - coef[1] * by)))
+
+    x = max(ay / aa, 0.0) if aa > 0 else 0.0
+    z = max(by / bb, 0.0) if bb > 0 else 0.0
+    # the gain of each single column solution is x * ay and z * by
+    coef = array([x, 0.0]) if x * ay >= z * by else array([0.0, z])
+    return coef, float(sqrt(max(0.0, y @ y - coef[0] * ay - coef[1] * by)))
+
+
+def fit_nonneg_linear(columns: list[ndarray], y: ndarray, defaults: tuple = None) -> tuple[ndarray, float]:
+    # Exact least squares of y = sum(coef[i] * columns[i]) with coef >= 0, returns coef and the residual norm.
+    # The coefficient of a column of zeros cannot be estimated: it keeps its default, if any
+    if len(columns) == 2:
+        coef, rnorm = fit_nonneg_pair(columns[0], columns[1], y)
+    else:
+        coef, rnorm = nnls(column_stack(columns), y)
+    if defaults is None:
+        return coef, rnorm
+
+    for i, column in enumerate(columns):
+        if not column.any():
+            coef[i] = defaults[i]
+    return coef, rnorm
+
+
+def fit_log_linear(x: ndarray, y: ndarray, weights: ndarray = None) -> tuple[float, float]:
+    # y = alpha * x ** beta by linear regression of log(y) on log(x): exact for measurements lying on a power law.
+    # The weights are the ones of the residuals of y, the relative errors are the residuals of log(y)
+    log_x, log_y = log(x), log(y)
+    w = ones(len(x)) if weights is None else (weights * y) ** 2
+    mean_x, mean_y = (w @ log_x) / w.sum(), (w @ log_y) / w.sum()
+    dx = log_x - mean_x
+    beta = (w * dx) @ (log_y - mean_y) / ((w * dx) @ dx)
+    return float(exp(mean_y - beta * mean_x)), float(beta)
+
+
+def search_exponent(sse: Callable[[float], float], start: float, bounds: tuple[float, float]) -> tuple[float, float]:
+    # Bounded search of the exponent minimizing sse, returns it with its sse.
+    # The start is returned when nothing better is found, e.g. if the sse is not finite elsewhere
+    lo, hi = bounds
+    best = min(max(start, lo), hi)
+    best_sse = sse(best)
+    if not isfinite(best_sse):
+        best_sse = float("inf")
+
+    near = (max(lo, best - WARM_WIDTH), min(hi, best + WARM_WIDTH))
+    intervals = [near, bounds] if near != bounds else [bounds]
+    for a, b in intervals:
+        res = minimize_scalar(sse, bounds=(a, b), method="bounded",
+                              options={"maxiter": MAX_ITER, "xatol": EXPONENT_TOL})
+        if isfinite(res.fun) and res.fun < best_sse:
+            best, best_sse = float(res.x), float(res.fun)
+
+        # an optimum inside the neighbourhood of the warm start is kept, one on its edges may be further away
+        margin = 10 * EXPONENT_TOL + 1e-3 * (b - a)
+        if (best - a > margin or a == lo) and (b - best > margin or b == hi):
+            break
+
+    return best, best_sse
@@ -1,10 +1,14 @@
+from .ModelFitting import fit_nonneg_linear, get_weights, search_exponent
 from .PerformanceModel import BasePerformanceModel
+from .RecursiveLeastSquares import RecursiveLeastSquares
 
-from scipy.optimize import curve_fit
-from numpy import inf
+from numpy import array, column_stack, ndarray
 
 from transscale.utils.Logger import Logger
 
+# exponents of the scalability of the operator the full fit searches
+BETA_BOUNDS = (0.0, 4.0)
+
 
 class ParallelismModel(BasePerformanceModel):
 
@@ -19,6 +23,13 @@ class ParallelismModel(BasePerformanceModel):
     def get_status(self) -> dict[str, float]:
         return {"alpha": self.__alpha, "beta": self.__beta, "gamma": self.__gamma}
 
+    def set_status(self, status: dict[str, float]) -> None:
+        self.__alpha, self.__beta, self.__gamma = status["alpha"], status["beta"], status["gamma"]
+
+    def get_fit_inputs(self, kind: str) -> tuple:
+        # beta is kept by the min and reduced fits and is the start of the full one, gamma is kept if no delay is known
+        return self.__beta, self.__gamma
+
     def print_model_status(self) -> None:
         self.__log.info(f"[PAR_MDL] Model Status")
         self.__log.info(f"\talpha: {self.__alpha}")
@@ -31,37 +42,47 @@ class ParallelismModel(BasePerformanceModel):
 
         self.__alpha = mst / par
 
-    def curve_fit_reduced(self, measurements_array: list[int], network_array: list[int]) -> None:
+    def __get_data(self, measurements_array: list[int], network_array: list[int],
+                   variance_array: list[float] = None) -> tuple:
+        # the weights are applied to both sides of the least squares
         par_data = [i for i in range(0, len(measurements_array)) if measurements_array[i] > 0]
-        net_data = [network_array[i] for i in par_data]
-        mst_data = [measurements_array[i] for i in par_data]
-
-        popt, _ = curve_fit(lambda x, alpha, gamma: alpha * x[0] - gamma * x[1],
-                            (par_data, net_data), mst_data, bounds=([0, 0], [inf, inf]))
-
-        self.__alpha, self.__gamma = popt
-
-    def curve_fit_full(self, measurements_array: list[int], network_array: list[int]) -> None:
-        par_data = [i for i in range(0, len(measurements_array)) if measurements_array[i] > 0]
-        net_data = [network_array[i] for i in par_data]
-        mst_data = [measurements_array[i] for i in par_data]
-
-        # start_params = [self.__alpha, self.__beta, self.__gamma] if self.__alpha != 1.0 else [mst_data[1], 0, 1]
-
-        maxfev = 800
-        retry = True
-        while retry:
-            try:
-                popt, _ = curve_fit(lambda x, alpha, beta, gamma: alpha * x[0] ** beta - gamma * x[1],
-                                    # (par_data, net_data), mst_data, p0=start_params, maxfev=maxfev)
-                                    (par_data, net_data), mst_data, maxfev=maxfev,  bounds=([0, 0, 0], [inf, inf, inf]))
-
-                self.__alpha, self.__beta, self.__gamma = popt
-
-                retry = False
-            except RuntimeError as re:
-                maxfev = maxfev * 2
-                self.__log.error(f"maxfev error, increasing maxfev to {maxfev}")
+        net_data = array([network_array[i] for i in par_data], dtype=float)
+        mst_data = array([measurements_array[i] for i in par_data], dtype=float)
+        weights = get_weights(mst_data, [variance_array[i] for i in par_data] if variance_array is not None else None)
+        return array(par_data, dtype=float), weights * net_data, weights * mst_data, weights
+
+    def curve_fit_reduced(self, measurements_array: list[int], network_array: list[int],
+                          variance_array: list[float] = None) -> None:
+        par_data, net_data, mst_data, weights = self.__get_data(measurements_array, network_array, variance_array)
+
+        # linear in alpha and gamma: solved exactly, gamma is kept when no network delay is known
+        (self.__alpha, self.__gamma), _ = fit_nonneg_linear([weights * par_data, -net_data], mst_data,
+                                                            (self.__alpha, self.__gamma))
+
+    def curve_fit_full(self, measurements_array: list[int], network_array: list[int],
+                       variance_array: list[float] = None) -> None:
+        par_data, net_data, mst_data, weights = self.__get_data(measurements_array, network_array, variance_array)
+        defaults = (self.__alpha, self.__gamma)
+
+        # for a given beta alpha and gamma are solved exactly, so only beta is searched, from the previous one
+        def sse(beta: float) -> float:
+            _, rnorm = fit_nonneg_linear([weights * par_data ** beta, -net_data], mst_data)
+            return rnorm ** 2
+
+        beta, _ = search_exponent(sse, self.__beta, BETA_BOUNDS)
+        (self.__alpha, self.__gamma), _ = fit_nonneg_linear([weights * par_data ** beta, -net_data], mst_data,
+                                                            defaults)
+        self.__beta = beta
+        self.__log.debuggg(f"[PAR_MDL] Full fit: alpha {self.__alpha}, beta {self.__beta}, gamma {self.__gamma}")
+
+    # alpha and gamma are linear for the beta of the last fit: they are the parameters updated online
+    def init_online(self, rls: RecursiveLeastSquares, levels: ndarray, msts: ndarray, nds: ndarray = None) -> None:
+        nds = nds if nds is not None else 0 * msts
+        rls.reset(array([self.__alpha, self.__gamma]), column_stack([levels ** self.__beta, -nds]))
+
+    def update_online(self, rls: RecursiveLeastSquares, level: int, mst: float, nd: float = 0) -> None:
+        alpha, gamma = rls.update(array([level ** self.__beta, -nd], dtype=float), mst)
+        self.__alpha, self.__gamma = max(float(alpha), 0.0), max(float(gamma), 0.0)
 
     def get_mst(self, par: int, nd: int = 0) -> float:
         return self.__alpha * par ** self.__beta - nd * self.__gamma
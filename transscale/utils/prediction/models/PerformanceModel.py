@@ -1,3 +1,13 @@
+from numpy import ndarray
+
+from transscale.utils.prediction.FitCache import fit_cache
+from transscale.utils.prediction.models.RecursiveLeastSquares import RecursiveLeastSquares
+
+FIT_MIN = "min"
+FIT_REDUCED = "reduced"
+FIT_FULL = "full"
+
+
 class BasePerformanceModel:
 
     def __init__(self):
@@ -7,19 +17,37 @@ class BasePerformanceModel:
         pass
 
     def train_min_model(self, measurements_array: list[int]) -> None:
-        self.curve_fit_min(measurements_array)
+        fit_cache.fit(self, FIT_MIN, measurements_array, None,
+                      lambda: self.curve_fit_min(measurements_array))
+
+    # The variances of the measurements weigh them in the fits, 0 where unknown
+    def curve_fit_reduced(self, measurements_array: list[int], network_array: list[int],
+                          variance_array: list[float] = None) -> None:
+        pass
+
+    def train_reduced_model(self, measurements_array: list[int], network_array: list[int],
+                            variance_array: list[float] = None) -> None:
+        fit_cache.fit(self, FIT_REDUCED, measurements_array, network_array,
+                      lambda: self.curve_fit_reduced(measurements_array, network_array, variance_array),
+                      variance_array)
 
-    def curve_fit_reduced(self, measurements_array: list[int], network_array: list[int]) -> None:
+    def curve_fit_full(self, measurements_array: list[int], network_array: list[int],
+                       variance_array: list[float] = None) -> None:
         pass
 
-    def train_reduced_model(self, measurements_array: list[int], network_array: list[int]) -> None:
-        self.curve_fit_reduced(measurements_array, network_array)
+    def train_full_model(self, measurements_array: list[int], network_array: list[int] = None,
+                         variance_array: list[float] = None) -> None:
+        fit_cache.fit(self, FIT_FULL, measurements_array, network_array,
+                      lambda: self.curve_fit_full(measurements_array, network_array, variance_array),
+                      variance_array)
 
-    def curve_fit_full(self, measurements_array: list[int], network_array: list[int]) -> None:
+    # Starts the streaming updates of the parameters from the measurements of the last fit
+    def init_online(self, rls: RecursiveLeastSquares, levels: ndarray, msts: ndarray, nds: ndarray = None) -> None:
         pass
 
-    def train_full_model(self, measurements_array: list[int], network_array: list[int] = None) -> None:
-        self.curve_fit_full(measurements_array, network_array)
+    # Refreshes the parameters with one sample of the mst at a parallelism or transprecision level
+    def update_online(self, rls: RecursiveLeastSquares, level: int, mst: float, nd: float = 0) -> None:
+        pass
 
     def print_model_status(self) -> None:
         pass
@@ -27,3 +55,9 @@ class BasePerformanceModel:
     def get_status(self) -> dict[str, float]:
         pass
 
+    def set_status(self, status: dict[str, float]) -> None:
+        pass
+
+    # Returns the parameters of the current status a fit of this kind reads
+    def get_fit_inputs(self, kind: str) -> tuple:
+        return tuple(self.get_status().values())
@@ -0,0 +1,40 @@
+from numpy import eye, ndarray, outer
+from numpy.linalg import inv
+
+# relative regularization of the initial covariance, for the directions the batch measurements do not cover
+RIDGE = 1e-6
+# bound of the trace of the covariance relative to the initial one: without new information in some direction
+# the forgetting factor would make it grow without limit and the next sample would move the parameters arbitrarily
+MAX_COVARIANCE_GROWTH = 1e3
+
+
+# Least squares updated one sample at a time in O(k^2), k the number of parameters, forgetting the old samples
+class RecursiveLeastSquares:
+
+    def __init__(self, forgetting: float):
+        self.__forgetting = forgetting
+        self.__theta = None
+        self.__p = None
+        self.__max_trace = 0.0
+
+    # Starts from the least squares solution theta of the features x: as if the rows of x had been the first samples
+    def reset(self, theta: ndarray, x: ndarray) -> None:
+        gram = x.T @ x
+        ridge = RIDGE * max(gram.trace(), 1.0) / len(theta)
+        self.__theta = theta.astype(float)
+        self.__p = inv(gram + ridge * eye(len(theta)))
+        self.__max_trace = MAX_COVARIANCE_GROWTH * self.__p.trace()
+
+    def update(self, x: ndarray, y: float) -> ndarray:
+        px = self.__p @ x
+        gain = px / (self.__forgetting + x @ px)
+        self.__theta = self.__theta + gain * (y - x @ self.__theta)
+        self.__p = (self.__p - outer(gain, px)) / self.__forgetting
+
+        trace = self.__p.trace()
+        if trace > self.__max_trace:
+            self.__p *= self.__max_trace / trace
+        return self.__theta
+
+    def get_theta(self) -> ndarray:
+        return self.__theta
@@ -1,9 +1,14 @@
-from .PerformanceModel import BasePerformanceModel
+from .ModelFitting import fit_log_linear, get_weights, search_exponent
+from .PerformanceModel import BasePerformanceModel, FIT_MIN
+from .RecursiveLeastSquares import RecursiveLeastSquares
 
-from scipy.optimize import curve_fit
+from numpy import array, column_stack, exp, log, ndarray, ones
 
 from transscale.utils.Logger import Logger
 
+# exponents of the speedup of the transprecision levels the full fit searches
+BETA_BOUNDS = (-4.0, 4.0)
+
 
 class TransprecisionModel(BasePerformanceModel):
 
@@ -17,6 +22,13 @@ class TransprecisionModel(BasePerformanceModel):
     def get_status(self) -> dict[str, float]:
         return {"alpha": self.__alpha, "beta": self.__beta}
 
+    def set_status(self, status: dict[str, float]) -> None:
+        self.__alpha, self.__beta = status["alpha"], status["beta"]
+
+    def get_fit_inputs(self, kind: str) -> tuple:
+        # only the min fit keeps a parameter, the full fit starts from the log-linear regression
+        return (self.__beta,) if kind == FIT_MIN else ()
+
     def print_model_status(self) -> None:
         self.__log.info(f"[TRANS_MDL] Model Status")
         self.__log.info(f"\talpha: {self.__alpha}")
@@ -28,13 +40,41 @@ class TransprecisionModel(BasePerformanceModel):
 
         self.__alpha = mst / transp
 
-    def curve_fit_full(self, measurements_array: list[int], network_array: list[int] = None) -> None:
+    def curve_fit_full(self, measurements_array: list[int], network_array: list[int] = None,
+                       variance_array: list[float] = None) -> None:
         transp_data = [i for i in range(0, len(measurements_array)) if measurements_array[i] > 0]
-        mst_data = [measurements_array[i] for i in transp_data]
+        mst_data = array([measurements_array[i] for i in transp_data], dtype=float)
+        weights = get_weights(mst_data, [variance_array[i] for i in transp_data]
+                              if variance_array is not None else None)
+        transp_data = array(transp_data, dtype=float)
+
+        # the log-linear regression is exact on a power law, and the start of the least squares fit otherwise
+        alpha, beta = fit_log_linear(transp_data, mst_data, weights)
+        weighted_mst = weights * mst_data
+
+        # for a given beta the best alpha is closed form
+        def fit_alpha(b: float) -> float:
+            x = weights * transp_data ** b
+            return (x @ weighted_mst) / (x @ x)
+
+        def sse(b: float) -> float:
+            residuals = fit_alpha(b) * weights * transp_data ** b - weighted_mst
+            return residuals @ residuals
+
+        if sse(beta) > 1e-12 * (weighted_mst @ weighted_mst):
+            beta, _ = search_exponent(sse, beta, BETA_BOUNDS)
+            alpha = fit_alpha(beta)
+
+        self.__alpha, self.__beta = float(alpha), float(beta)
+        self.__log.debuggg(f"[TRANS_MDL] Full fit: alpha {self.__alpha}, beta {self.__beta}")
 
-        popt, _ = curve_fit(lambda x, alpha, beta: alpha * x ** beta, transp_data, mst_data)
+    # log(mst) = log(alpha) + beta * log(transp) is linear in both parameters
+    def init_online(self, rls: RecursiveLeastSquares, levels: ndarray, msts: ndarray, nds: ndarray = None) -> None:
+        rls.reset(array([log(self.__alpha), self.__beta]), column_stack([ones(len(levels)), log(levels)]))
 
-        self.__alpha, self.__beta = popt
+    def update_online(self, rls: RecursiveLeastSquares, level: int, mst: float, nd: float = 0) -> None:
+        log_alpha, beta = rls.update(array([1.0, log(level)]), log(mst))
+        self.__alpha, self.__beta = float(exp(log_alpha)), float(beta)
 
     def get_mst(self, transp: int) -> float:
         return self.__alpha * transp ** self.__beta